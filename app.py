@@ -8,17 +8,16 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 import requests
-from deepgram import DeepgramClient
 from extensions import db, limiter, mail
 from pdf_generator import generate_session_pdf
 from config_logging import setup_logging
+from utils.json_provider import OrjsonProvider
 from routes.auth_routes import auth_bp
 from routes.admin_routes import admin_bp
 from routes.admin_routes import viewer_bp
-from routes.training_routes import training_bp
+from routes.training_routes import training_bp, get_deepgram_token
 from routes.session_routes import session_bp
 from routes.main_routes import main_bp
-from utils.decorators import login_required
 
 # Setup logging
 logger = setup_logging()
@@ -67,7 +66,9 @@ def test_api_connections():
         logger.error(f"✗ OpenAI connection failed: {e}")
 
 # Initialize Flask
-app = Flask(__name__)
+# /static is served by main_bp; Flask's implicit static route would shadow it
+app = Flask(__name__, static_folder=None)
+app.json = OrjsonProvider(app)
 
 # Load environment
 load_dotenv()
@@ -80,6 +81,25 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False
 
+# Optional server-side sessions: with REDIS_URL set only a session id travels in the cookie
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    try:
+        from flask_session import Session
+        from redis import Redis
+        app.config['SESSION_TYPE'] = 'redis'
+        app.config['SESSION_REDIS'] = Redis.from_url(REDIS_URL)
+        app.config['SESSION_USE_SIGNER'] = True
+        app.config['SESSION_PERMANENT'] = False
+        Session(app)
+        logger.info("✅ Using Redis server-side sessions")
+    except ImportError:
+        logger.warning("REDIS_URL is set but flask-session/redis are not installed; using cookie sessions")
+
+# Behind a front server with X-Sendfile support, hand file bodies (frontend pages,
+# cached PDFs) to it instead of streaming them through the worker
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+
 # Mail Config
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
 app.config['MAIL_PORT'] = 587
@@ -98,8 +118,17 @@ CORS(
     max_age=3600
 )
 
-# Configure Limiter
-app.config['RATELIMIT_STORAGE_URI'] = "memory://"
+# Configure Limiter: counters are shared across workers through Redis when it is
+# available; Flask-Limiter refuses to start with a redis:// URI and no redis package
+RATELIMIT_STORAGE_URI = "memory://"
+if REDIS_URL:
+    try:
+        import redis
+        RATELIMIT_STORAGE_URI = REDIS_URL
+    except ImportError:
+        logger.warning("REDIS_URL is set but redis is not installed; rate limits are counted per worker")
+app.config['RATELIMIT_STORAGE_URI'] = RATELIMIT_STORAGE_URI
+app.config['RATELIMIT_STRATEGY'] = 'moving-window'
 app.config['RATELIMIT_DEFAULT'] = "1000 per day; 100 per hour"
 if os.environ.get('DISABLE_RATE_LIMITING', 'false').lower() == 'true':
     limiter.enabled = False
@@ -125,9 +154,8 @@ def health_check():
     """Health check endpoint"""
     db_ok = True
     try:
-        conn = db._get_connection()
-        conn.execute('SELECT 1')
-        conn.close()
+        with db.connection() as conn:
+            conn.execute('SELECT 1')
     except Exception:
         db_ok = False
     
@@ -149,45 +177,8 @@ def ratelimit_handler(e):
         'retry_after': str(e.description)
     }), 429
 
-@app.route('/api/deepgram-token', methods=['GET'])
-@login_required
-def deepgram_token():
-    try:
-        api_key = os.environ.get('DEEPGRAM_API_KEY')
-        if not api_key:
-            return jsonify({'error': 'missing_deepgram_key'}), 400
-
-        # Return the key directly for now (temporary workaround)
-        # TODO: Implement secure temporary key generation when Deepgram API issues are resolved
-        return jsonify({'key': api_key})
-
-        # The following code is disabled due to Deepgram API issues with temporary key generation
-        """
-        # Create a temporary key using Deepgram API
-        client = DeepgramClient(api_key)
-        
-        # Get the first project
-        projects_result = client.manage.v("1").projects.list()
-        if not projects_result.projects:
-             return jsonify({'error': 'no_deepgram_projects'}), 500
-             
-        project_id = projects_result.projects[0].project_id
-        
-        # Create a temporary key (valid for 60 seconds)
-        new_key_result = client.manage.v("1").keys.create(
-            project_id, 
-            {
-                "comment": "temp_session_key", 
-                "scopes": ["usage:write"], 
-                "time_to_live_in_seconds": 60
-            }
-        )
-        
-        return jsonify({'key': new_key_result.key})
-        """
-    except Exception as e:
-        logger.error(f"Deepgram token error: {e}")
-        return jsonify({'error': 'server_error'}), 500
+# The trainer page fetches its speech key from here; same handler as /api/training/deepgram-token
+app.add_url_rule('/api/deepgram-token', endpoint='deepgram_token', view_func=get_deepgram_token, methods=['GET'])
 
 if __name__ == '__main__':
     import argparse
@@ -3,9 +3,13 @@ Database layer for AHL Sales Trainer
 Handles all SQLite operations
 """
 
+import os
 import sqlite3
 import hashlib
+import threading
+import time
 import bcrypt
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import json
@@ -13,14 +17,73 @@ from config_logging import get_logger
 
 logger = get_logger('database')
 
+# Idle connections kept open per process (0 disables reuse)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+# Pooled connections older than this are closed instead of being handed out again
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get('DB_POOL_RECYCLE_SECONDS', 1800))
 
-class Database:
-    def __init__(self, db_path: str):
+# answer_evaluations columns selected alongside question_bank rows (aliased where names clash)
+_EVAL_JOIN_COLUMNS = (
+    'eval_id', 'user_answer', 'accuracy', 'completeness', 'clarity', 'tone', 'technique',
+    'closing', 'overall_score', 'feedback', 'evidence', 'objection_score',
+    'technique_adherence', 'what_correct', 'what_missed', 'what_wrong', 'eval_created_at'
+)
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to the pool exactly once"""
+    __slots__ = ('_conn', '_pool', '_opened_at', '_file_id')
+    
+    def __init__(self, conn: sqlite3.Connection, pool: 'ConnectionPool', opened_at: float, file_id):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_opened_at', opened_at)
+        object.__setattr__(self, '_file_id', file_id)
+    
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+    
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+    
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+    
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, '_conn', None)
+        self._pool.release(conn, self._opened_at, self._file_id)
+
+
+class ConnectionPool:
+    """Keeps opened SQLite connections (PRAGMAs already applied) for reuse across requests"""
+    
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE, recycle: int = DB_POOL_RECYCLE_SECONDS):
         self.db_path = db_path
+        self.size = size
+        self.recycle = recycle
+        # (connection, opened_at, file_id) of idle connections
+        self._idle: List[Tuple[sqlite3.Connection, float, Any]] = []
+        self._lock = threading.Lock()
     
-    def _get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path, timeout=30.0)
+    def _file_id(self):
+        """Identity of the database file; changes if it is replaced (e.g. restored from backup)"""
+        try:
+            st = os.stat(self.db_path)
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
         # CRITICAL: Enable foreign key constraints
         conn.execute("PRAGMA foreign_keys = ON")
         # Enable Write-Ahead Logging for better concurrency
@@ -28,6 +91,98 @@ class Database:
         conn.row_factory = sqlite3.Row
         return conn
     
+    def acquire(self) -> PooledConnection:
+        # Pre-ping: an idle connection is only reused if it is still young and
+        # still points at the current database file
+        file_id = self._file_id()
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                break
+            conn, opened_at, conn_file_id = entry
+            if conn_file_id == file_id and time.monotonic() - opened_at < self.recycle:
+                return PooledConnection(conn, self, opened_at, conn_file_id)
+            self._close(conn)
+        conn = self._connect()
+        return PooledConnection(conn, self, time.monotonic(), self._file_id())
+    
+    def release(self, conn: sqlite3.Connection, opened_at: float, file_id):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self._close(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, opened_at, file_id))
+                return
+        conn.close()
+    
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+    
+    @staticmethod
+    def _close(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+class Database:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # (pid, db_path, pool): a fork or a db_path change gets a fresh pool
+        self._pool_state = None
+        self._pool_lock = threading.Lock()
+        self._inherited_pools = []
+    
+    def _get_connection(self):
+        """Get database connection (from this process's pool; close() returns it)"""
+        pid = os.getpid()
+        state = self._pool_state
+        if state is None or state[0] != pid or state[1] != self.db_path:
+            with self._pool_lock:
+                state = self._pool_state
+                if state is None or state[0] != pid or state[1] != self.db_path:
+                    if state is not None:
+                        if state[0] == pid:
+                            state[2].close_all()
+                        else:
+                            # Connections opened before fork() belong to the parent; keep them untouched
+                            self._inherited_pools.append(state[2])
+                    state = (pid, self.db_path, ConnectionPool(self.db_path))
+                    self._pool_state = state
+        return state[2].acquire()
+    
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection"""
+        conn = self._get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def transaction(self):
+        """Context manager yielding a pooled connection; commits on success, rolls back on error"""
+        conn = self._get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
     def execute_query(self, query: str, params: tuple = ()) -> List[dict]:
         """Execute a query and return results as a list of dictionaries"""
         conn = self._get_connection()
@@ -140,6 +295,9 @@ class Database:
                 cursor.execute('ALTER TABLE sessions ADD COLUMN tags TEXT')
             if 'mode' not in s_cols:
                 cursor.execute("ALTER TABLE sessions ADD COLUMN mode TEXT DEFAULT 'standard'") 
+            # Position of the next unanswered question; NULL until the first answer is saved
+            if 'current_question_index' not in s_cols:
+                cursor.execute('ALTER TABLE sessions ADD COLUMN current_question_index INTEGER')
         except Exception as e:
             logger.error(f"Failed ensuring sessions columns: {e}")
         
@@ -153,6 +311,18 @@ class Database:
                 FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
             )
         ''')
+        # report_type records which audience ('staff'/'candidate') a stored report was built for;
+        # NULL means it must be rebuilt before being served again
+        try:
+            cursor.execute("PRAGMA table_info(reports)")
+            r_cols = [r[1] for r in cursor.fetchall()]
+            if 'report_type' not in r_cols:
+                cursor.execute('ALTER TABLE reports ADD COLUMN report_type TEXT')
+            # Latest answer_evaluations.id the stored report includes; a newer evaluation makes it outdated
+            if 'last_evaluation_id' not in r_cols:
+                cursor.execute('ALTER TABLE reports ADD COLUMN last_evaluation_id INTEGER')
+        except Exception as e:
+            logger.error(f"Failed ensuring reports.report_type column: {e}")
 
         # Saved views table (per admin)
         cursor.execute('''
@@ -199,6 +369,36 @@ class Database:
             )
         ''')
 
+        # Embedding cache: float32 vectors keyed by (sha256(text), model)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                text_hash BLOB NOT NULL,
+                model TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (text_hash, model)
+            )
+        ''')
+
+        # Parsed LLM completions keyed by prompt hash (see services.llm_cache), kept across restarts
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Hash of the content last indexed into each Pinecone namespace, so identical re-uploads skip embedding
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS namespace_content (
+                namespace TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
         # System settings (Key-Value)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS system_settings (
@@ -227,6 +427,25 @@ class Database:
             )
         ''')
 
+        # Expected-answer embeddings, written when questions are prepared (kept out of
+        # question_bank so its rows stay JSON-serialisable). With a scale the blob holds
+        # int8 components (value = component * scale); without one, float32 components.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_embeddings (
+                question_id INTEGER PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                scale REAL,
+                FOREIGN KEY (question_id) REFERENCES question_bank(id) ON DELETE CASCADE
+            )
+        ''')
+        try:
+            cursor.execute("PRAGMA table_info(question_embeddings)")
+            qe_cols = [r[1] for r in cursor.fetchall()]
+            if 'scale' not in qe_cols:
+                cursor.execute('ALTER TABLE question_embeddings ADD COLUMN scale REAL')
+        except Exception as e:
+            logger.error(f"Failed ensuring question_embeddings.scale column: {e}")
+
         # Answer evaluations (per answer scoring)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS answer_evaluations (
@@ -336,18 +555,31 @@ class Database:
             'CREATE INDEX IF NOT EXISTS idx_sessions_category ON sessions(category)',
             'CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions(started_at)',
             'CREATE INDEX IF NOT EXISTS idx_sessions_user_status ON sessions(user_id, status)',
+            # Resume check: a user's newest active session
+            'CREATE INDEX IF NOT EXISTS idx_sessions_user_status_started ON sessions(user_id, status, started_at DESC)',
             'CREATE INDEX IF NOT EXISTS idx_sessions_user_category ON sessions(user_id, category)',
             'CREATE INDEX IF NOT EXISTS idx_sessions_course_id ON sessions(course_id)',
+            # Session search: course filter (+ optional category) ordered by recency
+            'CREATE INDEX IF NOT EXISTS idx_sessions_course_started ON sessions(course_id, started_at DESC)',
+            'CREATE INDEX IF NOT EXISTS idx_sessions_course_category_started ON sessions(course_id, category, started_at DESC)',
             'CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id)',
             'CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)',
             'CREATE INDEX IF NOT EXISTS idx_uploads_category ON uploads(category)',
             'CREATE INDEX IF NOT EXISTS idx_uploads_uploaded_at ON uploads(uploaded_at)',
             'CREATE INDEX IF NOT EXISTS idx_uploads_course_id ON uploads(course_id)',
+            # Per-video lookups (Pinecone sync, category listings and deletes within a course)
+            'CREATE INDEX IF NOT EXISTS idx_uploads_course_category_video ON uploads(course_id, category, video_name)',
             'CREATE INDEX IF NOT EXISTS idx_reports_session_id ON reports(session_id)',
+            # Report building: a session's evaluations (and their scores) without touching the table,
+            # plus the latest-evaluation-per-question lookup
+            'CREATE INDEX IF NOT EXISTS idx_answer_eval_session ON answer_evaluations(session_id, question_id, overall_score)',
+            'CREATE INDEX IF NOT EXISTS idx_answer_eval_question ON answer_evaluations(question_id)',
+            'CREATE INDEX IF NOT EXISTS idx_question_bank_session_position ON question_bank(session_id, position)',
             'CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)',
             'CREATE INDEX IF NOT EXISTS idx_audit_user_id ON audit_log(user_id)',
             'CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp)',
             'CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action)',
+            'CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache(created_at)',
         ]
         
         for index_sql in indexes:
@@ -388,19 +620,8 @@ class Database:
             if self.get_system_setting(key) is None:
                 self.set_system_setting(key, value, desc, type_)
 
-    def get_system_setting(self, key: str, default: Any = None) -> Any:
-        """Get system setting by key with type casting"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT value, type FROM system_settings WHERE key = ?', (key,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
-            return default
-            
-        value, value_type = row['value'], row['type']
-        
+    @staticmethod
+    def _cast_setting(value: str, value_type: str) -> Any:
         try:
             if value_type == 'int':
                 return int(value)
@@ -414,6 +635,31 @@ class Database:
         except Exception:
             return value
 
+    def get_system_setting(self, key: str, default: Any = None) -> Any:
+        """Get system setting by key with type casting"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT value, type FROM system_settings WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return default
+            
+        return self._cast_setting(row['value'], row['type'])
+
+    def get_system_settings_bulk(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several system settings in one query; keys that are not set are omitted"""
+        if not keys:
+            return {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(keys))
+        cursor.execute(f'SELECT key, value, type FROM system_settings WHERE key IN ({placeholders})', list(keys))
+        rows = cursor.fetchall()
+        conn.close()
+        return {row['key']: self._cast_setting(row['value'], row['type']) for row in rows}
+
     def set_system_setting(self, key: str, value: Any, description: str = None, value_type: str = None):
         """Set system setting"""
         conn = self._get_connection()
@@ -695,6 +941,26 @@ class Database:
         
         return stats
     
+    def list_category_upload_stats(self, course_id: int = 1) -> List[Dict]:
+        """Get per-category upload stats for a course, shaped for API output"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT 
+                category AS name,
+                COUNT(DISTINCT video_name) AS video_count,
+                SUM(chunks_created) AS chunk_count
+            FROM uploads
+            WHERE course_id = ?
+            GROUP BY category
+        ''', (course_id,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     # ========================================================================
     # SESSION OPERATIONS
     # ========================================================================
@@ -735,6 +1001,34 @@ class Database:
             return dict(row)
         return None
     
+    def get_session_bundle(self, session_id: int) -> Optional[Dict]:
+        """Get a session (with user details) and its stored report in one query"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT s.*, u.username, u.name,
+                   r.id AS report_id, r.report_html, r.generated_at AS report_generated_at
+            FROM sessions s 
+            JOIN users u ON s.user_id = u.id 
+            LEFT JOIN reports r ON r.session_id = s.id
+            WHERE s.id = ?
+        ''', (session_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        session = dict(row)
+        report_id = session.pop('report_id')
+        report_html = session.pop('report_html')
+        generated_at = session.pop('report_generated_at')
+        report = None
+        if report_id is not None:
+            report = {'id': report_id, 'session_id': session_id, 'report_html': report_html, 'generated_at': generated_at}
+        return {'session': session, 'report': report}
+    
     def complete_session(self, session_id: int, overall_score: Optional[float] = None):
         """Mark session as completed"""
         conn = self._get_connection()
@@ -779,6 +1073,65 @@ class Database:
         
         return [dict(row) for row in rows]
     
+    def get_latest_active_session(self, user_id: int) -> Optional[Dict]:
+        """Get a user's most recently started active session, if any"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM sessions
+            WHERE user_id = ? AND status = 'active'
+            ORDER BY started_at DESC
+            LIMIT 1
+        ''', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    def get_progress_counters(self, user_id: int, course_id: Optional[int] = None) -> Dict:
+        """Count a user's completed, high-scoring (>= 8.0) and field-ready completed sessions"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        query = '''
+            SELECT
+                COALESCE(SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END), 0) AS completed,
+                COALESCE(SUM(CASE WHEN status = 'completed' AND overall_score >= 8.0 THEN 1 ELSE 0 END), 0) AS high_score,
+                COALESCE(SUM(CASE WHEN status = 'completed' AND difficulty = 'field-ready' THEN 1 ELSE 0 END), 0) AS field_ready
+            FROM sessions
+            WHERE user_id = ?
+        '''
+        params = [user_id]
+        if course_id:
+            query += ' AND course_id = ?'
+            params.append(course_id)
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row)
+    
+    def get_sessions_for_users(self, user_ids: List[int], course_id: Optional[int] = None) -> Dict[int, List[Dict]]:
+        """Get sessions for several users in one query, grouped by user_id (newest first)"""
+        grouped = {uid: [] for uid in user_ids}
+        if not user_ids:
+            return grouped
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(user_ids))
+        query = f'SELECT * FROM sessions WHERE user_id IN ({placeholders})'
+        params = list(user_ids)
+        if course_id:
+            query += ' AND course_id = ?'
+            params.append(course_id)
+        query += ' ORDER BY started_at DESC'
+        cursor.execute(query, params)
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        for row in rows:
+            grouped[row['user_id']].append(dict(row))
+        return grouped
+    
     def update_session_tags(self, session_id: int, tags: Optional[str]):
         """Update tags for a session (comma-separated string)"""
         conn = self._get_connection()
@@ -791,8 +1144,13 @@ class Database:
                        min_score: Optional[float] = None, max_score: Optional[float] = None,
                        category: Optional[str] = None, role: Optional[str] = None, search_term: Optional[str] = None,
                        course_id: Optional[int] = None,
-                       page: int = 1, limit: int = 20) -> Tuple[List[Dict], int]:
-        """Search sessions with multiple filters"""
+                       page: int = 1, limit: int = 20,
+                       include_total: bool = True) -> Tuple[List[Dict], Optional[int]]:
+        """Search sessions with multiple filters.
+        
+        With include_total=False the COUNT query is skipped and total is None
+        (clients paging through a result set they already counted).
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -864,8 +1222,10 @@ class Database:
             count_params.extend([term, term])
             
         # Get total count
-        cursor.execute(count_query, count_params)
-        total_count = cursor.fetchone()[0]
+        total_count = None
+        if include_total:
+            cursor.execute(count_query, count_params)
+            total_count = cursor.fetchone()[0]
         
         # Get paginated results
         query += ' ORDER BY s.started_at DESC LIMIT ? OFFSET ?'
@@ -877,6 +1237,23 @@ class Database:
         
         return [dict(row) for row in rows], total_count
     
+    def get_session_if_owned(self, session_id: int, user_id: int) -> Optional[Dict]:
+        """Get session by ID (as get_session) only if it belongs to user_id"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT s.*, u.username, u.name
+            FROM sessions s
+            JOIN users u ON s.user_id = u.id
+            WHERE s.id = ? AND s.user_id = ?
+            LIMIT 1
+        ''', (session_id, user_id))
+
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
     def verify_session_owner(self, session_id: int, user_id: int) -> bool:
         """Verify if a user owns a session"""
         conn = self._get_connection()
@@ -923,18 +1300,24 @@ class Database:
     # MESSAGE OPERATIONS
     # ========================================================================
     
-    def add_message(self, session_id: int, role: str, content: str, context_source: str, evaluation_data: Optional[Dict] = None):
-        """Add a message to a session"""
-        conn = self._get_connection()
+    def add_message(self, session_id: int, role: str, content: str, context_source: str,
+                    evaluation_data: Optional[Dict] = None, conn=None) -> int:
+        """Add a message to a session (inside the caller's transaction when conn is given)"""
+        own_conn = conn is None
+        if own_conn:
+            conn = self._get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
             INSERT INTO messages (session_id, role, content, context_source, evaluation_data)
             VALUES (?, ?, ?, ?, ?)
         ''', (session_id, role, content, context_source, json.dumps(evaluation_data) if evaluation_data is not None else None))
+        message_id = cursor.lastrowid
         
-        conn.commit()
-        conn.close()
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return message_id
     
     def get_session_messages(self, session_id: int) -> List[Dict]:
         """Get all messages for a session"""
@@ -976,6 +1359,36 @@ class Database:
         conn.commit()
         conn.close()
     
+    def save_report_and_complete(self, session_id: int, report_html: str, overall_score: Optional[float],
+                                 report_type: Optional[str] = None, last_evaluation_id: Optional[int] = None):
+        """Save a session's report and mark the session completed in one transaction"""
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO reports (session_id, report_html, report_type, last_evaluation_id)
+                VALUES (?, ?, ?, ?)
+            ''', (session_id, report_html, report_type, last_evaluation_id))
+            conn.execute('''
+                UPDATE sessions
+                SET status = 'completed', ended_at = CURRENT_TIMESTAMP,
+                    overall_score = COALESCE(?, overall_score)
+                WHERE id = ?
+            ''', (overall_score, session_id))
+            conn.commit()
+
+    def get_latest_evaluation_id(self, session_id: int) -> Optional[int]:
+        """Id of the session's most recent answer evaluation (None if it has none)"""
+        conn = self._get_connection()
+        row = conn.execute('SELECT MAX(id) FROM answer_evaluations WHERE session_id = ?', (session_id,)).fetchone()
+        conn.close()
+        return row[0]
+
+    def invalidate_saved_report(self, session_id: int):
+        """Mark a stored report as outdated so it is rebuilt on next view"""
+        conn = self._get_connection()
+        conn.execute('UPDATE reports SET report_type = NULL WHERE session_id = ?', (session_id,))
+        conn.commit()
+        conn.close()
+
     def save_view(self, admin_id: int, name: str, filters_json: str, shared: bool = False) -> int:
         """Save a search view for an admin"""
         conn = self._get_connection()
@@ -1037,16 +1450,119 @@ class Database:
 
     def save_session_draft(self, session_id: int, data_json: str):
         """Save autosave draft for a session"""
+        self.save_session_drafts([(session_id, data_json)])
+
+    def save_session_drafts(self, drafts: List[Tuple[int, str]]):
+        """Upsert several (session_id, data_json) autosave drafts in one transaction"""
+        if not drafts:
+            return
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.executemany('''
             INSERT INTO session_drafts (session_id, data_json)
             VALUES (?, ?)
             ON CONFLICT(session_id) DO UPDATE SET data_json=excluded.data_json, updated_at=CURRENT_TIMESTAMP
-        ''', (session_id, data_json))
+        ''', drafts)
+        conn.commit()
+        conn.close()
+
+    def get_cached_embeddings(self, text_hashes: List[bytes], model: str) -> Dict[bytes, bytes]:
+        """Look up cached embedding blobs by text hash; returns {text_hash: embedding_blob} for hits"""
+        found = {}
+        if not text_hashes:
+            return found
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(text_hashes), 500):
+            chunk = text_hashes[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                f'SELECT text_hash, embedding FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})',
+                [model, *chunk]
+            )
+            found.update((row[0], row[1]) for row in cursor.fetchall())
+        conn.close()
+        return found
+
+    def save_cached_embeddings(self, entries: List[Tuple[bytes, bytes]], model: str):
+        """Store (text_hash, embedding_blob) pairs for a model"""
+        if not entries:
+            return
+        conn = self._get_connection()
+        conn.executemany(
+            'INSERT OR REPLACE INTO embedding_cache (text_hash, model, embedding) VALUES (?, ?, ?)',
+            [(text_hash, model, blob) for text_hash, blob in entries]
+        )
+        conn.commit()
+        conn.close()
+
+    def get_llm_cache(self, cache_key: str, max_age_seconds: int) -> Optional[bytes]:
+        """Stored completion payload for a prompt key, if written within max_age_seconds"""
+        conn = self._get_connection()
+        row = conn.execute(
+            "SELECT payload FROM llm_cache WHERE cache_key = ? AND created_at >= datetime('now', ?)",
+            (cache_key, f'-{int(max_age_seconds)} seconds')
+        ).fetchone()
+        conn.close()
+        return row['payload'] if row else None
+
+    def save_llm_cache(self, cache_key: str, payload: bytes, max_age_seconds: int):
+        """Store a completion payload, dropping entries older than max_age_seconds"""
+        conn = self._get_connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO llm_cache (cache_key, payload, created_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+            (cache_key, payload)
+        )
+        conn.execute("DELETE FROM llm_cache WHERE created_at < datetime('now', ?)", (f'-{int(max_age_seconds)} seconds',))
         conn.commit()
         conn.close()
 
+    def get_namespace_content(self, namespace: str) -> Optional[Tuple[str, int]]:
+        """(content_hash, chunks) last indexed into a Pinecone namespace, if recorded"""
+        conn = self._get_connection()
+        row = conn.execute('SELECT content_hash, chunks FROM namespace_content WHERE namespace = ?', (namespace,)).fetchone()
+        conn.close()
+        return (row['content_hash'], row['chunks']) if row else None
+
+    def save_namespace_content(self, namespace: str, content_hash: str, chunks: int):
+        """Record the content just indexed into a Pinecone namespace"""
+        conn = self._get_connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO namespace_content (namespace, content_hash, chunks, indexed_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)',
+            (namespace, content_hash, chunks)
+        )
+        conn.commit()
+        conn.close()
+
+    def delete_namespace_content(self, namespaces: List[str]):
+        """Forget recorded content for namespaces whose vectors were deleted"""
+        if not namespaces:
+            return
+        conn = self._get_connection()
+        conn.executemany('DELETE FROM namespace_content WHERE namespace = ?', [(ns,) for ns in namespaces])
+        conn.commit()
+        conn.close()
+
+    def save_expected_embeddings(self, entries: List[Tuple[int, bytes, Optional[float]]]):
+        """Store (question_id, embedding_blob, scale) entries for prepared questions"""
+        if not entries:
+            return
+        conn = self._get_connection()
+        conn.executemany(
+            'INSERT OR REPLACE INTO question_embeddings (question_id, embedding, scale) VALUES (?, ?, ?)',
+            entries
+        )
+        conn.commit()
+        conn.close()
+
+    def get_expected_embedding(self, question_id: int) -> Optional[Tuple[bytes, Optional[float]]]:
+        """Stored (embedding_blob, scale) for a question's expected answer, if any"""
+        conn = self._get_connection()
+        row = conn.execute('SELECT embedding, scale FROM question_embeddings WHERE question_id = ?', (question_id,)).fetchone()
+        conn.close()
+        return (row['embedding'], row['scale']) if row else None
+
     def get_session_draft(self, session_id: int) -> Optional[Dict]:
         """Get draft for a session"""
         conn = self._get_connection()
@@ -1083,7 +1599,10 @@ class Database:
         conn = self._get_connection()
         cursor = conn.cursor()
         inserted_ids: List[int] = []
-        for i, q in enumerate(questions, start=1):
+        # Positions stay unique within a session: a re-prepared session continues after its earlier questions
+        cursor.execute('SELECT COALESCE(MAX(position), 0) FROM question_bank WHERE session_id = ?', (session_id,))
+        start = cursor.fetchone()[0] + 1
+        for i, q in enumerate(questions, start=start):
             key_points_json = json.dumps(q.get('key_points', []))
             cursor.execute('''
                 INSERT INTO question_bank 
@@ -1100,6 +1619,8 @@ class Database:
                 1 if q.get('is_objection') else 0
             ))
             inserted_ids.append(cursor.lastrowid)
+        # The question list changed, so the next-question cursor must be recomputed
+        cursor.execute('UPDATE sessions SET current_question_index = NULL WHERE id = ?', (session_id,))
         conn.commit()
         conn.close()
         return inserted_ids
@@ -1136,6 +1657,65 @@ class Database:
         conn.close()
         return [dict(r) for r in rows]
 
+    def get_question_by_id(self, question_id: int, session_id: int) -> Optional[Dict]:
+        """Get a single prepared question, scoped to its session"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM question_bank
+            WHERE id = ? AND session_id = ?
+            LIMIT 1
+        ''', (question_id, session_id))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_session_questions_with_evals(self, session_id: int) -> List[Dict]:
+        """Get a session's questions (by position), each with its latest evaluation or None"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT q.*,
+                   e.id AS eval_id, e.user_answer, e.accuracy, e.completeness, e.clarity,
+                   e.tone, e.technique, e.closing, e.overall_score, e.feedback, e.evidence,
+                   e.objection_score, e.technique_adherence, e.what_correct, e.what_missed,
+                   e.what_wrong, e.created_at AS eval_created_at
+            FROM question_bank q
+            LEFT JOIN answer_evaluations e
+                ON e.id = (SELECT MAX(id) FROM answer_evaluations WHERE question_id = q.id)
+            WHERE q.session_id = ?
+            ORDER BY q.position ASC
+        ''', (session_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        question_cols = [c for c in rows[0].keys() if c not in _EVAL_JOIN_COLUMNS] if rows else []
+        questions = []
+        for row in rows:
+            question = {c: row[c] for c in question_cols}
+            evaluation = None
+            if row['eval_id'] is not None:
+                evaluation = {c: row[c] for c in _EVAL_JOIN_COLUMNS}
+                evaluation['id'] = evaluation.pop('eval_id')
+                evaluation['created_at'] = evaluation.pop('eval_created_at')
+                evaluation['session_id'] = session_id
+                evaluation['question_id'] = question['id']
+            question['evaluation'] = evaluation
+            questions.append(question)
+        return questions
+    
+    def get_session_average_score(self, session_id: int) -> Optional[float]:
+        """Average overall_score across a session's evaluations (None if none scored)"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT AVG(overall_score) FROM answer_evaluations WHERE session_id = ? AND overall_score IS NOT NULL',
+            (session_id,)
+        )
+        avg = cursor.fetchone()[0]
+        conn.close()
+        return round(avg, 1) if avg is not None else None
+    
     def get_next_unanswered_question(self, session_id: int) -> Optional[Dict]:
         """Get the next question that has not yet been evaluated"""
         conn = self._get_connection()
@@ -1152,10 +1732,35 @@ class Database:
         conn.close()
         return dict(row) if row else None
 
-    def save_answer_evaluation(self, session_id: int, question_id: int, evaluation: Dict):
-        """Save evaluation results for an answer"""
+    def get_question_at_position(self, session_id: int, position: int) -> Optional[Dict]:
+        """Get the question at a given position in a session"""
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM question_bank
+            WHERE session_id = ? AND position = ?
+            ORDER BY id ASC
+            LIMIT 1
+        ''', (session_id, position))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def has_prepared_questions(self, session_id: int) -> bool:
+        """Check whether any questions have been prepared for a session"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM question_bank WHERE session_id = ? LIMIT 1', (session_id,))
+        result = cursor.fetchone()
+        conn.close()
+        return result is not None
+
+    def save_answer_evaluation(self, session_id: int, question_id: int, evaluation: Dict, conn=None):
+        """Save evaluation results for an answer (inside the caller's transaction when conn is given)"""
+        own_conn = conn is None
+        if own_conn:
+            conn = self._get_connection()
+        cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO answer_evaluations
             (session_id, question_id, user_answer, accuracy, completeness, clarity, tone, technique, closing, overall_score, feedback, evidence, objection_score, technique_adherence, what_correct, what_missed, what_wrong)
@@ -1179,8 +1784,19 @@ class Database:
             evaluation.get('what_missed'),
             evaluation.get('what_wrong') if isinstance(evaluation.get('what_wrong'), str) else json.dumps(evaluation.get('what_wrong')) if evaluation.get('what_wrong') is not None else None
         ))
-        conn.commit()
-        conn.close()
+        # Move the session's cursor to the first unanswered question (past the end when all are answered)
+        cursor.execute('''
+            UPDATE sessions SET current_question_index = COALESCE(
+                (SELECT MIN(qb.position) FROM question_bank qb
+                 WHERE qb.session_id = ?
+                   AND NOT EXISTS (SELECT 1 FROM answer_evaluations ae WHERE ae.question_id = qb.id)),
+                (SELECT COALESCE(MAX(position), 0) + 1 FROM question_bank WHERE session_id = ?)
+            )
+            WHERE id = ?
+        ''', (session_id, session_id, session_id))
+        if own_conn:
+            conn.commit()
+            conn.close()
 
     def update_session_notes(self, session_id: int, notes: str):
         """Update notes for a session"""
@@ -1215,6 +1831,26 @@ class Database:
         conn.commit()
         conn.close()
 
+    def log_audit_batch(self, events: List[Tuple]):
+        """Insert several audit events in one transaction.
+        
+        Each event is (user_id, action, resource_type, resource_id, details,
+        ip_address, user_agent, timestamp).
+        """
+        if not events:
+            return
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO audit_log 
+            (user_id, action, resource_type, resource_id, details, ip_address, user_agent, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', events)
+        
+        conn.commit()
+        conn.close()
+
     def get_audit_logs(self, user_id: Optional[int] = None,
                        action: Optional[str] = None,
                        start_date: Optional[str] = None,
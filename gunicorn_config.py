@@ -10,21 +10,26 @@ bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 # Workers = (2 x CPU cores) + 1
 workers = multiprocessing.cpu_count() * 2 + 1
 workers = min(workers, 4)  # Cap at 4 for free/starter tier
+workers = int(os.environ.get('WEB_CONCURRENCY', workers))
 
-# Threads per worker
-threads = 4
+# Threads per worker - handlers spend most of their time waiting on SQLite,
+# OpenAI/OpenRouter and Pinecone, so several requests can share a process
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 
 # Timeout for requests (seconds)
 timeout = 120
 
-# Worker class
-worker_class = 'sync'
+# Worker class (threaded workers; 'sync' would serve one request per process)
+worker_class = 'gthread'
 
 # Logging
 accesslog = '-'
 errorlog = '-'
 loglevel = 'info'
 
+# Serve file responses (send_file) with sendfile(2) instead of copying through Python
+sendfile = True
+
 # Keep-alive connections
 keepalive = 5
 
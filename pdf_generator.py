@@ -42,7 +42,8 @@ def generate_session_pdf(session_data, report_data, output_path):
     Args:
         session_data (dict): Session details (user, date, score, etc.)
         report_data (dict): Report content (html, feedback)
-        output_path (str): Path to save the PDF
+        output_path (str or file-like): Path to save the PDF, or a binary
+            buffer (e.g. io.BytesIO) to render into without touching disk
     """
     doc = SimpleDocTemplate(
         output_path,
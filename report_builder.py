@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import List, Optional
 import json
 
 
@@ -26,15 +26,8 @@ def _avg(values: List[Optional[float]]) -> Optional[float]:
 def build_enhanced_report_html(db, session_id: int) -> str:
     session = db.get_session(session_id)
     user = db.get_user_by_id(session['user_id']) if session else None
-    questions = db.get_session_questions(session_id)
-
-    # Map question_id -> evaluation row
-    # We will fetch all evaluations by joining in memory using db helper
-    # Since there is no dedicated fetch, we infer by reading all from table via existing methods
-    # Reuse get_session_questions and then for each question, attempt to find an evaluation via a simple query
-    # Implement a tiny local fetch using database connection
-    eval_rows = db.execute_query('SELECT * FROM answer_evaluations WHERE session_id = ?', (session_id,))
-    eval_by_qid: Dict[int, Dict] = {e['question_id']: e for e in eval_rows}
+    # Questions with their latest evaluation, in one query
+    questions = db.get_session_questions_with_evals(session_id)
 
     # Compute dimension scores
     factual_scores: List[Optional[float]] = []
@@ -48,12 +41,11 @@ def build_enhanced_report_html(db, session_id: int) -> str:
     strengths: List[str] = []
     improvements: List[str] = []
     for q in questions:
-        qid = q['id']
         qtext = q['question_text']
         exp = q.get('expected_answer') or ''
         src = q.get('source') or ''
         is_obj = bool(q.get('is_objection'))
-        ev = eval_by_qid.get(qid)
+        ev = q['evaluation']
         user_answer = ev.get('user_answer') if ev else None
         overall = ev.get('overall_score') if ev else None
         clarity = ev.get('clarity') if ev else None
@@ -249,19 +241,12 @@ def build_enhanced_report_html(db, session_id: int) -> str:
 def build_candidate_report_html(db, session_id: int) -> str:
     session = db.get_session(session_id)
     user = db.get_user_by_id(session['user_id']) if session else None
-    questions = db.get_session_questions(session_id)
-    conn = db._get_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT * FROM answer_evaluations WHERE session_id = ?', (session_id,))
-    eval_rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    eval_by_qid: Dict[int, Dict] = {e['question_id']: e for e in eval_rows}
+    questions = db.get_session_questions_with_evals(session_id)
     rows_html = []
     for q in questions:
-        qid = q['id']
         qtext = q['question_text']
         exp = q.get('expected_answer') or ''
-        ev = eval_by_qid.get(qid)
+        ev = q['evaluation']
         user_answer = ev.get('user_answer') if ev else None
         rows_html.append(f"""
         <tr class='border-t'>
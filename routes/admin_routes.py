@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app, session, Response
 from services.auth_service import register_user, list_users, delete_user
-from services.pinecone_service import process_and_upload, delete_category_namespaces
+from services.pinecone_service import process_and_upload, delete_category_namespaces, get_namespaces_for_category, forget_namespace_content
+from services.training_service import CATEGORY_CONTENT_CACHE_PREFIX
 from sync_pinecone_full import sync_pinecone_full
 from utils.decorators import admin_required, role_required
-from utils.cache import cache_get, cache_set
+from utils.cache import cache_get, cache_set, cache_delete, cache_delete_prefix
+from utils.responses import conditional_json
 from extensions import db, limiter
 from services.audit_service import log_audit
 from import_users import import_users_from_csv
@@ -20,6 +22,13 @@ logger = logging.getLogger(__name__)
 admin_bp = Blueprint('admin', __name__)
 viewer_bp = Blueprint('viewer', __name__)
 
+def _pagination(total, page, limit):
+    """Pagination block for list responses; total may be None when the count was skipped"""
+    pages = None
+    if total is not None:
+        pages = -(-total // limit) if limit > 0 else 0
+    return {'total': total, 'page': page, 'limit': limit, 'pages': pages}
+
 @admin_bp.route('/upload', methods=['POST'])
 @admin_required
 def upload_content_route():
@@ -30,6 +39,8 @@ def upload_content_route():
     category = request.form.get('category')
     video_name = request.form.get('video_name')
     course_id = request.form.get('course_id', 1, type=int)
+    # Re-index even if this exact content was already uploaded for the video
+    force = request.form.get('force', 'false').lower() == 'true'
     
     if not file or not category or not video_name:
         return jsonify({'error': 'missing_fields'}), 400
@@ -42,7 +53,7 @@ def upload_content_route():
         content = file.read().decode('utf-8')
         
         # Process and upload to Pinecone
-        result = process_and_upload(content, category, video_name, course_id=course_id)
+        result = process_and_upload(content, category, video_name, course_id=course_id, force=force)
         
         # Save to database
         db.create_upload_record(
@@ -53,12 +64,15 @@ def upload_content_route():
             uploaded_by=session['user_id'],
             course_id=course_id
         )
+        cache_delete_prefix('categories:')
+        cache_delete_prefix(CATEGORY_CONTENT_CACHE_PREFIX)
         
         return jsonify({
             'success': True,
             'category': category,
             'video_name': video_name,
             'chunks': result['chunks'],
+            'skipped': result.get('skipped', False),
             'course_id': course_id
         })
         
@@ -93,7 +107,8 @@ def update_settings():
             # We don't update description/type from here usually
             db.set_system_setting(key, value)
             updated += 1
-            
+    
+    cache_delete_prefix('setting:')
     return jsonify({'success': True, 'updated': updated})
 
 @admin_bp.route('/users', methods=['GET'])
@@ -108,12 +123,7 @@ def list_users_route():
     
     return jsonify({
         'users': users,
-        'pagination': {
-            'total': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': (total_count + limit - 1) // limit
-        }
+        'pagination': _pagination(total_count, page, limit)
     })
 
 @admin_bp.route('/users', methods=['POST'])
@@ -176,11 +186,12 @@ def dashboard_route():
     # Get users by role (default 'candidate')
     raw_users, total_count = list_users(role=role_filter, page=page, limit=limit, search=search)
     
-    # Enrich users with session stats for dashboard cards
+    # Enrich users with session stats for dashboard cards (one query for the whole page)
+    sessions_by_user = db.get_sessions_for_users([u['id'] for u in raw_users], course_id=course_id)
     users_with_stats = []
     for u in raw_users:
         try:
-            sessions = db.get_user_sessions(u['id'], course_id=course_id)
+            sessions = sessions_by_user.get(u['id'], [])
             total_sessions = len(sessions)
             completed = [s for s in sessions if (s.get('status') == 'completed')]
             completed_count = len(completed)
@@ -258,12 +269,7 @@ def dashboard_route():
     
     return jsonify({
         'candidates': users_with_stats,
-        'pagination': {
-            'total': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': (total_count + limit - 1) // limit if limit > 0 else 0
-        },
+        'pagination': _pagination(total_count, page, limit),
         'stats': stats
     })
 
@@ -272,6 +278,8 @@ def dashboard_route():
 def sync_content_route():
     try:
         result = sync_pinecone_full()
+        cache_delete_prefix('categories:')
+        cache_delete_prefix(CATEGORY_CONTENT_CACHE_PREFIX)
         if result and 'error' in result:
              return jsonify({'error': 'sync_failed', 'message': result['error']}), 500
         return jsonify(result or {'added': 0, 'deleted': 0})
@@ -315,6 +323,8 @@ def delete_course_category_route(course_id, category_id):
         
         # Delete from DB
         success = db.delete_course_category(course_id, category_id)
+        cache_delete_prefix('categories:')
+        cache_delete_prefix(CATEGORY_CONTENT_CACHE_PREFIX)
         
         if success:
             return jsonify({'success': True, 'deleted_namespaces': deleted_namespaces})
@@ -332,7 +342,14 @@ def delete_course_route(course_id):
         course = db.get_course_by_id(course_id)
         if not course:
             return jsonify({'error': 'not_found'}), 404
+        # Namespace names depend on the course's slug and uploads, so resolve them before deleting
+        namespaces = [ns for cat in db.get_course_categories(course_id)
+                      for ns in get_namespaces_for_category(cat['name'], course_id)]
         db.delete_course(course_id)
+        forget_namespace_content(namespaces)
+        cache_delete_prefix('categories:')
+        cache_delete_prefix(CATEGORY_CONTENT_CACHE_PREFIX)
+        cache_delete(f"course_slug:{course_id}")
         try:
             details = f"Deleted course '{course.get('name')}' ({course.get('slug')})"
             log_audit('course_deleted', 'course', course_id, details)
@@ -358,6 +375,7 @@ def add_course_category_route(course_id):
         return jsonify({'error': 'missing_name'}), 400
     try:
         cat_id = db.add_course_category(course_id, name, display_order)
+        cache_delete_prefix('categories:')
         return jsonify({'success': True, 'category_id': cat_id})
     except Exception as e:
         return jsonify({'error': 'create_failed', 'message': str(e)}), 500
@@ -422,10 +440,11 @@ def viewer_dashboard_route():
     role_filter = request.args.get('role', 'candidate')
     course_id = request.args.get('course_id', 1, type=int)
     raw_users, total_count = list_users(role=role_filter, page=page, limit=limit, search=search)
+    sessions_by_user = db.get_sessions_for_users([u['id'] for u in raw_users], course_id=course_id)
     users_with_stats = []
     for u in raw_users:
         try:
-            sessions = db.get_user_sessions(u['id'], course_id=course_id)
+            sessions = sessions_by_user.get(u['id'], [])
             total_sessions = len(sessions)
             completed = [s for s in sessions if (s.get('status') == 'completed')]
             completed_count = len(completed)
@@ -491,12 +510,7 @@ def viewer_dashboard_route():
     stats = db.get_global_stats(role=role_filter, course_id=course_id)
     return jsonify({
         'candidates': users_with_stats,
-        'pagination': {
-            'total': total_count,
-            'page': page,
-            'limit': limit,
-            'pages': (total_count + limit - 1) // limit if limit > 0 else 0
-        },
+        'pagination': _pagination(total_count, page, limit),
         'stats': stats
     })
 @admin_bp.route('/sessions/bulk-delete', methods=['POST'])
@@ -804,7 +818,7 @@ def delete_session(session_id):
 def update_session_notes_route(session_id):
     """Update session notes"""
     try:
-        data = request.json
+        data = request.get_json(silent=True) or {}
         notes = data.get('notes')
         
         if notes is None:
@@ -830,6 +844,8 @@ def search_sessions_route():
     category = request.args.get('category')
     role = request.args.get('role')
     course_id = request.args.get('course_id', 1, type=int)
+    # Later pages may skip the COUNT when the client already has the total
+    include_total = page == 1 or request.args.get('include_total', '1') != '0'
     
     # Use existing db helper to search sessions
     sessions, total = db.search_sessions(
@@ -842,17 +858,13 @@ def search_sessions_route():
         max_score=max_score,
         category=category,
         role=role,
-        course_id=course_id
+        course_id=course_id,
+        include_total=include_total
     )
     
-    return jsonify({
+    return conditional_json({
         'sessions': sessions,
-        'pagination': {
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'pages': (total + limit - 1) // limit if limit > 0 else 0
-        }
+        'pagination': _pagination(total, page, limit)
     })
 
 @viewer_bp.route('/sessions/search', methods=['GET'])
@@ -869,6 +881,7 @@ def viewer_search_sessions_route():
     category = request.args.get('category')
     role = request.args.get('role')
     course_id = request.args.get('course_id', 1, type=int)
+    include_total = page == 1 or request.args.get('include_total', '1') != '0'
     sessions, total = db.search_sessions(
         search_term=search,
         page=page,
@@ -879,16 +892,12 @@ def viewer_search_sessions_route():
         max_score=max_score,
         category=category,
         role=role,
-        course_id=course_id
+        course_id=course_id,
+        include_total=include_total
     )
-    return jsonify({
+    return conditional_json({
         'sessions': sessions,
-        'pagination': {
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'pages': (total + limit - 1) // limit if limit > 0 else 0
-        }
+        'pagination': _pagination(total, page, limit)
     })
 
 @viewer_bp.route('/sessions/user/<int:user_id>', methods=['GET'])
@@ -897,7 +906,7 @@ def viewer_get_user_sessions_route(user_id: int):
     try:
         course_id = request.args.get('course_id', 1, type=int)
         sessions = db.get_user_sessions(user_id, course_id=course_id)
-        return jsonify({'sessions': sessions})
+        return conditional_json({'sessions': sessions})
     except Exception as e:
         logger.error(f"Failed to get user sessions for viewer: {e}")
         return jsonify({'error': 'server_error'}), 500
@@ -908,19 +917,8 @@ def get_categories_stats_route():
     """Get upload statistics by category"""
     try:
         course_id = request.args.get('course_id', 1, type=int)
-        stats = db.get_upload_stats_by_category(course_id=course_id)
-        
-        # Format for frontend
-        categories_list = []
-        for category, data in stats.items():
-            categories_list.append({
-                'name': category,
-                'video_count': data['video_count'],
-                'chunk_count': data['total_chunks']
-            })
-            
         return jsonify({
-            'categories': categories_list
+            'categories': db.list_category_upload_stats(course_id=course_id)
         })
     except Exception as e:
         logger.error(f"Error getting category stats: {e}")
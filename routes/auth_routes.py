@@ -4,21 +4,26 @@ from services.audit_service import log_audit
 from utils.decorators import login_required
 from validators import LoginRequest
 from extensions import limiter
+from flask_limiter.util import get_remote_address
 
 auth_bp = Blueprint('auth', __name__)
 
+def _login_attempt_key():
+    """Rate-limit key for login attempts: client address + submitted username"""
+    data = request.get_json(silent=True) or {}
+    username = str(data.get('username', '')).strip().lower()[:64]
+    return f"login:{get_remote_address()}:{username}"
+
 @auth_bp.route('/login', methods=['POST'])
 @limiter.limit("5 per minute")
+# Only failed attempts count; once exhausted the request is rejected before bcrypt runs
+@limiter.limit("10 per 15 minutes", key_func=_login_attempt_key,
+               deduct_when=lambda response: response.status_code == 401)
 def login():
     """Login endpoint for both admin and candidates"""
     try:
-        data = request.json
-        
-        # Validate input
-        login_req = LoginRequest(
-            username=data.get('username', ''),
-            password=data.get('password', '')
-        )
+        # Validate input (malformed bodies fail validation instead of raising)
+        login_req = LoginRequest.from_json(request.get_json(silent=True))
         login_req.validate()
         
         user = authenticate_user(login_req.username.strip(), login_req.password)
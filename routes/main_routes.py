@@ -7,26 +7,34 @@ main_bp = Blueprint('main', __name__)
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 STATIC_DIR = os.path.join(FRONTEND_DIR, 'static')
 
+LOGIN_HTML = os.path.join(FRONTEND_DIR, 'login.html')
+ADMIN_DASHBOARD_HTML = os.path.join(FRONTEND_DIR, 'admin-dashboard.html')
+ADMIN_DASHBOARD_JS = os.path.join(FRONTEND_DIR, 'admin-dashboard.js')
+TRAINER_HTML = os.path.join(FRONTEND_DIR, 'trainer.html')
+
+# Browsers may reuse frontend files for a few minutes, then revalidate via ETag/Last-Modified
+FRONTEND_MAX_AGE = 300
+
 @main_bp.route('/', methods=['GET'])
 def root_page():
-    return send_file(os.path.join(FRONTEND_DIR, 'login.html'))
+    return send_file(LOGIN_HTML, max_age=FRONTEND_MAX_AGE)
 
 @main_bp.route('/login.html', methods=['GET'])
 def login_page():
-    return send_file(os.path.join(FRONTEND_DIR, 'login.html'))
+    return send_file(LOGIN_HTML, max_age=FRONTEND_MAX_AGE)
 
 @main_bp.route('/admin-dashboard.html', methods=['GET'])
 def admin_dashboard_page():
-    return send_file(os.path.join(FRONTEND_DIR, 'admin-dashboard.html'))
+    return send_file(ADMIN_DASHBOARD_HTML, max_age=FRONTEND_MAX_AGE)
 
 @main_bp.route('/admin-dashboard.js', methods=['GET'])
 def admin_dashboard_js():
-    return send_file(os.path.join(FRONTEND_DIR, 'admin-dashboard.js'))
+    return send_file(ADMIN_DASHBOARD_JS, max_age=FRONTEND_MAX_AGE)
 
 @main_bp.route('/trainer.html', methods=['GET'])
 def trainer_page():
-    return send_file(os.path.join(FRONTEND_DIR, 'trainer.html'))
+    return send_file(TRAINER_HTML, max_age=FRONTEND_MAX_AGE)
 
 @main_bp.route('/static/<path:filename>', methods=['GET'])
 def static_files(filename):
-    return send_from_directory(STATIC_DIR, filename)
+    return send_from_directory(STATIC_DIR, filename, max_age=FRONTEND_MAX_AGE)
@@ -1,43 +1,107 @@
-from flask import Blueprint, send_file, session, jsonify, request
+import glob
+import hashlib
+import io
+import os
+import tempfile
+import time
+from flask import Blueprint, send_file, session, jsonify, request, Response
 from utils.decorators import login_required
+from utils.responses import conditional_json
 from extensions import db
+from report_builder import build_enhanced_report_html, build_candidate_report_html
 from config_logging import get_logger
 
 logger = get_logger('session_routes')
 
 session_bp = Blueprint('session', __name__)
 
+# Rendered PDFs are cached on disk, keyed by the session fields and report HTML they are built from
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ahl_pdf_cache'))
+# Renders of a session that nobody has downloaded for this long are pruned when a newer one is stored;
+# anything younger may still be mid-download in another request, so it is left alone
+PDF_CACHE_MAX_AGE = int(os.environ.get('PDF_CACHE_MAX_AGE', 7 * 24 * 3600))
+PDF_KEY_FIELDS = ('status', 'ended_at', 'overall_score', 'username', 'category', 'difficulty', 'duration_minutes', 'hide_scores')
+
+
+def _pdf_cache_key(session_id, session_data, report_data):
+    """Content hash of everything that ends up in the rendered PDF"""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(str(session_id).encode())
+    for field in PDF_KEY_FIELDS:
+        h.update(f"|{session_data.get(field)}".encode())
+    h.update((report_data.get('report_html') or '').encode())
+    return h.hexdigest()
+
+def _store_cached_pdf(session_id, pdf_path, pdf_bytes):
+    """Write a rendered PDF into the cache (atomically) and prune the session's long-unused renders"""
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, pdf_path)
+    except OSError as e:
+        logger.warning(f"Could not cache PDF for session {session_id}: {e}")
+        return
+    cutoff = time.time() - PDF_CACHE_MAX_AGE
+    for stale in glob.glob(os.path.join(PDF_CACHE_DIR, f"session_report_{session_id}_*.pdf")):
+        try:
+            if stale != pdf_path and os.path.getmtime(stale) < cutoff:
+                os.remove(stale)
+        except OSError:
+            pass
+
 @session_bp.route('/<int:session_id>/export/pdf', methods=['GET'])
 @login_required
 def export_pdf(session_id):
     try:
-        session_data = db.get_session(session_id)
-        if not session_data:
+        bundle = db.get_session_bundle(session_id)
+        if not bundle:
             return jsonify({'error': 'not_found'}), 404
+        session_data = bundle['session']
         
         # Verify ownership or admin based on session data
         role = session.get('role')
         if session_data['user_id'] != session.get('user_id') and role not in ['admin', 'viewer']:
             return jsonify({'error': 'unauthorized'}), 403
         
-        report_data = db.get_report(session_id) or {'report_html': ''}
+        report_data = bundle['report'] or {'report_html': ''}
         if not report_data.get('report_html'):
             try:
-                from report_builder import build_enhanced_report_html, build_candidate_report_html
                 html = build_enhanced_report_html(db, session_id) if role in ['admin', 'viewer'] else build_candidate_report_html(db, session_id)
                 report_data['report_html'] = html or ''
             except Exception:
                 report_data['report_html'] = ''
-        output_path = f"/tmp/session_report_{session_id}.pdf"
-        
-        from app import generate_session_pdf
-        pdf_path = generate_session_pdf(session_data, report_data, output_path)
-            
+
+        key = _pdf_cache_key(session_id, session_data, report_data)
+        if key in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(key)
+            return response
+
+        pdf_path = os.path.join(PDF_CACHE_DIR, f"session_report_{session_id}_{key}.pdf")
+        if os.path.exists(pdf_path):
+            body = pdf_path
+            # Mark the render as in use so pruning keeps it
+            try:
+                os.utime(pdf_path)
+            except OSError:
+                pass
+        else:
+            # Render in memory and answer from the buffer; the disk copy only serves later downloads
+            from app import generate_session_pdf
+            buf = io.BytesIO()
+            generate_session_pdf(session_data, report_data, buf)
+            pdf_bytes = buf.getvalue()
+            _store_cached_pdf(session_id, pdf_path, pdf_bytes)
+            body = io.BytesIO(pdf_bytes)
+
         return send_file(
-            pdf_path,
+            body,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f'session_report_{session_id}.pdf'
+            download_name=f'session_report_{session_id}.pdf',
+            etag=key
         )
     except Exception as e:
         logger.error(f"PDF export failed: {e}")
@@ -47,18 +111,16 @@ def export_pdf(session_id):
 @login_required
 def get_user_sessions_route(user_id):
     """Get all sessions for a specific user"""
-    # Verify if user is requesting their own sessions or is admin
-    if session.get('user_id') != user_id:
-        user = db.get_user_by_id(session['user_id'])
-        if not user or user['role'] != 'admin':
-            return jsonify({'error': 'unauthorized'}), 403
+    # Verify if user is requesting their own sessions or is admin (role is set in the session at login)
+    if session.get('user_id') != user_id and session.get('role') != 'admin':
+        return jsonify({'error': 'unauthorized'}), 403
             
     try:
         # Get course_id from query params, default to 1
         course_id = request.args.get('course_id', 1, type=int)
         
         sessions = db.get_user_sessions(user_id, course_id=course_id)
-        return jsonify({'sessions': sessions})
+        return conditional_json({'sessions': sessions})
     except Exception as e:
         logger.error(f"Failed to get user sessions: {e}")
         return jsonify({'error': 'server_error'}), 500
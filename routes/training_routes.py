@@ -1,15 +1,134 @@
 from flask import Blueprint, request, jsonify, session
 import os
+import requests
 from services.training_service import prepare_questions, evaluate_answer, determine_adaptive_difficulty
-from utils.decorators import login_required
+from utils.decorators import login_required, current_user
 from extensions import db
 from report_builder import build_enhanced_report_html, build_candidate_report_html
 from validators import StartSessionRequest, validate_session_id
 from config_logging import get_logger
+from utils.cache import cache_get, cache_set, cache_delete_prefix
+from utils.background import submit_background
+from services.draft_service import buffer_draft, get_draft, discard_draft
+from datetime import datetime, timedelta, timezone
 import re
+import orjson
+from html import escape as _esc
 
 logger = get_logger('training_routes')
 
+# report_builder emits the overall_score meta tag at the very top of the report,
+# so only the head of the HTML needs scanning
+_OVERALL_SCORE_RE = re.compile(r'<meta\s+name=["\']overall_score["\']\s+content=["\']([^"\']*)["\']')
+_OVERALL_SCORE_SCAN_CHARS = 2048
+
+# Category listings only change on upload/sync/category edits, which invalidate this
+CATEGORIES_CACHE_TTL = 60
+
+# Row templates for the fallback report tables; every interpolated value is escaped
+_ROW_TMPL = (
+    "<tr class='border-t'><td class='p-3 align-top text-sm'>{q}</td>"
+    "<td class='p-3 align-top text-sm'>{ua}</td><td class='p-3 align-top text-sm'>{exp}</td></tr>"
+)
+_STAFF_ROW_TMPL = (
+    "<tr class='border-t'><td class='p-3 align-top text-sm'>{q}</td>"
+    "<td class='p-3 align-top text-sm'>{ua}</td><td class='p-3 align-top text-sm'>{exp}</td>"
+    "<td class='p-3 align-top text-sm'>{src}</td><td class='p-3 align-top text-sm text-center'>{score}</td></tr>"
+)
+
+
+def _fallback_rows_html(questions, staff=False):
+    """Render fallback report table rows from get_session_questions_with_evals output"""
+    tmpl = _STAFF_ROW_TMPL if staff else _ROW_TMPL
+    rows = []
+    for q in questions:
+        ev = q['evaluation'] or {}
+        score = ev.get('overall_score')
+        rows.append(tmpl.format(
+            q=_esc(q.get('question_text') or ''),
+            ua=_esc(ev.get('user_answer') or '—'),
+            exp=_esc(q.get('expected_answer') or '—'),
+            src=_esc(q.get('source') or '—'),
+            score=f"{score}/10" if score is not None else 'N/A'
+        ))
+    return "".join(rows)
+
+# Browsers get a short-lived Deepgram access token rather than the project key when one can be minted
+_DG_KEY = os.environ.get('DEEPGRAM_API_KEY', '')
+DEEPGRAM_GRANT_URL = 'https://api.deepgram.com/v1/auth/grant'
+DEEPGRAM_TOKEN_TTL = 300
+
+def _mint_deepgram_token():
+    """Cached temporary Deepgram token, or None if the key cannot mint one"""
+    token = cache_get('deepgram:token')
+    if token or cache_get('deepgram:grant_failed'):
+        return token
+    try:
+        resp = requests.post(
+            DEEPGRAM_GRANT_URL,
+            headers={'Authorization': f"Token {_DG_KEY}"},
+            json={'ttl_seconds': DEEPGRAM_TOKEN_TTL},
+            timeout=5
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        token = data['access_token']
+        expires_in = int(data.get('expires_in') or DEEPGRAM_TOKEN_TTL)
+    except Exception as e:
+        logger.warning(f"Deepgram token grant failed, falling back to API key: {e}")
+        cache_set('deepgram:grant_failed', True, DEEPGRAM_TOKEN_TTL)
+        return None
+    # Keep enough lifetime for the browser to open its socket after fetching the token
+    cache_set('deepgram:token', token, max(expires_in - 30, 1))
+    return token
+
+# Rendered reports of completed sessions are reused until the session changes again. The key
+# carries the latest evaluation id, so a worker that missed the invalidation still misses the cache.
+REPORT_CACHE_TTL = 3600
+
+def _report_cache_key(session_id, staff, last_evaluation_id):
+    return f"report:{session_id}:{'staff' if staff else 'candidate'}:{last_evaluation_id}"
+
+def _invalidate_report_cache(session_id):
+    cache_delete_prefix(f"report:{session_id}:")
+    db.invalidate_saved_report(session_id)
+
+# Question preparation futures for sessions started by this process
+_preparing = {}
+# Other workers cannot see _preparing, so a new session without questions is also "preparing"
+PREPARE_GRACE_SECONDS = 90
+
+def _start_preparing(session_id, *args, **kwargs):
+    future = submit_background(prepare_questions, session_id, *args, **kwargs)
+    _preparing[session_id] = future
+    future.add_done_callback(lambda _: _preparing.pop(session_id, None))
+
+def _persist_report(session_id, report_html, overall_score, report_type, last_evaluation_id):
+    try:
+        db.save_report_and_complete(session_id, report_html, overall_score, report_type, last_evaluation_id)
+    except Exception as e:
+        logger.warning(f"Failed to persist report/session score: {e}")
+
+def _current_question(sess):
+    """The session's next unanswered question, read via its stored cursor when it has one"""
+    position = sess.get('current_question_index')
+    if position is None:
+        return db.get_next_unanswered_question(sess['id'])
+    return db.get_question_at_position(sess['id'], position)
+
+def _questions_pending(sess):
+    """True while a session's questions are still being generated"""
+    future = _preparing.get(sess['id'])
+    if future is not None:
+        return not future.done()
+    if db.has_prepared_questions(sess['id']):
+        return False
+    try:
+        started = datetime.strptime(sess['started_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return False
+    return datetime.now(timezone.utc) - started < timedelta(seconds=PREPARE_GRACE_SECONDS)
+
 training_bp = Blueprint('training', __name__)
 
 @training_bp.route('/courses', methods=['GET'])
@@ -28,36 +147,26 @@ def get_courses():
 def get_categories():
     try:
         course_id = request.args.get('course_id', 1, type=int)
+        cache_key = f"categories:{course_id}"
+        categories_list = cache_get(cache_key)
+        if categories_list is not None:
+            return jsonify({'categories': categories_list})
         
         # Get categories configured for this course
         course_cats = db.get_course_categories(course_id)
-        # If no categories configured (legacy), fallback to getting all categories that have uploads
-        if not course_cats:
-            stats = db.get_upload_stats_by_category(course_id=course_id)
-            categories_list = []
-            for name, data in stats.items():
-                categories_list.append({
-                    'name': name,
-                    'video_count': data.get('video_count') or 0,
-                    'chunk_count': data.get('total_chunks') or 0
-                })
-            # Sort by name
-            categories_list.sort(key=lambda x: x['name'])
-            return jsonify({'categories': categories_list})
-
-        # Get stats for these categories
         stats = db.get_upload_stats_by_category(course_id=course_id)
-        categories_list = []
-        
-        for cat in course_cats:
-            name = cat['name']
-            data = stats.get(name, {'video_count': 0, 'total_chunks': 0})
-            categories_list.append({
+        # If no categories configured (legacy), fallback to all categories that have uploads, by name
+        names = [cat['name'] for cat in course_cats] if course_cats else sorted(stats)
+        categories_list = [
+            {
                 'name': name,
-                'video_count': data.get('video_count') or 0,
+                'video_count': (data := stats.get(name) or {}).get('video_count') or 0,
                 'chunk_count': data.get('total_chunks') or 0
-            })
-            
+            }
+            for name in names
+        ]
+        
+        cache_set(cache_key, categories_list, CATEGORIES_CACHE_TTL)
         return jsonify({'categories': categories_list})
     except Exception as e:
         logger.error(f"Failed to get categories: {e}")
@@ -67,10 +176,12 @@ def get_categories():
 @login_required
 def get_deepgram_token():
     try:
-        key = os.environ.get('DEEPGRAM_API_KEY', '')
-        if not key:
+        if not _DG_KEY:
             return jsonify({'error': 'missing_deepgram_key'}), 400
-        return jsonify({'key': key})
+        token = _mint_deepgram_token()
+        if token:
+            return jsonify({'key': token, 'token_type': 'bearer'})
+        return jsonify({'key': _DG_KEY, 'token_type': 'token'})
     except Exception as e:
         logger.error(f"Deepgram token error: {e}")
         return jsonify({'error': 'server_error'}), 500
@@ -105,9 +216,9 @@ def start_session():
             course_id=course_id
         )
         
-        # Prepare questions in background (or foreground for now)
-        # Using the new prepare_questions from service
-        prepare_questions(session_id, req.category, req.difficulty, req.duration_minutes, course_id=course_id)
+        # Questions are generated in the background; get-next-question reports
+        # 'preparing' until they are ready
+        _start_preparing(session_id, req.category, req.difficulty, req.duration_minutes, course_id=course_id)
         
         return jsonify({
             'success': True,
@@ -128,13 +239,16 @@ def get_next_question():
         session_id = validate_session_id(data.get('session_id'))
         
         # Verify ownership
-        if not db.verify_session_owner(session_id, session['user_id']):
+        sess = db.get_session_if_owned(session_id, session['user_id'])
+        if not sess:
             return jsonify({'error': 'unauthorized'}), 403
             
         # Get next question from DB
-        question = db.get_next_unanswered_question(session_id)
+        question = _current_question(sess)
         
         if not question:
+            if _questions_pending(sess):
+                return jsonify({'done': False, 'preparing': True})
             return jsonify({'done': True})
             
         return jsonify({'done': False, 'question': question})
@@ -154,20 +268,19 @@ def evaluate_specific_answer():
         question_id = int(data.get('question_id'))
         user_answer = data.get('user_answer') or ''
         
-        if not db.verify_session_owner(session_id, session['user_id']):
+        sess = db.get_session_if_owned(session_id, session['user_id'])
+        if not sess:
             return jsonify({'error': 'unauthorized'}), 403
         
-        # Find question by id
-        questions = db.get_session_questions(session_id)
-        question = next((q for q in questions if int(q['id']) == question_id), None)
+        question = db.get_question_by_id(question_id, session_id)
         if not question:
             return jsonify({'error': 'not_found'}), 404
         
-        sess = db.get_session(session_id)
         category = sess['category']
         
         evaluation = evaluate_answer(session_id, question, user_answer, category)
         db.save_answer_evaluation(session_id, question_id, evaluation)
+        _invalidate_report_cache(session_id)
         
         return jsonify({'success': True, 'evaluation': evaluation})
     except ValueError as e:
@@ -188,26 +301,28 @@ def handle_message():
         if not content:
             return jsonify({'error': 'no_content'}), 400
             
-        if not db.verify_session_owner(session_id, session['user_id']):
+        sess = db.get_session_if_owned(session_id, session['user_id'])
+        if not sess:
             return jsonify({'error': 'unauthorized'}), 403
             
-        # Save message
-        msg_id = db.add_message(session_id, role, content, context_source)
-        
-        # If user answer, evaluate it
+        # If user answer, evaluate it before writing so the transaction below stays short
         evaluation = None
-        if role == 'user':
-            current_q = db.get_next_unanswered_question(session_id)
-            if current_q:
-                # Get session info for category
-                sess = db.get_session(session_id)
-                category = sess['category']
-                
-                # Evaluate
-                evaluation = evaluate_answer(session_id, current_q, content, category)
-                
-                # Save evaluation
-                db.save_answer_evaluation(session_id, current_q['id'], evaluation)
+        current_q = _current_question(sess) if role == 'user' else None
+        if current_q:
+            try:
+                evaluation = evaluate_answer(session_id, current_q, content, sess['category'])
+            except Exception as e:
+                # The candidate's message is still saved; the answer just goes unevaluated
+                logger.error(f"Answer evaluation failed for session {session_id}: {e}")
+                evaluation = None
+        
+        # Save message and evaluation together
+        with db.transaction() as conn:
+            msg_id = db.add_message(session_id, role, content, context_source, conn=conn)
+            if evaluation is not None:
+                db.save_answer_evaluation(session_id, current_q['id'], evaluation, conn=conn)
+        if evaluation is not None:
+            _invalidate_report_cache(session_id)
         
         return jsonify({
             'success': True,
@@ -231,13 +346,16 @@ def autosave_session():
         
         if not session_id or not state:
             return jsonify({'error': 'missing_data'}), 400
+        # Drafts are buffered by integer id, the key resume-check looks them up by
+        session_id = validate_session_id(session_id)
             
         if not db.verify_session_owner(session_id, session['user_id']):
             return jsonify({'error': 'unauthorized'}), 403
             
-        import json
-        db.save_session_draft(session_id, json.dumps(state))
+        buffer_draft(session_id, orjson.dumps(state).decode())
         return jsonify({'success': True})
+    except ValueError as e:
+        return jsonify({'error': 'validation_error', 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Autosave failed: {e}")
         return jsonify({'error': 'autosave_failed'}), 500
@@ -264,23 +382,12 @@ def onboarding_status():
 @login_required
 def check_resume_session():
     try:
-        # Find latest active session for user
-        # We don't have a direct method for this in db, let's query sessions
-        # But wait, search_sessions is admin only. 
-        # We need a get_user_active_session helper or just query manually
-        # Let's rely on db.get_user_sessions but filter for active
-        
-        user_sessions = db.get_user_sessions(session['user_id'])
-        active = [s for s in user_sessions if s.get('status') == 'active']
-        
-        if not active:
+        latest = db.get_latest_active_session(session['user_id'])
+        if not latest:
             return jsonify({'has_session': False})
-            
-        # Get the most recent active session
-        latest = active[0] # get_user_sessions orders by started_at DESC
         
         # Check for draft
-        draft = db.get_session_draft(latest['id'])
+        draft = get_draft(latest['id'])
         
         return jsonify({
             'has_session': True,
@@ -304,6 +411,8 @@ def end_session_route():
             return jsonify({'error': 'unauthorized'}), 403
             
         db.complete_session(session_id)
+        discard_draft(session_id)
+        _invalidate_report_cache(session_id)
         return jsonify({'success': True})
         
     except ValueError as e:
@@ -316,20 +425,44 @@ def end_session_route():
 @login_required
 def get_report(session_id):
     # Verify ownership or allow admin/viewer
-    if not db.verify_session_owner(session_id, session['user_id']):
-        user = db.get_user_by_id(session['user_id'])
+    sess = db.get_session_if_owned(session_id, session['user_id'])
+    if not sess:
+        user = current_user()
         if not user or user['role'] not in ['admin', 'viewer']:
             return jsonify({'error': 'unauthorized'}), 403
     
     try:
         logger.info(f"Generating report for session {session_id} user {session['user_id']}")
-        user = db.get_user_by_id(session['user_id'])
+        user = current_user()
         role = (user or {}).get('role')
+        staff = role in ['admin', 'viewer']
+        
+        # Completed sessions no longer change, so their rendered report can be reused
+        if sess is None:
+            sess = db.get_session(session_id)
+        completed = (sess or {}).get('status') == 'completed'
+        # Read before building: an evaluation saved meanwhile leaves the stored copy outdated
+        last_evaluation_id = db.get_latest_evaluation_id(session_id)
+        cache_key = _report_cache_key(session_id, staff, last_evaluation_id)
+        audience = 'staff' if staff else 'candidate'
+        cached_html = cache_get(cache_key) if completed else None
+        if cached_html is None and completed:
+            # The stored report is reusable if it was built for this audience and includes the latest evaluation
+            saved = db.get_report(session_id)
+            if saved and saved.get('report_type') == audience and saved.get('last_evaluation_id') == last_evaluation_id:
+                cached_html = saved['report_html']
+                cache_set(cache_key, cached_html, REPORT_CACHE_TTL)
+        if cached_html is not None:
+            session_data = dict(sess)
+            if not staff:
+                session_data['overall_score'] = None
+            return jsonify({'success': True, 'report_html': cached_html, 'session': session_data})
         
         # Determine which report builder to use
         report_html = None
+        build_ok = True
         try:
-            if role in ['admin', 'viewer']:
+            if staff:
                 report_html = build_enhanced_report_html(db, session_id)
             else:
                 report_html = build_candidate_report_html(db, session_id)
@@ -342,30 +475,12 @@ def get_report(session_id):
         if not report_html:
             logger.info("Using fallback report generation")
             try:
-                sess = db.get_session(session_id)
-                qs = db.get_session_questions(session_id)
-                conn = db._get_connection()
-                cur = conn.cursor()
-                cur.execute('SELECT * FROM answer_evaluations WHERE session_id = ?', (session_id,))
-                eval_rows = [dict(r) for r in cur.fetchall()]
-                conn.close()
-                by_qid = {e['question_id']: e for e in eval_rows}
-                rows_html = []
-                for q in qs:
-                    ev = by_qid.get(q['id']) or {}
-                    ua = ev.get('user_answer') or '—'
-                    exp = q.get('expected_answer') or '—'
-                    if role in ['admin', 'viewer']:
-                        src = q.get('source') or '—'
-                        score = ev.get('overall_score')
-                        score_str = f"{score}/10" if score is not None else 'N/A'
-                        rows_html.append(f"<tr class='border-t'><td class='p-3 align-top text-sm'>{q.get('question_text') or ''}</td><td class='p-3 align-top text-sm'>{ua}</td><td class='p-3 align-top text-sm'>{exp}</td><td class='p-3 align-top text-sm'>{src}</td><td class='p-3 align-top text-sm text-center'>{score_str}</td></tr>")
-                    else:
-                        rows_html.append(f"<tr class='border-t'><td class='p-3 align-top text-sm'>{q.get('question_text') or ''}</td><td class='p-3 align-top text-sm'>{ua}</td><td class='p-3 align-top text-sm'>{exp}</td></tr>")
+                qs = db.get_session_questions_with_evals(session_id)
+                rows_html = _fallback_rows_html(qs, staff=role in ['admin', 'viewer'])
                 
-                user_display = (sess or {}).get('username') or 'Candidate'
-                cat = (sess or {}).get('category') or '—'
-                diff = (sess or {}).get('difficulty') or '—'
+                user_display = _esc((sess or {}).get('username') or 'Candidate')
+                cat = _esc((sess or {}).get('category') or '—')
+                diff = _esc((sess or {}).get('difficulty') or '—')
                 
                 if role in ['admin', 'viewer']:
                     table_html = """
@@ -379,7 +494,7 @@ def get_report(session_id):
                                 <th class='p-3 text-sm font-semibold text-center'>Score</th>
                             </tr>
                         </thead>
-                        <tbody>""" + "".join(rows_html) + """</tbody>
+                        <tbody>""" + rows_html + """</tbody>
                     </table>
                     """
                 else:
@@ -392,7 +507,7 @@ def get_report(session_id):
                                 <th class='p-3 text-sm font-semibold'>Expected Answer</th>
                             </tr>
                         </thead>
-                        <tbody>""" + "".join(rows_html) + """</tbody>
+                        <tbody>""" + rows_html + """</tbody>
                     </table>
                     """
                 
@@ -416,11 +531,15 @@ def get_report(session_id):
             except Exception as fallback_err:
                 logger.error(f"Fallback report generation failed: {fallback_err}", exc_info=True)
                 report_html = "<div class='text-red-500'>Report generation failed. Please contact admin.</div>"
+                build_ok = False
+        
+        if completed and build_ok:
+            cache_set(cache_key, report_html, REPORT_CACHE_TTL)
         
         # Extract overall score from meta tag if present
         overall_score = None
         try:
-            m = re.search(r"<meta\\s+name=['\"]overall_score['\"]\\s+content=['\"]([^'\"]*)['\"]>", report_html)
+            m = _OVERALL_SCORE_RE.search(report_html[:_OVERALL_SCORE_SCAN_CHARS])
             if m:
                 val = m.group(1).strip()
                 if val:
@@ -431,25 +550,22 @@ def get_report(session_id):
         # Fallback: compute average from evaluations if meta missing
         if overall_score is None:
             try:
-                conn = db._get_connection()
-                cur = conn.cursor()
-                cur.execute("SELECT overall_score FROM answer_evaluations WHERE session_id = ?", (session_id,))
-                rows = [r[0] for r in cur.fetchall() if r[0] is not None]
-                conn.close()
-                if rows:
-                    overall_score = round(sum(float(x) for x in rows) / len(rows), 1)
+                overall_score = db.get_session_average_score(session_id)
             except Exception:
                 overall_score = None
         
-        # Persist report and update session score
-        try:
-            db.save_report(session_id, report_html, overall_score)
-            db.complete_session(session_id, overall_score)
-        except Exception as e:
-            logger.warning(f"Failed to persist report/session score: {e}")
-        
-        # Also return session data for notes
-        session_data = db.get_session(session_id)
+        # Persist report and update session score after responding
+        submit_background(_persist_report, session_id, report_html, overall_score,
+                          audience if build_ok else None, last_evaluation_id)
+        
+        # Also return session data for notes, reflecting the pending completion
+        session_data = dict(sess) if sess else db.get_session(session_id)
+        if session_data:
+            session_data['status'] = 'completed'
+            if overall_score is not None:
+                session_data['overall_score'] = overall_score
+            if not session_data.get('ended_at'):
+                session_data['ended_at'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
         if role not in ['admin', 'viewer'] and session_data:
             session_data['overall_score'] = None
         
@@ -462,20 +578,8 @@ def get_report(session_id):
         logger.error(f"Report generation failed: {e}", exc_info=True)
         # Final fallback: return a minimal table so candidate never sees failure
         try:
-            sess = db.get_session(session_id)
-            qs = db.get_session_questions(session_id)
-            conn = db._get_connection()
-            cur = conn.cursor()
-            cur.execute('SELECT * FROM answer_evaluations WHERE session_id = ?', (session_id,))
-            eval_rows = [dict(r) for r in cur.fetchall()]
-            conn.close()
-            by_qid = {e.get('question_id'): e for e in eval_rows}
-            rows_html = []
-            for q in qs:
-                ev = by_qid.get(q.get('id')) or {}
-                ua = ev.get('user_answer') or '—'
-                exp = q.get('expected_answer') or '—'
-                rows_html.append(f"<tr class='border-t'><td class='p-3 align-top text-sm'>{q.get('question_text') or ''}</td><td class='p-3 align-top text-sm'>{ua}</td><td class='p-3 align-top text-sm'>{exp}</td></tr>")
+            qs = db.get_session_questions_with_evals(session_id)
+            rows_html = _fallback_rows_html(qs)
             table_html = """
             <table class='w-full text-left mt-6 border border-gray-200 rounded table-auto'>
               <thead class='bg-gray-100 text-gray-700'>
@@ -485,7 +589,7 @@ def get_report(session_id):
                   <th class='p-3 text-sm font-semibold'>Expected Answer</th>
                 </tr>
               </thead>
-              <tbody>""" + "".join(rows_html) + """</tbody>
+              <tbody>""" + rows_html + """</tbody>
             </table>
             """
             report_html = f"""
@@ -508,12 +612,9 @@ def prepare_questions_route():
         data = request.json
         session_id = validate_session_id(data.get('session_id'))
         
-        if not db.verify_session_owner(session_id, session['user_id']):
-            return jsonify({'error': 'unauthorized'}), 403
-        
-        sess = db.get_session(session_id)
+        sess = db.get_session_if_owned(session_id, session['user_id'])
         if not sess:
-            return jsonify({'error': 'not_found'}), 404
+            return jsonify({'error': 'unauthorized'}), 403
         
         result = prepare_questions(
             session_id=session_id,
@@ -535,13 +636,8 @@ def get_candidate_progress():
     try:
         user_id = session['user_id']
         course_id = request.args.get('course_id', 1, type=int)
-        sessions = db.get_user_sessions(user_id, course_id=course_id)
-        
-        completed_sessions = [s for s in sessions if s.get('status') == 'completed']
-        count = len(completed_sessions)
-        
-        high_score_sessions = [s for s in completed_sessions if (s.get('overall_score') or 0) >= 8.0]
-        field_ready_sessions = [s for s in completed_sessions if s.get('difficulty') == 'field-ready']
+        counters = db.get_progress_counters(user_id, course_id=course_id)
+        count = counters['completed']
         
         # Check if welcome video watched (using onboarding_completed pref for now)
         video_watched = db.get_user_pref(user_id, 'onboarding_completed') == 'true'
@@ -551,8 +647,8 @@ def get_candidate_progress():
             {'label': 'Watch Welcome Guide', 'completed': video_watched},
             {'label': 'Complete First Session', 'completed': count >= 1},
             {'label': 'Complete 3 Sessions', 'completed': count >= 3},
-            {'label': 'Attempt Field Ready Mode', 'completed': len(field_ready_sessions) > 0},
-            {'label': 'Achieve Expert Score (> 8.0)', 'completed': len(high_score_sessions) > 0}
+            {'label': 'Attempt Field Ready Mode', 'completed': counters['field_ready'] > 0},
+            {'label': 'Achieve Expert Score (> 8.0)', 'completed': counters['high_score'] > 0}
         ]
         
         return jsonify({'items': items})
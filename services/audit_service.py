@@ -1,25 +1,82 @@
+import atexit
+import queue
+import threading
+from datetime import datetime, timezone
 from flask import session, request
 from extensions import db
 from config_logging import get_logger
 
 logger = get_logger('audit_service')
 
+# Audit events are queued by request handlers and written in batches by a background thread
+AUDIT_BATCH_SIZE = 100
+_audit_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
 def log_audit(action: str, resource_type: str = None, 
-              resource_id: int = None, details: str = None):
-    """Helper to log audit events"""
+              resource_id: int = None, details: str = None, sync: bool = False):
+    """Helper to log audit events (queued unless sync=True)"""
     try:
-        user_id = session.get('user_id')
-        ip_address = request.remote_addr
-        user_agent = request.headers.get('User-Agent', '')[:200]
-        
-        db.log_audit(
-            user_id=user_id,
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent
+        event = (
+            session.get('user_id'),
+            action,
+            resource_type,
+            resource_id,
+            details,
+            request.remote_addr,
+            request.headers.get('User-Agent', '')[:200],
+            datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
         )
+        if sync:
+            db.log_audit_batch([event])
+            return
+        _ensure_worker()
+        _audit_queue.put_nowait(event)
     except Exception as e:
         logger.error(f"Failed to log audit event: {e}")
+
+def flush_audit_log():
+    """Write any queued audit events from the calling thread"""
+    batch = []
+    while True:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+        if len(batch) >= AUDIT_BATCH_SIZE:
+            _write_batch(batch)
+            batch = []
+    _write_batch(batch)
+
+def _write_batch(batch):
+    if not batch:
+        return
+    try:
+        db.log_audit_batch(batch)
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} audit events: {e}")
+    finally:
+        for _ in batch:
+            _audit_queue.task_done()
+
+def _audit_worker():
+    while True:
+        batch = [_audit_queue.get()]
+        while len(batch) < AUDIT_BATCH_SIZE:
+            try:
+                batch.append(_audit_queue.get_nowait())
+            except queue.Empty:
+                break
+        _write_batch(batch)
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_audit_worker, name='audit-log-writer', daemon=True)
+            _worker.start()
+
+atexit.register(flush_audit_log)
@@ -1,5 +1,12 @@
 from extensions import db
 from flask import session
+from utils.cache import cache_get, cache_set, cache_delete
+
+# /me is polled by every page, so the displayed user may be up to a minute old
+USER_CACHE_TTL = 60
+# The cache is per process: a deletion or role change made in another worker only reaches role
+# checks here once their copy expires, so authorization trusts a cached user for a few seconds only
+AUTHZ_USER_CACHE_TTL = 5
 
 def authenticate_user(username, password):
     """
@@ -21,8 +28,26 @@ def register_user(username, password, name, role='candidate'):
     return db.create_user(username, password, name, role)
 
 def get_user_by_id(user_id):
-    """Get user by ID"""
-    return db.get_user_by_id(user_id)
+    """Get user by ID for display (served from a short-lived cache)"""
+    return _cached_user(f"user:{user_id}", user_id, USER_CACHE_TTL)
+
+def get_user_for_authz(user_id):
+    """Get user by ID for a role check (cached for AUTHZ_USER_CACHE_TTL seconds only)"""
+    return _cached_user(f"authz_user:{user_id}", user_id, AUTHZ_USER_CACHE_TTL)
+
+def _cached_user(key, user_id, ttl):
+    user = cache_get(key)
+    if user is None:
+        user = db.get_user_by_id(user_id)
+        if not user:
+            return None
+        cache_set(key, user, ttl)
+    return dict(user)
+
+def invalidate_user(user_id):
+    """Drop this process's cached copies of a user; call after any change to the user's row (role, deletion)"""
+    cache_delete(f"user:{user_id}")
+    cache_delete(f"authz_user:{user_id}")
 
 def list_users(role=None, page=1, limit=10, search=None):
     """List users with pagination"""
@@ -30,4 +55,6 @@ def list_users(role=None, page=1, limit=10, search=None):
 
 def delete_user(user_id):
     """Delete a user"""
-    return db.delete_user(user_id)
+    result = db.delete_user(user_id)
+    invalidate_user(user_id)
+    return result
@@ -0,0 +1,68 @@
+import atexit
+import os
+import threading
+import time
+import orjson
+from extensions import db
+from config_logging import get_logger
+
+logger = get_logger('draft_service')
+
+# Autosaves arrive every few seconds per trainee; only the latest state per session
+# is kept in memory and written to the database in one batch per interval
+DRAFT_FLUSH_SECONDS = int(os.environ.get('DRAFT_FLUSH_SECONDS', 30))
+_pending = {}
+_pending_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def buffer_draft(session_id: int, data_json: str):
+    """Record the latest autosave state for a session (written on the next flush)"""
+    with _pending_lock:
+        _pending[session_id] = data_json
+    _ensure_flusher()
+
+def get_draft(session_id: int):
+    """Latest draft for a session, preferring a buffered state over the stored one"""
+    with _pending_lock:
+        data_json = _pending.get(session_id)
+    if data_json is not None:
+        return orjson.loads(data_json)
+    return db.get_session_draft(session_id)
+
+def discard_draft(session_id: int):
+    """Drop a buffered draft, e.g. once its session has ended and can no longer be resumed"""
+    with _pending_lock:
+        _pending.pop(session_id, None)
+
+def flush_drafts():
+    """Write all buffered drafts to the database"""
+    with _pending_lock:
+        drafts = list(_pending.items())
+        _pending.clear()
+    if not drafts:
+        return
+    try:
+        db.save_session_drafts(drafts)
+    except Exception as e:
+        logger.error(f"Failed to write {len(drafts)} session drafts: {e}")
+        # Keep them for the next flush unless a newer state arrived meanwhile
+        with _pending_lock:
+            for session_id, data_json in drafts:
+                _pending.setdefault(session_id, data_json)
+
+def _flush_loop():
+    while True:
+        time.sleep(DRAFT_FLUSH_SECONDS)
+        flush_drafts()
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name='draft-flusher', daemon=True)
+            _flusher.start()
+
+atexit.register(flush_drafts)
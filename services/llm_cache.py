@@ -0,0 +1,90 @@
+import copy
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+
+from config_logging import get_logger
+from extensions import db
+from utils.cache import cache_get, cache_set
+
+logger = get_logger('llm_cache')
+
+# Identical prompts (same model, temperature and messages) reuse the earlier completion
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 3600))
+# Persistent entries (evaluations) also survive restarts, in SQLite, for this long
+LLM_DISK_CACHE_TTL = int(os.environ.get('LLM_DISK_CACHE_TTL', 30 * 24 * 3600))
+# A re-submitted answer this close to an earlier one for the same question reuses its evaluation
+SEMANTIC_MATCH_THRESHOLD = 0.97
+MAX_ANSWERS_PER_QUESTION = 20
+
+def prompt_key(model: str, temperature: float, messages: List[Dict]) -> str:
+    """Cache key for one chat completion request"""
+    payload = orjson.dumps([model, temperature, messages])
+    return f"llm:{hashlib.sha256(payload).hexdigest()}"
+
+def get_cached(key: str, persistent: bool = False) -> Optional[Any]:
+    """Cached parsed completion, as a copy the caller may modify.
+
+    With persistent=True a miss in memory falls back to the SQLite copy written
+    by set_cached(..., persistent=True).
+    """
+    value = cache_get(key)
+    if value is not None:
+        return copy.deepcopy(value)
+    if not persistent:
+        return None
+    try:
+        payload = db.get_llm_cache(key, LLM_DISK_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        return None
+    if payload is None:
+        return None
+    value = orjson.loads(payload)
+    cache_set(key, copy.deepcopy(value), LLM_CACHE_TTL)
+    return value
+
+def set_cached(key: str, value: Any, ttl_seconds: int = LLM_CACHE_TTL, persistent: bool = False):
+    cache_set(key, copy.deepcopy(value), ttl_seconds)
+    if persistent:
+        try:
+            db.save_llm_cache(key, orjson.dumps(value), LLM_DISK_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+def _normalized(embedding) -> Optional[np.ndarray]:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else None
+
+def find_similar_evaluation(question_id: int, embed) -> Optional[Dict]:
+    """Evaluation of an earlier, near-identical answer to this question.
+
+    embed() returns the new answer's embedding; it is only called when there are
+    earlier answers to compare against.
+    """
+    entries = cache_get(f"llm:answers:{question_id}")
+    if not entries:
+        return None
+    vec = _normalized(embed())
+    if vec is None:
+        return None
+    # All earlier answers are compared in one matrix-vector product; the closest one wins
+    similarities = np.stack([cached_vec for cached_vec, _ in entries]) @ vec
+    best = int(np.argmax(similarities))
+    if similarities[best] >= SEMANTIC_MATCH_THRESHOLD:
+        return copy.deepcopy(entries[best][1])
+    return None
+
+def remember_evaluation(question_id: int, embedding, evaluation: Dict):
+    """Record an evaluation so near-identical answers to the question can reuse it"""
+    vec = _normalized(embedding)
+    if vec is None:
+        return
+    key = f"llm:answers:{question_id}"
+    entries = list(cache_get(key) or [])
+    entries.append((vec, copy.deepcopy(evaluation)))
+    cache_set(key, entries[-MAX_ANSWERS_PER_QUESTION:], LLM_CACHE_TTL)
@@ -1,12 +1,19 @@
 import os
 import json
 import hashlib
-import requests
-from typing import List, Dict, Any, Optional
+import heapq
+import threading
+import time
+import orjson
+from array import array
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
 from pinecone import Pinecone
 from extensions import db
 from utils.text_utils import chunk_text
+from utils.http_session import pooled_session
+from utils.cache import cache_delete, cache_get, cache_set
 from config_logging import get_logger
 
 logger = get_logger('pinecone_service')
@@ -14,65 +21,215 @@ logger = get_logger('pinecone_service')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY', '')
 PINECONE_INDEX_HOST = os.environ.get('PINECONE_INDEX_HOST', '')
+EMBEDDING_MODEL = 'text-embedding-3-small'
+COURSE_SLUG_CACHE_TTL = 300
+# The admin dashboard polls index stats; uploads and deletes drop the cached copy at once
+RAG_STATS_CACHE_KEY = 'rag_stats'
+RAG_STATS_CACHE_TTL = 15
+_OPENAI_SESSION = pooled_session({'Authorization': f'Bearer {OPENAI_API_KEY}', 'Content-Type': 'application/json'})
+# Large uploads are embedded in sub-batches; the shared pool caps in-flight OpenAI
+# requests process-wide, not just per call
+EMBED_BATCH_SIZE = 96
+EMBED_MAX_CONCURRENCY = int(os.environ.get('EMBED_MAX_CONCURRENCY', 8))
+_EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=EMBED_MAX_CONCURRENCY, thread_name_prefix='embeddings')
+
+# Hot vectors stay in memory in front of the SQLite embedding cache, held as float32
+# arrays (6 KB per 1536-dim vector instead of ~48 KB as a list of Python floats)
+_LRU_MAX = int(os.environ.get('EMBED_LRU_MAX', 5000))
+_LRU = OrderedDict()
+_LRU_LOCK = threading.Lock()
+
+PINECONE_POOL_THREADS = int(os.environ.get('PINECONE_POOL_THREADS', 30))
+PINECONE_QUERY_TIMEOUT = 30
+# ~100 vectors of 1536 dims plus metadata stays under Pinecone's per-request payload limit
+UPSERT_BATCH_SIZE = 100
+UPSERT_RETRIES = 3
+# Namespace deletes for a category run in parallel, capped to stay clear of rate limits
+DELETE_MAX_CONCURRENCY = 8
+# Chunks embedded and upserted per step of process_and_upload: enough to keep every
+# embedding worker busy, small enough that a long transcript never sits in memory whole
+UPLOAD_WINDOW = EMBED_BATCH_SIZE * EMBED_MAX_CONCURRENCY
+# Embeds the next window while the current one is upserted; separate from
+# _EMBED_EXECUTOR, whose workers it waits on
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='embed-prefetch')
+# After this many consecutive failed calls the shared client is rebuilt on next use
+PINECONE_RESET_AFTER_FAILURES = 3
+# index.query() cannot be issued with async_req in pinecone-client 3.0.0, so namespace
+# queries are fanned out as plain calls on this pool instead
+_QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=PINECONE_POOL_THREADS, thread_name_prefix='pinecone-query')
+_index = None
+_index_lock = threading.Lock()
+_index_failures = 0
 
 def _get_pinecone_index():
+    """Shared Index client; its connection and thread pools are reused across requests"""
+    global _index
+    if _index is not None:
+        return _index
     if not PINECONE_INDEX_HOST or 'localhost' in PINECONE_INDEX_HOST.lower():
         raise RuntimeError("Invalid PINECONE_INDEX_HOST. Set to your Pinecone index URL (https://...pinecone.io).")
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    return pc.Index(host=PINECONE_INDEX_HOST)
+    with _index_lock:
+        if _index is None:
+            # Index() inherits the client's pool_threads; it takes no pool arguments itself
+            pc = Pinecone(api_key=PINECONE_API_KEY, pool_threads=PINECONE_POOL_THREADS)
+            _index = pc.Index(host=PINECONE_INDEX_HOST)
+    return _index
 
-def create_embeddings_batch(texts: List[str]) -> List[List[float]]:
-    """Create embeddings for batch of texts using OpenAI"""
-    if not texts:
-        return []
-        
+def _record_index_result(ok: bool):
+    """Track consecutive failures and drop the shared client once it looks broken"""
+    global _index, _index_failures
+    with _index_lock:
+        if ok:
+            _index_failures = 0
+            return
+        _index_failures += 1
+        if _index_failures >= PINECONE_RESET_AFTER_FAILURES:
+            logger.warning("Resetting Pinecone client after repeated failures")
+            _index = None
+            _index_failures = 0
+
+def _lru_get(key):
+    with _LRU_LOCK:
+        vec = _LRU.get(key)
+        if vec is None:
+            return None
+        _LRU.move_to_end(key)
+    return vec.tolist()
+
+def _lru_put(key, vec: List[float]):
+    vec = array('f', vec)
+    with _LRU_LOCK:
+        _LRU[key] = vec
+        _LRU.move_to_end(key)
+        while len(_LRU) > _LRU_MAX:
+            _LRU.popitem(last=False)
+
+def _embedding_cache_get(text_hashes: List[bytes], model: str = EMBEDDING_MODEL) -> Dict[bytes, List[float]]:
+    """Cached vectors by text hash; a failing cache just means every text is a miss"""
+    try:
+        blobs = db.get_cached_embeddings(text_hashes, model)
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+        return {}
+    vectors = {}
+    for text_hash, blob in blobs.items():
+        vec = array('f')
+        vec.frombytes(blob)
+        vectors[text_hash] = vec.tolist()
+    return vectors
+
+def _embedding_cache_put(hash_to_vec: Dict[bytes, List[float]], model: str = EMBEDDING_MODEL):
     try:
-        response = requests.post(
-            'https://api.openai.com/v1/embeddings',
-            headers={
-                'Authorization': f'Bearer {OPENAI_API_KEY}',
-                'Content-Type': 'application/json'
-            },
-            json={
-                'model': 'text-embedding-3-small',
-                'input': texts
-            },
-            timeout=60
+        db.save_cached_embeddings(
+            [(text_hash, array('f', vec).tobytes()) for text_hash, vec in hash_to_vec.items()],
+            model
         )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        return [item['embedding'] for item in data['data']]
     except Exception as e:
-        logger.error(f"Failed to create embeddings: {e}")
-        raise
+        logger.warning(f"Embedding cache write failed: {e}")
+
+def _request_embeddings(texts: List[str]) -> List[List[float]]:
+    response = _OPENAI_SESSION.post(
+        'https://api.openai.com/v1/embeddings',
+        data=orjson.dumps({
+            'model': EMBEDDING_MODEL,
+            'input': texts
+        }),
+        timeout=60
+    )
+    
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    
+    return [item['embedding'] for item in data['data']]
+
+def _request_embeddings_batched(texts: List[str]) -> List[List[float]]:
+    """Embed texts in concurrent sub-batches, keeping input order"""
+    if len(texts) <= EMBED_BATCH_SIZE:
+        return _request_embeddings(texts)
+    sub_batches = [texts[i:i+EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    vectors = []
+    for sub_vectors in _EMBED_EXECUTOR.map(_request_embeddings, sub_batches):
+        vectors.extend(sub_vectors)
+    return vectors
+
+def create_embeddings_batch(texts: List[str]) -> List[List[float]]:
+    """Create embeddings for batch of texts using OpenAI (only texts not already cached are sent)"""
+    if not texts:
+        return []
+    
+    hashes = [hashlib.sha256(text.encode('utf-8')).digest() for text in texts]
+    vectors = {}
+    for text_hash in hashes:
+        vec = _lru_get((EMBEDDING_MODEL, text_hash))
+        if vec is not None:
+            vectors[text_hash] = vec
+    
+    not_in_memory = list(set(hashes) - vectors.keys())
+    if not_in_memory:
+        stored = _embedding_cache_get(not_in_memory)
+        for text_hash, vec in stored.items():
+            _lru_put((EMBEDDING_MODEL, text_hash), vec)
+        vectors.update(stored)
+    
+    missing = {}
+    for text_hash, text in zip(hashes, texts):
+        if text_hash not in vectors:
+            missing.setdefault(text_hash, text)
+    
+    if missing:
+        try:
+            fresh = dict(zip(missing, _request_embeddings_batched(list(missing.values()))))
+        except Exception as e:
+            logger.error(f"Failed to create embeddings: {e}")
+            raise
+        _embedding_cache_put(fresh)
+        for text_hash, vec in fresh.items():
+            _lru_put((EMBEDDING_MODEL, text_hash), vec)
+        vectors.update(fresh)
+    
+    return [vectors[text_hash] for text_hash in hashes]
+
+def _course_slug(course_id: int) -> str:
+    key = f"course_slug:{course_id}"
+    slug = cache_get(key)
+    if slug is None:
+        course = db.get_course_by_id(course_id)
+        slug = course['slug'] if course else 'sales'
+        cache_set(key, slug, COURSE_SLUG_CACHE_TTL)
+    return slug
+
+def _slug(name: str) -> str:
+    """Namespace component for a category, video or course name"""
+    return name.lower().replace(' ', '_')
+
+def _namespace_prefix(category: str, course_id: int) -> str:
+    category_slug = _slug(category)
+    # Backward compatibility for Sales Trainer (ID 1)
+    if course_id == 1:
+        return category_slug
+    return f"{_course_slug(course_id)}_{category_slug}"
+
+def _make_namespace(category: str, video_name: str, course_id: int = 1) -> str:
+    """Pinecone namespace for one uploaded video"""
+    return f"{_namespace_prefix(category, course_id)}_{_slug(video_name)}"
 
 def get_namespaces_for_category(category: str, course_id: int = 1) -> List[str]:
     """Get all Pinecone namespaces for a category in a course"""
     uploads = db.get_uploads_by_category(category, course_id)
-    course = db.get_course_by_id(course_id)
-    course_slug = course['slug'] if course else 'sales'
-    
-    namespaces = []
-    for upload in uploads:
-        video_name = upload['video_name']
-        
-        # Backward compatibility for Sales Trainer (ID 1)
-        if course_id == 1:
-            ns = f"{category.lower().replace(' ', '_')}_{video_name.lower().replace(' ', '_')}"
-        else:
-            ns = f"{course_slug}_{category.lower().replace(' ', '_')}_{video_name.lower().replace(' ', '_')}"
-            
-        namespaces.append(ns)
+    if not uploads:
+        return []
     
-    return namespaces
+    prefix = _namespace_prefix(category, course_id)
+    return [f"{prefix}_{_slug(upload['video_name'])}" for upload in uploads]
 
 def delete_category_namespaces(category: str, course_id: int = 1) -> int:
     """Delete all Pinecone namespaces for a category in a course"""
     namespaces = get_namespaces_for_category(category, course_id)
     if not namespaces:
         return 0
+    # The category's upload rows go away even if Pinecone fails below, so a later upload
+    # must re-embed rather than trust vectors that may or may not have survived
+    forget_namespace_content(namespaces)
     
     try:
         index = _get_pinecone_index()
@@ -80,42 +237,94 @@ def delete_category_namespaces(category: str, course_id: int = 1) -> int:
         logger.error("Failed to connect to Pinecone for deletion")
         return 0
         
-    count = 0
-    for ns in namespaces:
-        try:
-            index.delete(delete_all=True, namespace=ns)
-            count += 1
-            logger.info(f"Deleted Pinecone namespace: {ns}")
-        except Exception as e:
-            logger.error(f"Failed to delete namespace {ns}: {e}")
+    deleted = []
+    with ThreadPoolExecutor(max_workers=min(DELETE_MAX_CONCURRENCY, len(namespaces))) as executor:
+        futures = {executor.submit(index.delete, delete_all=True, namespace=ns): ns for ns in namespaces}
+        for future in as_completed(futures):
+            ns = futures[future]
+            try:
+                future.result()
+                deleted.append(ns)
+                logger.info(f"Deleted Pinecone namespace: {ns}")
+                _record_index_result(True)
+            except Exception as e:
+                logger.error(f"Failed to delete namespace {ns}: {e}")
+                _record_index_result(False)
+    if deleted:
+        cache_delete(RAG_STATS_CACHE_KEY)
             
-    return count
+    return len(deleted)
 
-def process_and_upload(content: str, category: str, video_name: str, course_id: int = 1) -> Dict:
-    """Process content and upload to Pinecone"""
-    course = db.get_course_by_id(course_id)
-    course_slug = course['slug'] if course else 'sales'
+def process_and_upload(content: str, category: str, video_name: str, course_id: int = 1, force: bool = False) -> Dict:
+    """Process content and upload to Pinecone.
 
-    # Create namespace
-    if course_id == 1:
-        namespace = f"{category.lower().replace(' ', '_')}_{video_name.lower().replace(' ', '_')}"
-    else:
-        namespace = f"{course_slug}_{category.lower().replace(' ', '_')}_{video_name.lower().replace(' ', '_')}"
+    Content identical to what was last indexed into the namespace is not re-embedded
+    or re-uploaded (result has skipped=True) unless force is set.
+    """
+    namespace = _make_namespace(category, video_name, course_id)
+    content_hash = hashlib.sha256(f"{EMBEDDING_MODEL}\n{content}".encode('utf-8')).hexdigest()
+    if not force:
+        indexed = _namespace_content_get(namespace)
+        if indexed and indexed[0] == content_hash:
+            logger.info(f"Content for {namespace} unchanged, skipping upload")
+            return {'chunks': indexed[1], 'namespace': namespace, 'skipped': True}
     
-    # Chunk the content
+    # Chunk the content; verbatim repeats (intros, disclaimers) are embedded and stored once
     chunks = chunk_text(content)
+    first_positions = {}
+    for i, chunk in enumerate(chunks):
+        first_positions.setdefault(chunk, i)
+    unique_chunks = list(first_positions)
     
-    # Create embeddings
-    embeddings = create_embeddings_batch(chunks)
-    
-    # Upload to Pinecone
     index = _get_pinecone_index()
     
-    vectors = []
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-        vector_id = f"{namespace}_chunk_{i}"
-        vectors.append({
-            'id': vector_id,
+    # Embed and upload one window at a time so only a window's vectors are held in memory.
+    # The next window is embedded while the current one is upserted, never more than one ahead.
+    windows = [unique_chunks[i:i+UPLOAD_WINDOW] for i in range(0, len(unique_chunks), UPLOAD_WINDOW)]
+    count = 0
+    next_embeddings = _PREFETCH_EXECUTOR.submit(create_embeddings_batch, windows[0]) if windows else None
+    for n, window in enumerate(windows):
+        embeddings = next_embeddings.result()
+        if n + 1 < len(windows):
+            next_embeddings = _PREFETCH_EXECUTOR.submit(create_embeddings_batch, windows[n + 1])
+        vectors = list(_iter_vectors(window, embeddings, first_positions, namespace, category, video_name, course_id))
+        _upsert_batches(index, vectors, namespace)
+        count += len(vectors)
+    cache_delete(RAG_STATS_CACHE_KEY)
+    _namespace_content_put(namespace, content_hash, count)
+    
+    return {
+        'chunks': count,
+        'namespace': namespace
+    }
+
+def _namespace_content_get(namespace: str):
+    """(content_hash, chunks) last indexed into the namespace; unknown if the lookup fails"""
+    try:
+        return db.get_namespace_content(namespace)
+    except Exception as e:
+        logger.warning(f"Namespace content lookup failed: {e}")
+        return None
+
+def _namespace_content_put(namespace: str, content_hash: str, chunks: int):
+    try:
+        db.save_namespace_content(namespace, content_hash, chunks)
+    except Exception as e:
+        logger.warning(f"Namespace content write failed: {e}")
+
+def forget_namespace_content(namespaces: List[str]):
+    """Drop the indexed-content records of namespaces whose vectors or uploads were deleted"""
+    try:
+        db.delete_namespace_content(namespaces)
+    except Exception as e:
+        logger.warning(f"Failed to clear namespace content records: {e}")
+
+def _iter_vectors(chunks: List[str], embeddings: List[List[float]], positions: Dict[str, int],
+                  namespace: str, category: str, video_name: str, course_id: int):
+    for chunk, embedding in zip(chunks, embeddings):
+        i = positions[chunk]
+        yield {
+            'id': f"{namespace}_chunk_{i}",
             'values': embedding,
             'metadata': {
                 'text': chunk[:3000],  # Store preview
@@ -125,58 +334,96 @@ def process_and_upload(content: str, category: str, video_name: str, course_id:
                 'namespace': namespace,
                 'course_id': course_id # Add course_id metadata for future proofing
             }
-        })
-    
-    # Batch upsert
-    batch_size = 100
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i:i+batch_size]
-        index.upsert(vectors=batch, namespace=namespace)
+        }
+
+def _upsert_batches(index, vectors: List[Dict], namespace: str, batch_size: int = UPSERT_BATCH_SIZE):
+    """Send all upsert batches concurrently; batches that fail are retried with backoff"""
+    batches = [vectors[i:i+batch_size] for i in range(0, len(vectors), batch_size)]
+    pending = [index.upsert(vectors=batch, namespace=namespace, async_req=True) for batch in batches]
     
-    return {
-        'chunks': len(chunks),
-        'namespace': namespace
-    }
+    for batch, async_result in zip(batches, pending):
+        try:
+            async_result.get()
+            continue
+        except Exception as e:
+            logger.warning(f"Upsert to {namespace} failed, retrying: {e}")
+        for attempt in range(1, UPSERT_RETRIES + 1):
+            time.sleep(2 ** (attempt - 1))
+            try:
+                index.upsert(vectors=batch, namespace=namespace)
+                break
+            except Exception as e:
+                if attempt == UPSERT_RETRIES:
+                    raise
+                logger.warning(f"Upsert retry {attempt} to {namespace} failed: {e}")
 
 def query_pinecone(embedding: List[float], category: str, top_k: int = 50, namespaces: List[str] = None, course_id: int = 1) -> List[Dict]:
-    """Query Pinecone for relevant content across namespaces"""
+    """Query Pinecone across namespaces; the top_k best-scoring matches overall, best first"""
+    return query_pinecone_batch([embedding], category, top_k, namespaces, course_id)[0]
+
+def query_pinecone_batch(embeddings: List[List[float]], category: str, top_k: int = 50, namespaces: List[str] = None, course_id: int = 1) -> List[List[Dict]]:
+    """Query several vectors across the category's namespaces; one list of matches per embedding, in order.
+
+    Each list holds the top_k best-scoring matches over all namespaces, best first.
+    """
+    results = [[] for _ in embeddings]
     if namespaces is None:
         namespaces = get_namespaces_for_category(category, course_id)
     
     try:
         index = _get_pinecone_index()
     except Exception:
-        return []
+        return results
     
-    def run_query(ns):
-        try:
-            return index.query(
+    # Every (vector, namespace) query is in flight at once on the shared query pool
+    pending = []
+    for position, embedding in enumerate(embeddings):
+        for ns in namespaces:
+            pending.append((position, ns, _QUERY_EXECUTOR.submit(
+                index.query,
                 vector=embedding,
                 top_k=top_k,
                 namespace=ns,
                 include_metadata=True
-            )
-        except Exception:
-            return None
-    
-    max_workers = min(4, len(namespaces)) if namespaces else 0
-    results = []
+            )))
     
-    if max_workers > 0:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(run_query, ns): ns for ns in namespaces}
-            for fut in as_completed(futures):
-                res = fut.result()
-                if res and 'matches' in res:
-                    results.extend(res['matches'])
+    # Per-vector min-heaps of (score, -arrival, match) keep only the top_k seen so far;
+    # on equal scores the earlier match wins, and matches themselves are never compared
+    heaps = [[] for _ in embeddings]
+    arrival = 0
+    for position, ns, future in pending:
+        try:
+            res = future.result(timeout=PINECONE_QUERY_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Pinecone query on namespace {ns} failed: {e}")
+            _record_index_result(False)
+            continue
+        _record_index_result(True)
+        if not res or 'matches' not in res:
+            continue
+        heap = heaps[position]
+        for m in res['matches']:
+            arrival += 1
+            entry = (m.get('score') or 0.0, -arrival, m)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
     
+    for position, heap in enumerate(heaps):
+        heap.sort(reverse=True)
+        results[position] = [m for _, _, m in heap]
     return results
 
 def get_rag_stats() -> Dict:
     """Get statistics about the Pinecone index and namespaces"""
+    cached = cache_get(RAG_STATS_CACHE_KEY)
+    if cached is not None:
+        return cached
     try:
         index = _get_pinecone_index()
         stats = index.describe_index_stats()
+        _record_index_result(True)
         
         # Format for dashboard
         namespaces = stats.get('namespaces', {})
@@ -189,12 +436,15 @@ def get_rag_stats() -> Dict:
                 'vector_count': ns_data.get('vector_count', 0)
             })
             
-        return {
+        result = {
             'total_vectors': total_vectors,
             'namespaces': sorted(formatted_namespaces, key=lambda x: x['name']),
             'dimension': stats.get('dimension'),
             'fullness': stats.get('index_fullness')
         }
+        cache_set(RAG_STATS_CACHE_KEY, result, RAG_STATS_CACHE_TTL)
+        return result
     except Exception as e:
         logger.error(f"Failed to get RAG stats: {e}")
+        _record_index_result(False)
         return {'error': str(e)}
@@ -1,13 +1,21 @@
 import os
+import re
+import bisect
 import json
-import requests
-from datetime import datetime
+import hashlib
+import time
+import orjson
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 
 from extensions import db
 from config_logging import get_logger
-from services.pinecone_service import get_namespaces_for_category, query_pinecone, create_embeddings_batch
+from services import llm_cache
+from services.pinecone_service import get_namespaces_for_category, query_pinecone, query_pinecone_batch, create_embeddings_batch
 from utils.text_utils import chunk_text
+from utils.cache import cache_get, cache_set
+from utils.http_session import pooled_session
 
 logger = get_logger('training_service')
 
@@ -15,24 +23,105 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY', '')
 PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY', '')
 PINECONE_INDEX_HOST = os.environ.get('PINECONE_INDEX_HOST', '')
+SETTINGS_CACHE_TTL = 60
+# Retrieved category material only changes when content is uploaded, synced or deleted
+CATEGORY_CONTENT_CACHE_PREFIX = 'agg:'
+CATEGORY_CONTENT_CACHE_TTL = 900
+CONTEXT_CHAR_LIMIT = 20000
+# Stored expected-answer embeddings never change for a question id. They are kept as
+# int8 with a per-vector scale: a quarter of the float32 size, and rounding moves the
+# cosine by well under 0.01, far below the gaps between the 0.65/0.80 similarity tiers
+EXPECTED_EMBEDDING_CACHE_TTL = 3600
+
+OPENROUTER_CHAT_URL = 'https://openrouter.ai/api/v1/chat/completions'
+# Bare JSON output parses on the first orjson.loads in extract_json_from_text, skipping
+# the markdown/regex fallbacks; OpenRouter drops the parameter for models without it
+JSON_RESPONSE_FORMAT = {'type': 'json_object'}
+# Keep-alive connections to OpenRouter; retries stay low because every attempt is a paid generation
+_OPENROUTER_SESSION = pooled_session({
+    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
+    'Content-Type': 'application/json',
+    'X-Title': 'AHL Sales Trainer'
+}, pool_size=20, retries=2, backoff_factor=0.3)
+
+# Match ```json { ... } ``` or ``` { ... } ```
+_JSON_CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.?!])\s+')
+# Substring matches (no word boundaries), as the keyword lists were originally checked
+_PROCEDURAL_RE = re.compile('steps|procedure|how to|first|then|next')
+_SCENARIO_RE = re.compile('scenario|what if|handle|customer says|deal with')
+_OBJECTION_RE = re.compile('objection|price|budget|looks fake|concern|hesitate')
+_WORD_RE = re.compile(r"[a-z0-9']+")
+# Content-word overlap at which an answer counts as matching the expected one without a semantic check
+LEXICAL_MATCH_THRESHOLD = 0.9
+
+# Separate from the background pool so evaluations running there cannot starve themselves
+_RAG_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='answer-rag')
+
+# (tier, spoken fallback) for scores below 5, from 5, and from 8
+_FEEDBACK_TIER_SCORES = (5, 8)
+_FEEDBACK_TIERS = (
+    ('corrective', 'Not quite. Please review the training material.'),
+    ('constructive', 'Good effort. You covered the main points, but you missed a few details.'),
+    ('positive', 'Excellent! That is correct and well-articulated.'),
+)
+
+_STOP_WORDS = frozenset([
+    'the', 'and', 'or', 'a', 'an', 'of', 'for', 'to', 'in', 'on', 'with', 'by', 'is', 'are',
+    'was', 'were', 'be', 'as', 'at', 'from', 'that', 'this', 'it'
+])
+
+def _token_overlap(a: str, b: str) -> float:
+    """Jaccard overlap of the content words of two texts"""
+    words_a = set(_WORD_RE.findall(a.lower())) - _STOP_WORDS
+    words_b = set(_WORD_RE.findall(b.lower())) - _STOP_WORDS
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+def _split_sentences(text: str) -> List[str]:
+    """Sentences of a retrieved chunk that are long enough to quiz on but short enough to quote"""
+    sentences = (x.strip() for x in _SENTENCE_SPLIT_RE.split(text.strip()))
+    return [x for x in sentences if 40 <= len(x) <= 240]
+
+def _key_points_for(sentence: str) -> List[str]:
+    """First three distinct content words of a sentence"""
+    words = (w.strip(',.!?').lower() for w in sentence.split())
+    return list(dict.fromkeys(w for w in words if w.isalpha() and w not in _STOP_WORDS))[:3]
+
+def get_settings(defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Read several system settings at once, served from cache for SETTINGS_CACHE_TTL seconds"""
+    values = {}
+    missing = []
+    for key in defaults:
+        value = cache_get(f"setting:{key}")
+        if value is None:
+            missing.append(key)
+        else:
+            values[key] = value
+    if missing:
+        stored = db.get_system_settings_bulk(missing)
+        for key in missing:
+            value = stored.get(key, defaults[key])
+            values[key] = value
+            if value is not None:
+                cache_set(f"setting:{key}", value, SETTINGS_CACHE_TTL)
+    return values
 
 def extract_json_from_text(text: str) -> Any:
     """Robustly extract JSON from text that might contain markdown or extra commentary."""
     try:
-        return json.loads(text)
+        return orjson.loads(text)
     except json.JSONDecodeError:
         pass
 
     text = text.strip()
     
     # Try markdown code blocks first (most specific)
-    import re
-    # Match ```json { ... } ``` or ``` { ... } ```
-    code_block_pattern = r"```(?:json)?\s*(\{.*?\})\s*```"
-    match = re.search(code_block_pattern, text, re.DOTALL)
+    match = _JSON_CODE_BLOCK_RE.search(text)
     if match:
         try:
-            return json.loads(match.group(1))
+            return orjson.loads(match.group(1))
         except json.JSONDecodeError:
             pass
 
@@ -44,7 +133,7 @@ def extract_json_from_text(text: str) -> Any:
     if start != -1 and end != -1 and end > start:
         candidate = text[start:end+1]
         try:
-            return json.loads(candidate)
+            return orjson.loads(candidate)
         except json.JSONDecodeError:
             # If that fails, it might be that there are multiple objects or noise
             # Try a stricter regex for just the first object if the simple slice failed
@@ -55,9 +144,55 @@ def extract_json_from_text(text: str) -> Any:
 def build_category_embedding_prompt(category: str) -> str:
     return f"Summarize key facts, procedures, and scenarios for training category: {category}"
 
+def _join_capped(parts, limit: int, sep: str = "\n\n") -> str:
+    """Same as sep.join(parts)[:limit], without building the text past the limit"""
+    out = []
+    total = 0
+    for part in parts:
+        if out:
+            part = sep + part
+        if total + len(part) >= limit:
+            out.append(part[:limit - total])
+            break
+        out.append(part)
+        total += len(part)
+    return "".join(out)
+
+def _format_category_material(matches: List[Dict]) -> str:
+    """Source-labelled training material from Pinecone matches, capped at CONTEXT_CHAR_LIMIT"""
+    # Collect metadata text in a stable (video, position) order so the same material
+    # always yields the same prompt prefix, which provider prompt caches can reuse
+    chunks = []
+    for m in matches:
+        meta = m.get('metadata', {}) or {}
+        txt = meta.get('text')
+        video = meta.get('video_name', 'Unknown')
+        if txt:
+            chunks.append((video, int(meta.get('chunk_index') or 0), txt))
+    chunks.sort(key=lambda c: (c[0], c[1], c[2][:64]))
+    # distinct source marker for LLM
+    return _join_capped((f"SOURCE: {video}\nCONTENT: {txt}" for video, _, txt in chunks), CONTEXT_CHAR_LIMIT)
+
+def _dedupe_matches(matches: List[Dict]) -> List[Dict]:
+    """One match per (video, chunk), keeping the best-scoring copy, in first-seen order"""
+    best = {}
+    for m in matches:
+        meta = m.get('metadata', {}) or {}
+        chunk_index = meta.get('chunk_index')
+        key = (meta.get('video_name'), chunk_index) if chunk_index is not None else meta.get('text')
+        kept = best.get(key)
+        if kept is None or (m.get('score') or 0) > (kept.get('score') or 0):
+            best[key] = m
+    return list(best.values())
+
 def aggregate_category_content(category: str, top_k: int = None, course_id: int = 1) -> str:
     if top_k is None:
-        top_k = db.get_system_setting('rag_top_k', 50)
+        top_k = get_settings({'rag_top_k': 50})['rag_top_k']
+    
+    cache_key = f"{CATEGORY_CONTENT_CACHE_PREFIX}{course_id}:{category}:{top_k}"
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
         
     try:
         # Create embedding for the category prompt
@@ -70,24 +205,21 @@ def aggregate_category_content(category: str, top_k: int = None, course_id: int
     if not embedding:
         return ""
 
-    text_chunks: List[str] = []
+    combined = ""
     try:
         # Use pinecone service to query
         results = query_pinecone(embedding, category, top_k=top_k, course_id=course_id)
-        
-        # Collect metadata text
-        for m in results:
-            meta = m.get('metadata', {}) or {}
-            txt = meta.get('text')
-            video = meta.get('video_name', 'Unknown')
-            if txt:
-                # distinct source marker for LLM
-                text_chunks.append(f"SOURCE: {video}\nCONTENT: {txt}")
+        combined = _format_category_material(results)
     except Exception as e:
         logger.error(f"Failed to aggregate category content: {e}")
     
-    combined = "\n\n".join(text_chunks)
-    return combined[:20000]
+    if combined:
+        cache_set(cache_key, combined, CATEGORY_CONTENT_CACHE_TTL)
+    return combined
+
+def training_material_version(material: str) -> str:
+    """Short content hash identifying one version of a category's training material"""
+    return hashlib.md5(material.encode('utf-8')).hexdigest()[:8]
 
 def build_answer_rag_context(category: str, user_answer: str, top_k: int = 5, course_id: int = 1) -> str:
     """
@@ -114,8 +246,7 @@ def build_answer_rag_context(category: str, user_answer: str, top_k: int = 5, co
         if not texts:
             return aggregate_category_content(category, top_k=top_k, course_id=course_id)
             
-        combined = "\n\n".join(texts)
-        return combined[:20000]
+        return _join_capped(texts, CONTEXT_CHAR_LIMIT)
     except Exception as e:
         logger.error(f"Answer RAG context build failed: {e}")
         return aggregate_category_content(category, top_k=top_k, course_id=course_id)
@@ -152,19 +283,75 @@ def determine_adaptive_difficulty(user_id: int, category: str, course_id: int =
         logger.error(f"Error determining adaptive difficulty: {e}")
         return 'basics'
 
+def _unit(vec) -> np.ndarray:
+    """float32 copy of vec scaled to unit length, so cosine similarity is a plain dot product"""
+    a = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(a))
+    return a / norm if norm else a
+
+def _quantize_i8(vec: np.ndarray):
+    """(int8 components, scale) approximating vec as components * scale"""
+    peak = float(np.max(np.abs(vec))) if vec.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    return np.round(vec / scale).astype(np.int8), scale
+
+def _store_expected_embeddings(question_ids: List[int], questions: List[Dict]):
+    """Embed all expected answers in one request so evaluation only has to embed the user's answer"""
+    pairs = [(qid, q.get('expected_answer')) for qid, q in zip(question_ids, questions) if q.get('expected_answer')]
+    if not pairs:
+        return
+    try:
+        embeddings = create_embeddings_batch([expected for _, expected in pairs])
+        quantized = [(qid, _quantize_i8(_unit(vec))) for (qid, _), vec in zip(pairs, embeddings)]
+        db.save_expected_embeddings([(qid, q.tobytes(), scale) for qid, (q, scale) in quantized])
+        for qid, entry in quantized:
+            cache_set(f"expected_embedding:{qid}", entry, EXPECTED_EMBEDDING_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Could not precompute expected-answer embeddings: {e}")
+
+def _expected_embedding(question: Dict) -> Optional[np.ndarray]:
+    """Unit-length expected-answer embedding stored when the question was prepared, kept in memory after the first read"""
+    question_id = question.get('id')
+    if question_id is None:
+        return None
+    cache_key = f"expected_embedding:{question_id}"
+    entry = cache_get(cache_key)
+    if entry is None:
+        stored = db.get_expected_embedding(question_id)
+        if not stored:
+            return None
+        blob, scale = stored
+        if scale is None:
+            # float32 rows from before quantisation are converted here, once
+            entry = _quantize_i8(_unit(np.frombuffer(blob, dtype=np.float32)))
+        else:
+            entry = (np.frombuffer(blob, dtype=np.int8), scale)
+        cache_set(cache_key, entry, EXPECTED_EMBEDDING_CACHE_TTL)
+    q, scale = entry
+    return _unit(q * np.float32(scale))
+
 def prepare_questions(session_id: int, category: str, difficulty: str, duration_minutes: int = 10, mode: str = 'standard', course_id: int = 1) -> Dict:
     """
     Prepare questions for a session using LLM and RAG.
     Replaces prepare_questions_internal_v3
     """
     # Fetch System Settings
-    q_per_min = db.get_system_setting('questions_per_min', 0.6)
-    abs_min = db.get_system_setting('min_questions', 7)
-    abs_max = db.get_system_setting('max_questions', 25)
-    gen_source = db.get_system_setting('generate_source', 'default')
-    llm_model = db.get_system_setting('llm_model', 'openai/gpt-4o')
-    temp_questions = db.get_system_setting('temperature_questions', 0.7)
-    rag_top_k = db.get_system_setting('rag_top_k', 50)
+    settings = get_settings({
+        'questions_per_min': 0.6,
+        'min_questions': 7,
+        'max_questions': 25,
+        'generate_source': 'default',
+        'llm_model': 'openai/gpt-4o',
+        'temperature_questions': 0.7,
+        'rag_top_k': 50
+    })
+    q_per_min = settings['questions_per_min']
+    abs_min = settings['min_questions']
+    abs_max = settings['max_questions']
+    gen_source = settings['generate_source']
+    llm_model = settings['llm_model']
+    temp_questions = settings['temperature_questions']
+    rag_top_k = settings['rag_top_k']
 
     # Base minimum counts by difficulty
     min_counts = {
@@ -208,21 +395,23 @@ def prepare_questions(session_id: int, category: str, difficulty: str, duration_
             recent_questions = db.get_recent_questions(session_data['user_id'], category, limit=50, course_id=course_id)
     except Exception as e:
         logger.error(f"Failed to fetch recent questions: {e}")
+    recent_lower = frozenset(rq.lower() for rq in recent_questions)
 
     is_objection_category = 'objection' in (category or '').lower()
+    # Material retrieved by the rag_only branch, reused if that branch fails and generation falls back to the LLM
+    rag_only_content = ''
     if gen_source == 'rag_only':
         try:
-            t0 = datetime.now()
+            t0 = time.perf_counter_ns()
             prompts = [
                 f"facts about {category}",
                 f"procedures for {category}",
                 f"scenarios in {category}"
             ]
             embeddings = create_embeddings_batch(prompts)
-            matches = []
-            for emb in embeddings:
-                m = query_pinecone(emb, category, top_k=100, course_id=course_id)
-                matches.extend(m or [])
+            # The three prompts retrieve overlapping chunks; each one is used once
+            matches = _dedupe_matches([m for per_prompt in query_pinecone_batch(embeddings, category, top_k=100, course_id=course_id) for m in per_prompt])
+            rag_only_content = _format_category_material(matches)
             texts = []
             for m in matches:
                 meta = m.get('metadata') or {}
@@ -230,28 +419,16 @@ def prepare_questions(session_id: int, category: str, difficulty: str, duration_
                 video = meta.get('video_name') or 'Unknown'
                 if txt and len(txt) > 40:
                     texts.append((txt, video))
-            def split_sentences(text: str) -> List[str]:
-                import re
-                s = re.split(r'(?<=[\\.\\?!])\\s+', text.strip())
-                return [x.strip() for x in s if 40 <= len(x.strip()) <= 240]
-            stop = set(['the','and','or','a','an','of','for','to','in','on','with','by','is','are','was','were','be','as','at','from','that','this','it'])
-            def key_points_for(s: str) -> List[str]:
-                words = [w.strip(',.!?').lower() for w in s.split()]
-                uniq = []
-                for w in words:
-                    if w.isalpha() and w not in stop and w not in uniq:
-                        uniq.append(w)
-                return uniq[:3]
             generated = []
             for txt, video in texts:
-                for sent in split_sentences(txt):
+                for sent in _split_sentences(txt):
                     qtype = 'factual'
                     ls = sent.lower()
-                    if any(k in ls for k in ['steps','procedure','how to','first','then','next']):
+                    if _PROCEDURAL_RE.search(ls):
                         qtype = 'procedural'
-                    elif any(k in ls for k in ['scenario','what if','handle','customer says','deal with']):
+                    elif _SCENARIO_RE.search(ls):
                         qtype = 'scenario'
-                    is_obj = any(k in ls for k in ['objection','price','budget','looks fake','concern','hesitate'])
+                    is_obj = bool(_OBJECTION_RE.search(ls))
                     q = {
                         'question': {
                             'factual': f"What does the training say about: {sent[:80]}?",
@@ -259,7 +436,7 @@ def prepare_questions(session_id: int, category: str, difficulty: str, duration_
                             'scenario': f"How would you handle this scenario: {sent[:100]}"
                         }[qtype],
                         'expected_answer': sent,
-                        'key_points': key_points_for(sent),
+                        'key_points': _key_points_for(sent),
                         'source': video,
                         'difficulty': difficulty,
                         'is_objection': is_obj
@@ -269,20 +446,20 @@ def prepare_questions(session_id: int, category: str, difficulty: str, duration_
                         break
                 if len(generated) >= num_questions * 2:
                     break
-            seen = set([rq.lower() for rq in recent_questions])
             dedup = []
             for q in generated:
                 qt = (q.get('question') or '').lower()
-                if qt and qt not in seen:
+                if qt and qt not in recent_lower:
                     dedup.append(q)
                 if len(dedup) >= num_questions:
                     break
             if not dedup:
                 logger.warning("RAG-only generation produced no questions")
                 dedup = generated[:num_questions]
-            db.save_prepared_questions(session_id, dedup)
+            question_ids = db.save_prepared_questions(session_id, dedup)
+            _store_expected_embeddings(question_ids, dedup)
             stored = db.get_session_questions(session_id)
-            logger.info(f"rag_only_generation_ms={int((datetime.now()-t0).total_seconds()*1000)} category={category} count={len(stored)}")
+            logger.info(f"rag_only_generation_ms={(time.perf_counter_ns() - t0) // 1_000_000} category={category} count={len(stored)}")
             return {'questions': stored}
         except Exception as e:
             logger.error(f"RAG-only generation failed: {e}", exc_info=True)
@@ -324,23 +501,30 @@ def prepare_questions(session_id: int, category: str, difficulty: str, duration_
             "- Do NOT simplify language; use professional terminology.\n"
         )
 
-    content = aggregate_category_content(category, top_k=rag_top_k, course_id=course_id)
+    content = rag_only_content or aggregate_category_content(category, top_k=rag_top_k, course_id=course_id)
     if not content or len(content) < 50:
         training_material_section = f"NOTE: Specific training material unavailable. Use your expert knowledge about '{category}' in a high-ticket sales context."
         strict_rule_1 = "1) Every question must be answerable from the provided context if available. Otherwise, use conservative knowledge."
     else:
-        training_material_section = f"TRAINING MATERIAL (verbatim excerpts; do not invent facts):\n{content[:8000]}"
+        material = content[:8000]
+        material_version = training_material_version(material)
+        logger.info(f"training_material_version={material_version} category={category}")
+        training_material_section = f"TRAINING MATERIAL (version {material_version}; verbatim excerpts; do not invent facts):\n{material}"
         strict_rule_1 = "1) Every question must be answerable from the material. No outside knowledge."
 
+    avoid_section = ''
+    if recent_questions:
+        avoid_section = "AVOID REPEATING THESE RECENTLY ASKED QUESTIONS:\n" + "\n".join(
+            '- ' + q[:100] + '...' for q in recent_questions[:20]
+        ) + "\n"
+
     system_prompt = f"""You are an expert sales training coach creating exam questions.
 
 {training_material_section}
 
 TASK: Generate exactly {num_questions} questions to test knowledge of "{category}".
 
-{f'''AVOID REPEATING THESE RECENTLY ASKED QUESTIONS:
-{chr(10).join(['- ' + q[:100] + '...' for q in recent_questions[:20]])}
-''' if recent_questions else ''}
+{avoid_section}
 
 QUESTION MIX for difficulty "{difficulty}":
 - Order questions from EASIEST to HARDEST (Progressive Difficulty).
@@ -371,43 +555,45 @@ OUTPUT (JSON only):
     }}
   ]
 }}"""
+    llm_messages = [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': f'Generate {num_questions} exam questions for {category} at {difficulty} level.'}
+    ]
+    cache_key = llm_cache.prompt_key(llm_model, temp_questions, llm_messages)
     try:
-        t0 = datetime.now()
-        response = requests.post(
-            'https://openrouter.ai/api/v1/chat/completions',
-            headers={
-                'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                'Content-Type': 'application/json',
-                'X-Title': 'AHL Sales Trainer'
-            },
-            json={
-                'model': llm_model,
-                'messages': [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': f'Generate {num_questions} exam questions for {category} at {difficulty} level.'}
-                ],
-                'temperature': temp_questions,
-                'max_tokens': min(300 + num_questions * 150, 4500)
-            },
-            timeout=45
-        )
-        response.raise_for_status()
-        result = response.json()
-        content_response = result['choices'][0]['message']['content']
+        t0 = time.perf_counter_ns()
+        data = llm_cache.get_cached(cache_key)
+        if data is None:
+            response = _OPENROUTER_SESSION.post(
+                OPENROUTER_CHAT_URL,
+                data=orjson.dumps({
+                    'model': llm_model,
+                    'messages': llm_messages,
+                    'temperature': temp_questions,
+                    'max_tokens': min(300 + num_questions * 150, 4500),
+                    'response_format': JSON_RESPONSE_FORMAT
+                }),
+                timeout=45
+            )
+            response.raise_for_status()
+            result = response.json()
+            content_response = result['choices'][0]['message']['content']
         
-        try:
-            data = extract_json_from_text(content_response)
-        except ValueError:
-            logger.warning("JSON extraction failed in prepare_questions, trying simple cleanup")
-            # Fallback simple cleanup if the robust extractor fails (unlikely but safe)
-            if '```json' in content_response:
-                content_response = content_response.split('```json')[1].split('```')[0]
-            elif '```' in content_response:
-                content_response = content_response.split('```')[1].split('```')[0]
-            data = json.loads(content_response.strip())
+            try:
+                data = extract_json_from_text(content_response)
+            except ValueError:
+                logger.warning("JSON extraction failed in prepare_questions, trying simple cleanup")
+                # Fallback simple cleanup if the robust extractor fails (unlikely but safe)
+                if '```json' in content_response:
+                    content_response = content_response.split('```json')[1].split('```')[0]
+                elif '```' in content_response:
+                    content_response = content_response.split('```')[1].split('```')[0]
+                data = orjson.loads(content_response.strip())
+            if data.get('questions'):
+                llm_cache.set_cached(cache_key, data)
             
         questions = data.get('questions', [])
-        logger.info(f"question_generation_duration_ms={int((datetime.now()-t0).total_seconds()*1000)} category={category} difficulty={difficulty}")
+        logger.info(f"question_generation_duration_ms={(time.perf_counter_ns() - t0) // 1_000_000} category={category} difficulty={difficulty}")
     except Exception as e:
         logger.error(f"Question generation failed: {e}", exc_info=True)
         # Fallback questions to keep training flow working offline
@@ -457,43 +643,59 @@ OUTPUT (JSON only):
         questions = (base * ((num_questions // len(base)) + 1))[:num_questions]
     
     try:
-        db.save_prepared_questions(session_id, questions)
+        question_ids = db.save_prepared_questions(session_id, questions)
+        _store_expected_embeddings(question_ids, questions)
         stored = db.get_session_questions(session_id)
     except Exception as e:
         logger.error(f"Saving prepared questions failed: {e}")
         stored = []
     return {'questions': stored}
 
-import math
-
-def calculate_cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity between two vectors"""
-    if not vec1 or not vec2 or len(vec1) != len(vec2):
+def calculate_cosine_similarity(vec1, vec2) -> float:
+    """Calculate cosine similarity between two vectors (lists or numpy arrays)"""
+    if vec1 is None or vec2 is None or len(vec1) == 0 or len(vec1) != len(vec2):
         return 0.0
     
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    norm_a = math.sqrt(sum(a * a for a in vec1))
-    norm_b = math.sqrt(sum(b * b for b in vec2))
+    a = np.asarray(vec1, dtype=np.float32)
+    b = np.asarray(vec2, dtype=np.float32)
+    norm_product = float(np.linalg.norm(a) * np.linalg.norm(b))
     
-    if norm_a == 0 or norm_b == 0:
+    if norm_product == 0:
         return 0.0
         
-    return dot_product / (norm_a * norm_b)
+    return float(a @ b) / norm_product
+
+def _remember_evaluation(cache_key: str, question_id: Optional[int], user_answer: str, evaluation: Dict):
+    """Cache a fresh LLM evaluation by exact prompt and, when possible, by answer meaning"""
+    llm_cache.set_cached(cache_key, evaluation, persistent=True)
+    if question_id is None:
+        return
+    try:
+        llm_cache.remember_evaluation(question_id, create_embeddings_batch([user_answer])[0], evaluation)
+    except Exception as e:
+        logger.warning(f"Could not index evaluation for similar answers: {e}")
 
 def evaluate_answer(session_id: int, question: Dict, user_answer: str, category: str, course_id: int = 1) -> Dict:
     """
     Evaluate a user's answer against the question and training material.
     Includes fuzzy match fallback using embeddings.
     """
+    # Embedding the answer and querying Pinecone runs while the rest of the prompt inputs are gathered
+    rag_future = _RAG_EXECUTOR.submit(build_answer_rag_context, category, user_answer, 5, course_id)
+    
     # Fetch Settings
-    llm_model = db.get_system_setting('llm_model', 'openai/gpt-4o')
-    temp_eval = db.get_system_setting('temperature_eval', 0.3)
-    max_tokens = db.get_system_setting('max_tokens_answer', 1000)
+    settings = get_settings({
+        'llm_model': 'openai/gpt-4o',
+        'temperature_eval': 0.3,
+        'max_tokens_answer': 1000
+    })
+    llm_model = settings['llm_model']
+    temp_eval = settings['temperature_eval']
+    max_tokens = settings['max_tokens_answer']
 
     # Build evaluation prompt (objection vs standard)
     key_points = json.loads(question.get('key_points_json') or '[]')
     is_objection = bool(question.get('is_objection'))
-    training_content = build_answer_rag_context(category, user_answer, top_k=5, course_id=course_id)
     
     # Fetch session mode
     try:
@@ -501,6 +703,8 @@ def evaluate_answer(session_id: int, question: Dict, user_answer: str, category:
         mode = sess.get('mode', 'standard')
     except:
         mode = 'standard'
+    
+    training_content = rag_future.result()
         
     is_exam = mode == 'exam'
     
@@ -627,53 +831,66 @@ OUTPUT JSON:
   "spoken_feedback": "Short, encouraging, specific 1-2 sentences for TTS",
   "evidence_from_training": ""
 }}"""
-    try:
-        t0 = datetime.now()
-        eval_response = requests.post(
-            'https://openrouter.ai/api/v1/chat/completions',
-            headers={
-                'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                'Content-Type': 'application/json',
-                'X-Title': 'AHL Sales Trainer'
-            },
-            json={
-                'model': llm_model,
-                'messages': [
-                    {'role': 'system', 'content': evaluation_prompt},
-                    {'role': 'user', 'content': 'Evaluate this answer strictly but fairly.'}
-                ],
-                'temperature': temp_eval,
-                'max_tokens': max_tokens
-            },
-            timeout=30
-        )
-        eval_response.raise_for_status()
-        result = eval_response.json()
-        content = result['choices'][0]['message']['content']
-        
-        # Robust JSON extraction
+    llm_messages = [
+        {'role': 'system', 'content': evaluation_prompt},
+        {'role': 'user', 'content': 'Evaluate this answer strictly but fairly.'}
+    ]
+    # Keyed on the full prompt (question, answer, retrieved material, model), so a stored
+    # evaluation is only reused for exactly the same grading request, even after a restart
+    cache_key = llm_cache.prompt_key(llm_model, temp_eval, llm_messages)
+    evaluation = llm_cache.get_cached(cache_key, persistent=True)
+    if evaluation is None and question.get('id') is not None:
         try:
-            evaluation = extract_json_from_text(content)
+            evaluation = llm_cache.find_similar_evaluation(
+                question['id'], lambda: create_embeddings_batch([user_answer])[0]
+            )
         except Exception as e:
-            logger.warning(f"JSON extraction failed in evaluate_answer: {e}. Content: {content[:200]}...")
-            # Last resort fallback if extract_json_from_text fails
-            if '```json' in content:
-                clean_content = content.split('```json')[1].split('```')[0].strip()
-                evaluation = json.loads(clean_content)
-            elif '```' in content:
-                clean_content = content.split('```')[1].split('```')[0].strip()
-                evaluation = json.loads(clean_content)
-            else:
-                raise ValueError("No JSON object found in response")
-
-        logger.info(f"evaluation_duration_ms={int((datetime.now()-t0).total_seconds()*1000)} category={category} is_objection={is_objection}")
-    except Exception as e:
-        logger.error(f"Evaluation failed: {e}. Content was: {content if 'content' in locals() else 'No content'}", exc_info=True)
-        evaluation = {
-            'accuracy': None, 'completeness': None, 'clarity': None,
-            'tone': None, 'technique': None, 'closing': None,
-            'overall_score': 0, 'feedback': 'Evaluation failed due to technical error', 'evidence_from_training': '',
-        }
+            logger.warning(f"Similar-answer lookup failed: {e}")
+    
+    if evaluation is not None:
+        logger.info(f"evaluation_cache_hit category={category} is_objection={is_objection}")
+    else:
+        try:
+            t0 = time.perf_counter_ns()
+            eval_response = _OPENROUTER_SESSION.post(
+                OPENROUTER_CHAT_URL,
+                data=orjson.dumps({
+                    'model': llm_model,
+                    'messages': llm_messages,
+                    'temperature': temp_eval,
+                    'max_tokens': max_tokens,
+                    'response_format': JSON_RESPONSE_FORMAT
+                }),
+                timeout=30
+            )
+            eval_response.raise_for_status()
+            result = eval_response.json()
+            content = result['choices'][0]['message']['content']
+            
+            # Robust JSON extraction
+            try:
+                evaluation = extract_json_from_text(content)
+            except Exception as e:
+                logger.warning(f"JSON extraction failed in evaluate_answer: {e}. Content: {content[:200]}...")
+                # Last resort fallback if extract_json_from_text fails
+                if '```json' in content:
+                    clean_content = content.split('```json')[1].split('```')[0].strip()
+                    evaluation = orjson.loads(clean_content)
+                elif '```' in content:
+                    clean_content = content.split('```')[1].split('```')[0].strip()
+                    evaluation = orjson.loads(clean_content)
+                else:
+                    raise ValueError("No JSON object found in response")
+
+            logger.info(f"evaluation_duration_ms={(time.perf_counter_ns() - t0) // 1_000_000} category={category} is_objection={is_objection}")
+            _remember_evaluation(cache_key, question.get('id'), user_answer, evaluation)
+        except Exception as e:
+            logger.error(f"Evaluation failed: {e}. Content was: {content if 'content' in locals() else 'No content'}", exc_info=True)
+            evaluation = {
+                'accuracy': None, 'completeness': None, 'clarity': None,
+                'tone': None, 'technique': None, 'closing': None,
+                'overall_score': 0, 'feedback': 'Evaluation failed due to technical error', 'evidence_from_training': '',
+            }
     
     evaluation['user_answer'] = user_answer
 
@@ -706,10 +923,20 @@ OUTPUT JSON:
             # 2. Semantic Similarity Check
             expected = question.get('expected_answer', '')
             if expected:
-                # Generate embeddings for both
-                embeddings = create_embeddings_batch([user_answer, expected])
-                if len(embeddings) == 2:
-                    similarity = calculate_cosine_similarity(embeddings[0], embeddings[1])
+                overlap = _token_overlap(user_answer, expected)
+                if overlap >= LEXICAL_MATCH_THRESHOLD:
+                    # Near-identical wording already settles the high-similarity tier without an embedding request
+                    similarity = overlap
+                else:
+                    # Only the user's answer needs embedding when the expected one was stored at preparation
+                    expected_embedding = _expected_embedding(question)
+                    if expected_embedding is not None:
+                        # Both sides unit length: cosine similarity is their dot product
+                        similarity = float(_unit(create_embeddings_batch([user_answer])[0]) @ expected_embedding)
+                    else:
+                        embeddings = create_embeddings_batch([user_answer, expected])
+                        similarity = calculate_cosine_similarity(embeddings[0], embeddings[1]) if len(embeddings) == 2 else None
+                if similarity is not None:
                     logger.info(f"Fuzzy match similarity: {similarity:.4f}")
                     
                     if similarity > 0.80:
@@ -743,16 +970,7 @@ OUTPUT JSON:
         score = float(evaluation.get('overall_score') or 0)
     except Exception:
         score = 0.0
-    if score >= 8:
-        tier = 'positive'
-        fallback_speak = 'Excellent! That is correct and well-articulated.'
-    elif score >= 5:
-        tier = 'constructive'
-        fallback_speak = 'Good effort. You covered the main points, but you missed a few details.'
-    else:
-        tier = 'corrective'
-        fallback_speak = 'Not quite. Please review the training material.'
-        
+    tier, fallback_speak = _FEEDBACK_TIERS[bisect.bisect_right(_FEEDBACK_TIER_SCORES, score)]
     evaluation['feedback_tier'] = tier
     # Use LLM generated spoken feedback if available, otherwise fallback
     evaluation['speak_feedback'] = evaluation.get('spoken_feedback') or fallback_speak
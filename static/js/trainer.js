@@ -407,7 +407,8 @@
             try {
                 const res = await fetch(`${API_BASE}/api/deepgram-token`, { credentials: 'include' });
                 const data = await res.json();
-                if (data.key) return data.key;
+                // token_type is 'bearer' for a short-lived access token, 'token' for an API key
+                if (data.key) return { key: data.key, scheme: data.token_type || 'token' };
                 throw new Error(data.error || 'No key');
             } catch (e) {
                 console.error('Deepgram token error:', e);
@@ -418,13 +419,13 @@
         async function initializeDeepgram() {
             if (sessionState.deepgramSocket && (sessionState.deepgramSocket.readyState === 0 || sessionState.deepgramSocket.readyState === 1)) return;
 
-            const key = await getDeepgramToken();
-            if (!key) {
+            const credentials = await getDeepgramToken();
+            if (!credentials) {
                 showToast('Failed to connect to speech service', 'error');
                 return;
             }
 
-            const socket = new WebSocket('wss://api.deepgram.com/v1/listen?model=nova-2&smart_format=true&interim_results=true', ['token', key]);
+            const socket = new WebSocket('wss://api.deepgram.com/v1/listen?model=nova-2&smart_format=true&interim_results=true', [credentials.scheme, credentials.key]);
             
             socket.onopen = () => {
                 console.log('Deepgram connected');
@@ -731,18 +732,29 @@
             }
         }
 
-        async function fetchNextQuestion() {
-            try {
-                sessionState.currentQuestion = null;
-                const nextQ = await fetch(`${API_BASE}/api/training/get-next-question`, {
+        // Questions are generated in the background after /start, so poll while the server reports 'preparing'
+        async function requestNextQuestion() {
+            for (let attempt = 0; attempt < 60; attempt++) {
+                const response = await fetch(`${API_BASE}/api/training/get-next-question`, {
                     method: 'POST',
                     credentials: 'include',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ session_id: sessionState.sessionId })
                 });
-                const nextData = await nextQ.json();
+                const data = await response.json();
+                if (!response.ok || !data.preparing) return { ok: response.ok, data };
+                updateStatus('Preparing questions...', 'bg-blue-400');
+                await new Promise(r => setTimeout(r, 1500));
+            }
+            return { ok: false, data: { error: 'questions_not_ready' } };
+        }
+
+        async function fetchNextQuestion() {
+            try {
+                sessionState.currentQuestion = null;
+                const { ok: nextOk, data: nextData } = await requestNextQuestion();
                 
-                if (!nextQ.ok) {
+                if (!nextOk) {
                     console.error('Failed to get next question', nextData);
                     return;
                 }
@@ -972,14 +984,8 @@
             
             updateStatus('Initializing questions...', 'bg-blue-400');
             try {
-                const response = await fetch(`${API_BASE}/api/training/get-next-question`, {
-                    method: 'POST',
-                    credentials: 'include',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ session_id: sessionState.sessionId })
-                });
-                const data = await response.json();
-                if (!response.ok || data.done) {
+                const { ok, data } = await requestNextQuestion();
+                if (!ok || data.done) {
                     showToast('No prepared questions found for this session.', 'error');
                     endSession();
                     return;
@@ -3,8 +3,8 @@ import os
 import sys
 import sqlite3
 from dotenv import load_dotenv
-from pinecone import Pinecone
 from database import Database
+from services.pinecone_service import _get_pinecone_index, _slug
 
 CATEGORIES = [
     'Pre Consultation',
@@ -31,6 +31,90 @@ if not PINECONE_API_KEY or not PINECONE_INDEX_HOST:
     print("Error: Missing Pinecone configuration")
     sys.exit(1)
 
+def _build_prefix_trie(prefixes):
+    """Character trie of '<prefix>_' strings; a None key marks where a prefix ends"""
+    trie = {}
+    for prefix in prefixes:
+        node = trie
+        for ch in prefix + '_':
+            node = node.setdefault(ch, {})
+        node[None] = prefix
+    return trie
+
+def _longest_prefix(trie, ns_name):
+    """Longest prefix whose '<prefix>_' starts ns_name, found in one walk along the name"""
+    matched = None
+    node = trie
+    for ch in ns_name:
+        node = node.get(ch)
+        if node is None:
+            break
+        matched = node.get(None, matched)
+    return matched
+
+def _sync_uploads(cursor, pinecone_namespaces, prefix_map, prefix_trie):
+    """Bring the uploads table in line with the Pinecone namespaces; returns (added, deleted)"""
+    # All existing uploads in one query: (course_id, category, video_name) -> first row id
+    cursor.execute('SELECT id, category, video_name, course_id FROM uploads ORDER BY id')
+    all_uploads = cursor.fetchall()
+    existing_ids = {}
+    for upload in all_uploads:
+        existing_ids.setdefault((upload['course_id'], upload['category'], upload['video_name']), upload['id'])
+
+    # 1. ADD: Sync Pinecone -> SQLite
+    active_db_keys = set() # (course_id, category, video_name)
+    updates = []  # (chunks_created, id)
+    inserts = {}  # key -> chunks_created; a later namespace with the same key updates the pending row
+
+    for ns_name, ns_data in pinecone_namespaces.items():
+        vector_count = ns_data.get('vector_count', 0)
+        matched_prefix = _longest_prefix(prefix_trie, ns_name)
+        if not matched_prefix:
+            print(f"Skipping namespace '{ns_name}': Could not match to any known category.")
+            continue
+        course_id, category_name = prefix_map[matched_prefix]
+        video_slug = ns_name[len(matched_prefix) + 1:]
+        video_name = video_slug.replace('_', ' ').title()
+        key = (course_id, category_name, video_name)
+        active_db_keys.add(key)
+        if key in existing_ids:
+            updates.append((vector_count, existing_ids[key]))
+        else:
+            if key not in inserts:
+                print(f"  + Adding local record: CourseID={course_id}, Category='{category_name}', Video='{video_name}'")
+            inserts[key] = vector_count
+
+    cursor.executemany('UPDATE uploads SET chunks_created = ? WHERE id = ?', updates)
+    cursor.executemany('''
+        INSERT INTO uploads (category, video_name, filename, chunks_created, uploaded_by, course_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (category_name, video_name, 'Synced from Pinecone', vector_count, 1, course_id)
+        for (course_id, category_name, video_name), vector_count in inserts.items()
+    ])
+    synced_count = len(inserts)
+
+    # 2. REMOVE: Sync SQLite -> Pinecone (Delete local if not in Pinecone)
+    print("\nChecking for stale local records...")
+    stale_ids = []
+    for upload in all_uploads:
+        key = (upload['course_id'], upload['category'], upload['video_name'])
+        if key not in active_db_keys:
+            print(f"  - Deleting stale record: ID={upload['id']}, {upload['category']} - {upload['video_name']}")
+            stale_ids.append(upload['id'])
+    for i in range(0, len(stale_ids), 500):
+        chunk = stale_ids[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'DELETE FROM uploads WHERE id IN ({placeholders})', chunk)
+    deleted_count = len(stale_ids)
+    return synced_count, deleted_count
+
+def _forget_missing_namespaces(cursor, pinecone_namespaces):
+    """Drop indexed-content records of namespaces Pinecone no longer has, so re-uploading them re-embeds"""
+    cursor.execute('SELECT namespace FROM namespace_content')
+    gone = [(row['namespace'],) for row in cursor.fetchall() if row['namespace'] not in pinecone_namespaces]
+    cursor.executemany('DELETE FROM namespace_content WHERE namespace = ?', gone)
+
 def sync_pinecone_full():
     print("Starting Full Pinecone Synchronization (Add & Remove)...")
     if 'localhost' in (PINECONE_INDEX_HOST or '').lower():
@@ -41,8 +125,7 @@ def sync_pinecone_full():
     
     # Initialize Pinecone
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        index = pc.Index(host=PINECONE_INDEX_HOST)
+        index = _get_pinecone_index()
         stats = index.describe_index_stats()
     except Exception as e:
         print(f"Error connecting to Pinecone: {e}")
@@ -64,65 +147,25 @@ def sync_pinecone_full():
     prefix_map = {}  # prefix -> (course_id, category_name)
     for row in rows:
         course_id = row['course_id']
-        course_slug = (row['course_slug'] or '').lower().replace(' ', '_')
-        cat_slug = (row['category_name'] or '').lower().replace(' ', '_')
+        course_slug = _slug(row['course_slug'] or '')
+        cat_slug = _slug(row['category_name'] or '')
         if course_id == 1:
             prefix = f"{cat_slug}"
         else:
             prefix = f"{course_slug}_{cat_slug}"
         prefix_map[prefix] = (course_id, row['category_name'])
-    # Sort prefixes by length to match longest first
-    sorted_prefixes = sorted(prefix_map.keys(), key=len, reverse=True)
-
-    # 1. ADD: Sync Pinecone -> SQLite
-    synced_count = 0
-    active_db_keys = set() # (category, video_name)
-
-    for ns_name, ns_data in pinecone_namespaces.items():
-        vector_count = ns_data.get('vector_count', 0)
-        matched_prefix = None
-        for prefix in sorted_prefixes:
-            if ns_name.startswith(prefix + '_'):
-                matched_prefix = prefix
-                break
-        if not matched_prefix:
-            print(f"Skipping namespace '{ns_name}': Could not match to any known category.")
-            continue
-        course_id, category_name = prefix_map[matched_prefix]
-        video_slug = ns_name[len(matched_prefix) + 1:]
-        video_name = video_slug.replace('_', ' ').title()
-        active_db_keys.add((course_id, category_name, video_name))
-        # Check if exists in DB for this course
-        cursor.execute('''
-            SELECT id FROM uploads 
-            WHERE category = ? AND video_name = ? AND course_id = ?
-        ''', (category_name, video_name, course_id))
-        existing = cursor.fetchone()
-        if existing:
-            cursor.execute('UPDATE uploads SET chunks_created = ? WHERE id = ?', (vector_count, existing['id']))
-        else:
-            print(f"  + Adding local record: CourseID={course_id}, Category='{category_name}', Video='{video_name}'")
-            cursor.execute('''
-                INSERT INTO uploads (category, video_name, filename, chunks_created, uploaded_by, course_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (category_name, video_name, 'Synced from Pinecone', vector_count, 1, course_id))
-            synced_count += 1
-
-    # 2. REMOVE: Sync SQLite -> Pinecone (Delete local if not in Pinecone)
-    print("\nChecking for stale local records...")
-    cursor.execute('SELECT id, category, video_name, course_id FROM uploads')
-    all_uploads = cursor.fetchall()
-    
-    deleted_count = 0
-    for upload in all_uploads:
-        key = (upload['course_id'], upload['category'], upload['video_name'])
-        if key not in active_db_keys:
-            print(f"  - Deleting stale record: ID={upload['id']}, {upload['category']} - {upload['video_name']}")
-            cursor.execute('DELETE FROM uploads WHERE id = ?', (upload['id'],))
-            deleted_count += 1
+    # Longest matching prefix wins, e.g. a course slug prefix over a bare category
+    prefix_trie = _build_prefix_trie(prefix_map)
 
-    conn.commit()
-    conn.close()
+    # Read-decide-write runs as one transaction: the write lock is taken before uploads are
+    # read, so a concurrent upload cannot slip in between, and the sync costs one commit
+    try:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            synced_count, deleted_count = _sync_uploads(cursor, pinecone_namespaces, prefix_map, prefix_trie)
+            _forget_missing_namespaces(cursor, pinecone_namespaces)
+    finally:
+        conn.close()
     
     print(f"\nSync complete.")
     print(f"  - Added: {synced_count}")
@@ -40,9 +40,31 @@ def client(db_path):
     app_db.db_path = db_path
     app_db.initialize()
     
+    # Cached rows from a previous test's database must not leak into this one
+    from utils.cache import CACHE
+    CACHE.clear()
+    
     with flask_app.test_client() as client:
         with flask_app.app_context():
             yield client
+    
+    # Let background work and queued audit events land in this test's database
+    from utils.background import wait_for_background
+    wait_for_background()
+    from services.audit_service import flush_audit_log
+    flush_audit_log()
+    from services.draft_service import flush_drafts
+    flush_drafts()
             
     # Restore original path (though not strictly necessary for one-off test runs)
     app_db.db_path = original_path
+
+@pytest.fixture
+def fake_http_post(monkeypatch):
+    """Route requests.post and every pooled requests.Session's post through the given fake"""
+    import requests
+    
+    def install(fake_post):
+        monkeypatch.setattr(requests, 'post', fake_post)
+        monkeypatch.setattr(requests.Session, 'post', lambda self, url, *args, **kwargs: fake_post(url, *args, **kwargs))
+    return install
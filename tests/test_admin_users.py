@@ -61,6 +61,7 @@ def test_list_users_pagination_and_search(client, db):
     assert body1['pagination']['limit'] == 5
     assert body1['pagination']['page'] == 1
     assert body1['pagination']['total'] >= 16
+    assert body1['pagination']['pages'] == -(-body1['pagination']['total'] // 5)
     assert len(body1['users']) == 5
     
     # Page 2 limit 5
@@ -87,3 +88,57 @@ def test_list_users_requires_admin(client, db):
     # Attempt to access admin list endpoint
     resp = client.get('/api/admin/users')
     assert resp.status_code == 403
+
+def test_current_user_looked_up_once_per_request(client, db, monkeypatch):
+    from app import app as flask_app
+    from extensions import db as app_db
+    from utils.decorators import current_user
+
+    user_id = db.create_user("lookup_admin", "pass", "Admin", "admin")
+    lookups = []
+    real_get = app_db.get_user_by_id
+    monkeypatch.setattr(app_db, 'get_user_by_id', lambda uid: lookups.append(uid) or real_get(uid))
+
+    with flask_app.test_request_context():
+        from flask import session
+        session['user_id'] = user_id
+        assert current_user()['username'] == 'lookup_admin'
+        assert current_user()['username'] == 'lookup_admin'
+    with flask_app.test_request_context():
+        assert current_user() is None
+    assert lookups == [user_id]
+
+def test_role_checks_reuse_cached_user_across_requests(client, db, monkeypatch):
+    from extensions import db as app_db
+
+    login_admin(client, db)
+    lookups = []
+    real_get = app_db.get_user_by_id
+    monkeypatch.setattr(app_db, 'get_user_by_id', lambda uid: lookups.append(uid) or real_get(uid))
+
+    for _ in range(3):
+        assert client.get('/api/admin/users?limit=1').status_code == 200
+    assert len(lookups) == 1
+
+def test_role_checks_do_not_trust_the_display_cache(client, db):
+    from flask import g
+    from services.auth_service import invalidate_user
+
+    def admin_list_status():
+        # The client fixture's app context, and so g's per-request lookup, spans requests
+        g.pop('_current_user', None)
+        return client.get('/api/admin/users?limit=1').status_code
+
+    login_admin(client, db)
+    user_id = db.get_user_by_username("admin")['id']
+    assert client.get('/api/auth/me').status_code == 200
+    
+    # Demote behind the app's back, as another worker would; /me's cached copy still says admin
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET role = 'candidate' WHERE id = ?", (user_id,))
+    assert admin_list_status() == 403
+    
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET role = 'admin' WHERE id = ?", (user_id,))
+    invalidate_user(user_id)
+    assert admin_list_status() == 200
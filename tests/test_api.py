@@ -92,3 +92,157 @@ def test_search_api(client, db):
     data = json.loads(response.data)
     assert len(data['sessions']) == 1
     assert data['sessions'][0]['id'] == s_id
+    
+    # Unchanged results revalidate with 304
+    etag = response.headers['ETag']
+    response = client.get('/api/admin/sessions/search?min_score=9.0', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    
+    db.update_session_notes(s_id, 'changed')
+    response = client.get('/api/admin/sessions/search?min_score=9.0', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+def test_me_is_cached(client, db, mocker):
+    """/me serves repeat lookups from the user cache"""
+    db.create_user("meuser", "password", "Me User", "candidate")
+    client.post('/api/auth/login', json={'username': 'meuser', 'password': 'password'})
+    
+    from app import db as app_db
+    spy = mocker.spy(app_db, 'get_user_by_id')
+    for _ in range(3):
+        response = client.get('/api/auth/me')
+        assert response.status_code == 200
+        assert json.loads(response.data)['username'] == 'meuser'
+    assert spy.call_count == 1
+
+def test_routes_registered_once(client):
+    """Every URL rule/method pair is served by exactly one endpoint"""
+    from app import app
+    seen = {}
+    for rule in app.url_map.iter_rules():
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            key = (rule.rule, method)
+            assert key not in seen, f"{key} registered by {seen[key]} and {rule.endpoint}"
+            seen[key] = rule.endpoint
+
+def test_deepgram_token_alias(client, db, monkeypatch):
+    """The trainer's /api/deepgram-token path is served by the training handler"""
+    import routes.training_routes as training_routes
+    def failing_grant(*args, **kwargs):
+        raise training_routes.requests.ConnectionError('offline')
+    monkeypatch.setattr(training_routes, '_DG_KEY', 'dg-test-key')
+    monkeypatch.setattr(training_routes.requests, 'post', failing_grant)
+    db.create_user("dguser", "password", "DG User", "candidate")
+    client.post('/api/auth/login', json={'username': 'dguser', 'password': 'password'})
+    for path in ('/api/deepgram-token', '/api/training/deepgram-token'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert json.loads(response.data)['key'] == 'dg-test-key'
+
+def test_login_rejects_malformed_body(client):
+    """Non-JSON or wrongly typed login bodies are validation errors, not server errors"""
+    response = client.post('/api/auth/login', data='not json', content_type='application/json')
+    assert response.status_code == 400
+    response = client.post('/api/auth/login', json={'username': 123, 'password': ['x']})
+    assert response.status_code == 400
+    assert json.loads(response.data)['error'] == 'validation_error'
+
+def test_login_audit_events_are_written(client, db):
+    """Queued audit events reach the audit_log table"""
+    from services.audit_service import _audit_queue
+    db.create_user("audited", "password", "Audited User", "candidate")
+    client.post('/api/auth/login', json={'username': 'audited', 'password': 'wrong'})
+    client.post('/api/auth/login', json={'username': 'audited', 'password': 'password'})
+    _audit_queue.join()
+    
+    actions = [log['action'] for log in db.get_audit_logs()]
+    assert 'login_failed' in actions
+    assert 'login_success' in actions
+
+def test_update_session_notes(client, db):
+    """Notes bodies are parsed by the app's JSON provider"""
+    admin_id = db.create_user("notesadmin", "pass", "Notes Admin", "admin")
+    session_id = db.create_session(admin_id, "Sales", "basics", 10)
+    client.post('/api/auth/login', json={'username': 'notesadmin', 'password': 'pass'})
+    
+    response = client.put(f'/api/admin/sessions/{session_id}/notes', json={'notes': 'Good rapport – needs pacing'})
+    assert response.status_code == 200
+    assert db.get_session(session_id)['notes'] == 'Good rapport – needs pacing'
+    
+    response = client.put(f'/api/admin/sessions/{session_id}/notes', data='{broken', content_type='application/json')
+    assert response.status_code == 400
+
+def test_categories_cached_until_admin_change(client, db):
+    """/categories is served from cache and refreshed when an admin adds a category"""
+    db.create_user("catadmin", "pass", "Cat Admin", "admin")
+    client.post('/api/auth/login', json={'username': 'catadmin', 'password': 'pass'})
+    
+    first = json.loads(client.get('/api/training/categories?course_id=1').data)['categories']
+    db.create_upload_record('Hidden', 'Video', 'v.txt', 3, 1, course_id=1)
+    assert json.loads(client.get('/api/training/categories?course_id=1').data)['categories'] == first
+    
+    response = client.post('/api/admin/courses/1/categories', json={'name': 'Fresh Category'})
+    assert response.status_code == 200
+    names = [c['name'] for c in json.loads(client.get('/api/training/categories?course_id=1').data)['categories']]
+    assert 'Fresh Category' in names
+
+def test_orjson_provider_matches_default_output(client):
+    """orjson-backed responses encode like Flask's stdlib provider"""
+    from datetime import datetime
+    from flask.json.provider import DefaultJSONProvider
+    from app import app
+    stdlib = DefaultJSONProvider(app)
+    payload = {'b': 1, 'a': [1.5, None, 'naïve – text'], 'when': datetime(2024, 1, 2, 3, 4, 5)}
+    assert json.loads(app.json.dumps(payload)) == json.loads(stdlib.dumps(payload))
+    assert app.json.dumps({3: 'x', 1: 'y'}) == stdlib.dumps({3: 'x', 1: 'y'}, separators=(',', ':'))
+    assert app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+
+def test_autosave_draft_round_trip(client, db):
+    """Autosaved state is returned by the resume check"""
+    user_id = db.create_user("drafter", "password", "Drafter", "candidate")
+    session_id = db.create_session(user_id, "Sales", "trial", 10)
+    client.post('/api/auth/login', json={'username': 'drafter', 'password': 'password'})
+    
+    state = {'transcript': ['Hi – there'], 'question_index': 2}
+    response = client.post('/api/training/autosave', json={'session_id': session_id, 'state': state})
+    assert response.status_code == 200
+    
+    data = json.loads(client.get('/api/training/resume-check').data)
+    assert data['session_id'] == session_id
+    assert data['draft'] == state
+
+def test_autosave_is_buffered_until_flush(client, db):
+    """Autosaves only reach the database when the draft buffer is flushed"""
+    from services.draft_service import flush_drafts
+    user_id = db.create_user("buffered", "password", "Buffered", "candidate")
+    session_id = db.create_session(user_id, "Sales", "trial", 10)
+    client.post('/api/auth/login', json={'username': 'buffered', 'password': 'password'})
+    
+    for i in range(3):
+        client.post('/api/training/autosave', json={'session_id': str(session_id), 'state': {'step': i}})
+    assert db.get_session_draft(session_id) is None
+    
+    flush_drafts()
+    assert db.get_session_draft(session_id) == {'step': 2}
+
+def test_deepgram_temporary_token_is_cached(client, db, monkeypatch):
+    """A minted Deepgram access token is handed out instead of the API key and reused"""
+    import routes.training_routes as training_routes
+    grants = []
+    class GrantResponse:
+        def raise_for_status(self): ...
+        def json(self):
+            return {'access_token': 'temp-jwt', 'expires_in': 300}
+    def fake_grant(url, headers=None, **kwargs):
+        grants.append(headers['Authorization'])
+        return GrantResponse()
+    monkeypatch.setattr(training_routes, '_DG_KEY', 'dg-test-key')
+    monkeypatch.setattr(training_routes.requests, 'post', fake_grant)
+    
+    db.create_user("dgtemp", "password", "DG Temp", "candidate")
+    client.post('/api/auth/login', json={'username': 'dgtemp', 'password': 'password'})
+    for _ in range(2):
+        data = json.loads(client.get('/api/deepgram-token').data)
+        assert data == {'key': 'temp-jwt', 'token_type': 'bearer'}
+    assert grants == ['Token dg-test-key']
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+from utils import cache
+
+
+def test_cache_entries_expire_on_the_monotonic_clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(cache, 'CACHE', OrderedDict())
+
+    cache.cache_set('k', {'v': 1}, 30)
+    now[0] += 29
+    assert cache.cache_get('k') == {'v': 1}
+    now[0] += 2
+    assert cache.cache_get('k') is None
+
+
+def test_expired_entries_are_swept_in_bulk(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(cache, 'CACHE', OrderedDict())
+    monkeypatch.setattr(cache, 'CACHE_SWEEP_EVERY', 4)
+    monkeypatch.setattr(cache, '_ops', 0)
+
+    cache.cache_set('old', 1, 10)
+    cache.cache_set('fresh', 2, 100)
+    now[0] += 50
+    assert cache.cache_get('old') is None
+    assert 'old' in cache.CACHE
+    assert cache.cache_get('fresh') == 2
+    assert list(cache.CACHE) == ['fresh']
+
+
+def test_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE', OrderedDict())
+    monkeypatch.setattr(cache, 'CACHE_MAX_ENTRIES', 2)
+
+    cache.cache_set('a', 1, 60)
+    cache.cache_set('b', 2, 60)
+    assert cache.cache_get('a') == 1
+    cache.cache_set('c', 3, 60)
+
+    assert cache.cache_get('b') is None
+    assert cache.cache_get('a') == 1
+    assert cache.cache_get('c') == 3
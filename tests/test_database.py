@@ -1,4 +1,6 @@
+import os
 import pytest
+import sqlite3
 from database import Database
 
 def test_user_creation(db):
@@ -120,3 +122,282 @@ def test_user_stats(db):
     assert stats['avg_score'] == 9.0
     assert stats['sessions_by_difficulty']['Easy'] == 1
     assert stats['sessions_by_difficulty']['Hard'] == 1
+
+def test_get_sessions_for_users(db):
+    """Sessions for a page of users are fetched in one grouped query"""
+    u1 = db.create_user("batch1", "p", "Batch 1", "candidate")
+    u2 = db.create_user("batch2", "p", "Batch 2", "candidate")
+    u3 = db.create_user("batch3", "p", "Batch 3", "candidate")
+    s1 = db.create_session(u1, "Sales", "easy", 30)
+    s2 = db.create_session(u1, "Sales", "hard", 30)
+    s3 = db.create_session(u2, "Sales", "easy", 30)
+    
+    grouped = db.get_sessions_for_users([u1, u2, u3])
+    assert sorted(s['id'] for s in grouped[u1]) == [s1, s2]
+    assert [s['id'] for s in grouped[u2]] == [s3]
+    assert grouped[u3] == []
+    assert db.get_sessions_for_users([]) == {}
+
+def test_upload_lookup_uses_course_category_video_index(db):
+    """Finding a course's upload for one video probes the composite index"""
+    conn = db._get_connection()
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT id FROM uploads WHERE category = ? AND video_name = ? AND course_id = ?',
+        ('Sales', 'Intro', 1)
+    ).fetchall()
+    conn.close()
+    assert 'idx_uploads_course_category_video' in ' '.join(row[3] for row in plan)
+
+
+def test_search_sessions_uses_course_index(db):
+    """Course-scoped session search is served by the composite index"""
+    conn = db._get_connection()
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE course_id = ? AND category = ? ORDER BY started_at DESC LIMIT 20',
+        (1, 'Sales')
+    ).fetchall()
+    conn.close()
+    details = ' '.join(row[3] for row in plan)
+    assert 'idx_sessions_course_category_started' in details
+    assert 'TEMP B-TREE' not in details
+
+def test_get_session_bundle(db):
+    """Session, user and report come back from a single lookup"""
+    user_id = db.create_user("bundleuser", "p", "Bundle User", "candidate")
+    session_id = db.create_session(user_id, "Sales", "easy", 30)
+    
+    bundle = db.get_session_bundle(session_id)
+    assert bundle['session']['username'] == "bundleuser"
+    assert bundle['report'] is None
+    
+    db.save_report(session_id, "<p>report</p>", 8.0)
+    bundle = db.get_session_bundle(session_id)
+    assert bundle['report']['report_html'] == "<p>report</p>"
+    assert 'report_html' not in bundle['session']
+    assert db.get_session_bundle(99999) is None
+
+def test_search_sessions_without_total(db):
+    """Skipping the COUNT still returns the requested page"""
+    user_id = db.create_user("pager", "p", "Pager", "candidate")
+    for _ in range(3):
+        db.create_session(user_id, "Sales", "easy", 30)
+    
+    results, total = db.search_sessions(page=2, limit=2, include_total=False)
+    assert total is None
+    assert len(results) == 1
+
+def test_connections_are_reused(db):
+    """Closed connections go back to the pool and are handed out again"""
+    conn = db._get_connection()
+    raw = conn._conn
+    conn.close()
+    conn.close()  # closing twice must not return it to the pool twice
+    
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    
+    first = db._get_connection()
+    second = db._get_connection()
+    assert first._conn is raw
+    assert second._conn is not raw
+    assert first.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    first.close()
+    second.close()
+
+def test_stale_pooled_connections_are_replaced(db, db_path):
+    """Idle connections past the recycle age, or to a replaced database file, are not reused"""
+    conn = db._get_connection()
+    raw = conn._conn
+    conn.close()
+    
+    pool = db._pool_state[2]
+    pool.recycle = 0
+    conn = db._get_connection()
+    assert conn._conn is not raw
+    raw = conn._conn
+    conn.close()
+    
+    pool.recycle = 1800
+    replacement = db_path + '.restored'
+    restored = Database(replacement)
+    restored.initialize()
+    restored._pool_state[2].close_all()  # checkpoints the WAL into the file
+    os.replace(replacement, db_path)
+    conn = db._get_connection()
+    assert conn._conn is not raw
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] >= 0
+    conn.close()
+
+def test_session_questions_with_evals(db):
+    """Questions come back in order with their latest evaluation attached"""
+    user_id = db.create_user("evaluser", "p", "Eval User", "candidate")
+    session_id = db.create_session(user_id, "Sales", "easy", 30)
+    q1, q2 = db.save_prepared_questions(session_id, [
+        {'question': 'Q1', 'expected_answer': 'A1'},
+        {'question': 'Q2', 'expected_answer': 'A2'},
+    ])
+    db.save_answer_evaluation(session_id, q1, {'user_answer': 'first try', 'overall_score': 4.0})
+    db.save_answer_evaluation(session_id, q1, {'user_answer': 'second try', 'overall_score': 8.0})
+    
+    questions = db.get_session_questions_with_evals(session_id)
+    assert [q['id'] for q in questions] == [q1, q2]
+    assert questions[0]['evaluation']['user_answer'] == 'second try'
+    assert questions[0]['evaluation']['question_id'] == q1
+    assert questions[1]['evaluation'] is None
+    assert db.get_session_average_score(session_id) == 6.0
+
+def test_get_question_by_id_is_session_scoped(db):
+    """A question is only returned for the session it belongs to"""
+    user_id = db.create_user("qiduser", "p", "QID User", "candidate")
+    session_a = db.create_session(user_id, "Sales", "easy", 30)
+    session_b = db.create_session(user_id, "Sales", "easy", 30)
+    (qid,) = db.save_prepared_questions(session_a, [{'question': 'Q1', 'expected_answer': 'A1'}])
+    
+    assert db.get_question_by_id(qid, session_a)['question_text'] == 'Q1'
+    assert db.get_question_by_id(qid, session_b) is None
+
+def test_get_session_if_owned(db):
+    """The session row is returned only to its owner"""
+    owner = db.create_user("owner", "p", "Owner", "candidate")
+    other = db.create_user("other", "p", "Other", "candidate")
+    session_id = db.create_session(owner, "Sales", "easy", 30)
+    
+    sess = db.get_session_if_owned(session_id, owner)
+    assert sess['category'] == "Sales"
+    assert sess['username'] == "owner"
+    assert db.get_session_if_owned(session_id, other) is None
+
+def test_get_latest_active_session(db):
+    """Only the newest active session is returned, via the user/status index"""
+    user_id = db.create_user("resumer", "p", "Resumer", "candidate")
+    assert db.get_latest_active_session(user_id) is None
+    
+    older = db.create_session(user_id, "Sales", "easy", 30)
+    newer = db.create_session(user_id, "Pricing", "easy", 30)
+    done = db.create_session(user_id, "Closing", "easy", 30)
+    db.complete_session(done)
+    with db.connection() as conn:
+        conn.execute("UPDATE sessions SET started_at = '2024-01-01 10:00:00' WHERE id = ?", (older,))
+        conn.execute("UPDATE sessions SET started_at = '2024-01-02 10:00:00' WHERE id = ?", (newer,))
+        conn.execute("UPDATE sessions SET started_at = '2024-01-03 10:00:00' WHERE id = ?", (done,))
+        conn.commit()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE user_id = ? AND status = 'active' ORDER BY started_at DESC LIMIT 1",
+            (user_id,)
+        ).fetchall()
+    
+    assert db.get_latest_active_session(user_id)['id'] == newer
+    details = ' '.join(row[3] for row in plan)
+    assert 'idx_sessions_user_status_started' in details
+    assert 'TEMP B-TREE' not in details
+
+def test_get_progress_counters(db):
+    """Progress badges are counted in SQL over completed sessions only"""
+    user_id = db.create_user("progress", "p", "Progress", "candidate")
+    assert db.get_progress_counters(user_id) == {'completed': 0, 'high_score': 0, 'field_ready': 0}
+    
+    s1 = db.create_session(user_id, "Sales", "field-ready", 30)
+    db.complete_session(s1, overall_score=8.5)
+    s2 = db.create_session(user_id, "Sales", "trial", 30)
+    db.complete_session(s2, overall_score=6.0)
+    db.create_session(user_id, "Sales", "field-ready", 30)
+    db.create_session(user_id, "Sales", "trial", 30, course_id=2)
+    
+    assert db.get_progress_counters(user_id, course_id=1) == {'completed': 2, 'high_score': 1, 'field_ready': 1}
+
+def test_answer_evaluation_queries_use_indexes(db):
+    """Report queries over answer_evaluations are index lookups, not table scans"""
+    with db.connection() as conn:
+        avg_plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT AVG(overall_score) FROM answer_evaluations '
+            'WHERE session_id = ? AND overall_score IS NOT NULL', (1,)
+        ).fetchall()
+        latest_plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT MAX(id) FROM answer_evaluations WHERE question_id = ?', (1,)
+        ).fetchall()
+    avg_details = ' '.join(row[3] for row in avg_plan)
+    assert 'COVERING INDEX idx_answer_eval_session' in avg_details
+    assert 'idx_answer_eval_question' in ' '.join(row[3] for row in latest_plan)
+
+def test_next_question_cursor_follows_answers(db):
+    """The stored cursor always points at the first unanswered question"""
+    user_id = db.create_user("cursor", "p", "Cursor", "candidate")
+    session_id = db.create_session(user_id, "Sales", "easy", 30)
+    q1, q2, q3 = db.save_prepared_questions(session_id, [
+        {'question': 'Q1'}, {'question': 'Q2'}, {'question': 'Q3'}
+    ])
+    assert db.get_session(session_id)['current_question_index'] is None
+    
+    db.save_answer_evaluation(session_id, q2, {'user_answer': 'out of order'})
+    position = db.get_session(session_id)['current_question_index']
+    assert db.get_question_at_position(session_id, position)['id'] == q1
+    
+    db.save_answer_evaluation(session_id, q1, {'user_answer': 'a'})
+    position = db.get_session(session_id)['current_question_index']
+    assert db.get_question_at_position(session_id, position)['id'] == q3
+    assert db.get_next_unanswered_question(session_id)['id'] == q3
+    
+    db.save_answer_evaluation(session_id, q3, {'user_answer': 'b'})
+    position = db.get_session(session_id)['current_question_index']
+    assert db.get_question_at_position(session_id, position) is None
+
+def test_next_question_cursor_after_preparing_again(db):
+    """A second batch of questions continues the positions, so the cursor never lands on an answered one"""
+    user_id = db.create_user("reprep", "p", "Reprep", "candidate")
+    session_id = db.create_session(user_id, "Sales", "easy", 30)
+    for qid in db.save_prepared_questions(session_id, [{'question': 'Q1'}, {'question': 'Q2'}, {'question': 'Q3'}]):
+        db.save_answer_evaluation(session_id, qid, {'user_answer': 'a'})
+    
+    q4, q5, q6 = db.save_prepared_questions(session_id, [{'question': 'Q4'}, {'question': 'Q5'}, {'question': 'Q6'}])
+    assert [db.get_question_by_id(qid, session_id)['position'] for qid in (q4, q5, q6)] == [4, 5, 6]
+    
+    db.save_answer_evaluation(session_id, q4, {'user_answer': 'b'})
+    position = db.get_session(session_id)['current_question_index']
+    assert db.get_question_at_position(session_id, position)['id'] == q5
+    assert db.get_next_unanswered_question(session_id)['id'] == q5
+
+def test_message_and_evaluation_share_a_transaction(db):
+    """Writes made through db.transaction() commit together or not at all"""
+    user_id = db.create_user("txn", "p", "Txn", "candidate")
+    session_id = db.create_session(user_id, "Sales", "easy", 30)
+    (qid,) = db.save_prepared_questions(session_id, [{'question': 'Q1'}])
+    
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            db.add_message(session_id, 'user', 'lost answer', 'answer', conn=conn)
+            raise RuntimeError('evaluation write failed')
+    assert db.get_session_messages(session_id) == []
+    
+    with db.transaction() as conn:
+        msg_id = db.add_message(session_id, 'user', 'kept answer', 'answer', conn=conn)
+        db.save_answer_evaluation(session_id, qid, {'user_answer': 'kept answer', 'overall_score': 7}, conn=conn)
+    messages = db.get_session_messages(session_id)
+    assert [m['id'] for m in messages] == [msg_id]
+    assert db.get_session_questions_with_evals(session_id)[0]['evaluation']['user_answer'] == 'kept answer'
+
+def test_embedding_cache_round_trip(db):
+    db.save_cached_embeddings([(b'\x01' * 32, b'abcd'), (b'\x02' * 32, b'efgh')], 'model-a')
+
+    assert db.get_cached_embeddings([b'\x01' * 32, b'\x03' * 32], 'model-a') == {b'\x01' * 32: b'abcd'}
+    assert db.get_cached_embeddings([b'\x01' * 32], 'model-b') == {}
+
+def test_get_system_settings_bulk(db):
+    db.set_system_setting('rag_top_k', 20)
+
+    settings = db.get_system_settings_bulk(['rag_top_k', 'temperature_eval', 'not_a_setting'])
+
+    assert settings == {'rag_top_k': 20, 'temperature_eval': 0.3}
+
+def test_expected_embeddings_follow_their_questions(db):
+    user_id = db.create_user('embed_user', 'pass', 'Embed User', 'candidate')
+    session_id = db.create_session(user_id=user_id, category='Sales', difficulty='basic', duration_minutes=5)
+    qid = db.save_prepared_questions(session_id, [{'question': 'Q?', 'expected_answer': 'A'}])[0]
+
+    db.save_expected_embeddings([(qid, b'\x00\x00\x80?', None)])
+    assert db.get_expected_embedding(qid) == (b'\x00\x00\x80?', None)
+    db.save_expected_embeddings([(qid, b'\x7f\x81', 0.5)])
+    assert db.get_expected_embedding(qid) == (b'\x7f\x81', 0.5)
+    assert 'embedding' not in db.get_session_questions(session_id)[0]
+
+    db.delete_session(session_id)
+    assert db.get_expected_embedding(qid) is None
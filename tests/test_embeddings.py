@@ -0,0 +1,267 @@
+import orjson
+
+from services import pinecone_service
+
+
+class _FakeResponse:
+    def __init__(self, texts):
+        self._texts = texts
+
+    def raise_for_status(self):
+        pass
+
+    @property
+    def content(self):
+        return orjson.dumps({'data': [{'embedding': [float(len(t)), 0.5]} for t in self._texts]})
+
+
+def test_embeddings_are_cached(client, monkeypatch):
+    sent = []
+
+    def fake_post(url, *args, **kwargs):
+        texts = orjson.loads(kwargs['data'])['input']
+        sent.append(texts)
+        return _FakeResponse(texts)
+
+    monkeypatch.setattr(pinecone_service._OPENAI_SESSION, 'post', fake_post)
+    pinecone_service._LRU.clear()
+
+    assert pinecone_service.create_embeddings_batch(['ab', 'abc', 'ab']) == [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+    assert sent == [['ab', 'abc']]
+
+    # Served from memory, then from the database once memory is cold
+    assert pinecone_service.create_embeddings_batch(['abc']) == [[3.0, 0.5]]
+    pinecone_service._LRU.clear()
+    assert pinecone_service.create_embeddings_batch(['abc', 'abcd']) == [[3.0, 0.5], [4.0, 0.5]]
+    assert sent == [['ab', 'abc'], ['abcd']]
+
+
+class _FakeAsyncResult:
+    def __init__(self, error=None):
+        self._error = error
+
+    def get(self, timeout=None):
+        if self._error:
+            raise self._error
+        return {}
+
+
+class _FakeIndex:
+    def __init__(self):
+        self.calls = []
+
+    def upsert(self, vectors, namespace, async_req=False):
+        self.calls.append((len(vectors), async_req))
+        if async_req:
+            # The second batch fails on its first attempt
+            return _FakeAsyncResult(RuntimeError('rate limited') if len(self.calls) == 2 else None)
+        return {}
+
+
+def test_upsert_batches_run_concurrently_and_retry(monkeypatch):
+    monkeypatch.setattr(pinecone_service.time, 'sleep', lambda s: None)
+    index = _FakeIndex()
+
+    pinecone_service._upsert_batches(index, [{'id': str(i)} for i in range(5)], 'ns', batch_size=2)
+
+    assert index.calls == [(2, True), (2, True), (1, True), (2, False)]
+
+
+def test_process_and_upload_skips_repeated_chunks(client, monkeypatch):
+    embedded, uploaded = [], []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return [[0.0]] * len(texts)
+
+    def fake_upsert(index, vectors, namespace):
+        uploaded.extend(v['metadata']['chunk_index'] for v in vectors)
+
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: None)
+    monkeypatch.setattr(pinecone_service, 'chunk_text', lambda content: ['intro', 'body', 'intro', 'outro'])
+    monkeypatch.setattr(pinecone_service, 'create_embeddings_batch', fake_embed)
+    monkeypatch.setattr(pinecone_service, '_upsert_batches', fake_upsert)
+
+    result = pinecone_service.process_and_upload('ignored', 'Sales Objections', 'Video')
+
+    assert embedded == ['intro', 'body', 'outro']
+    assert uploaded == [0, 1, 3]
+    assert result['chunks'] == 3
+
+
+def test_process_and_upload_works_in_windows(client, monkeypatch):
+    calls = []
+
+    monkeypatch.setattr(pinecone_service, 'UPLOAD_WINDOW', 2)
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: None)
+    monkeypatch.setattr(pinecone_service, 'chunk_text', lambda content: ['a', 'b', 'c', 'd', 'e'])
+    monkeypatch.setattr(pinecone_service, 'create_embeddings_batch', lambda texts: calls.append(('embed', len(texts))) or [[0.0]] * len(texts))
+    monkeypatch.setattr(pinecone_service, '_upsert_batches', lambda index, vectors, namespace: calls.append(('upsert', len(vectors))))
+
+    result = pinecone_service.process_and_upload('ignored', 'Sales', 'Video')
+
+    # Each window is embedded before it is upserted, the next one possibly meanwhile
+    assert [c for c in calls if c[0] == 'embed'] == [('embed', 2), ('embed', 2), ('embed', 1)]
+    assert [c for c in calls if c[0] == 'upsert'] == [('upsert', 2), ('upsert', 2), ('upsert', 1)]
+    assert calls.index(('upsert', 1)) > calls.index(('embed', 1))
+    assert result['chunks'] == 5
+
+
+def test_large_batches_are_split_in_order(client, monkeypatch):
+    sent = []
+
+    def fake_post(url, *args, **kwargs):
+        texts = orjson.loads(kwargs['data'])['input']
+        sent.append(len(texts))
+        return _FakeResponse(texts)
+
+    monkeypatch.setattr(pinecone_service._OPENAI_SESSION, 'post', fake_post)
+    monkeypatch.setattr(pinecone_service, 'EMBED_BATCH_SIZE', 2)
+    pinecone_service._LRU.clear()
+
+    texts = ['x' * n for n in range(1, 6)]
+    assert pinecone_service.create_embeddings_batch(texts) == [[float(n), 0.5] for n in range(1, 6)]
+    assert sorted(sent) == [1, 2, 2]
+
+
+def test_namespaces_share_one_course_lookup(client, monkeypatch):
+    from extensions import db as app_db
+    admin_id = app_db.create_user('uploader', 'pass', 'Uploader', 'admin')
+    course_id = app_db.create_course('Hair Care', 'hair_care')
+    app_db.create_upload_record('Wig Basics', 'Intro Video', 'x', 1, admin_id, course_id)
+    app_db.create_upload_record('Wig Basics', 'Second Video', 'x', 1, admin_id, course_id)
+
+    lookups = []
+    original = app_db.get_course_by_id
+    monkeypatch.setattr(app_db, 'get_course_by_id', lambda cid: lookups.append(cid) or original(cid))
+
+    assert sorted(pinecone_service.get_namespaces_for_category('Wig Basics', course_id)) == [
+        'hair_care_wig_basics_intro_video', 'hair_care_wig_basics_second_video'
+    ]
+    assert pinecone_service._make_namespace('Wig Basics', 'Intro Video', course_id) == 'hair_care_wig_basics_intro_video'
+    assert pinecone_service._make_namespace('Sales Objections', 'Intro Video') == 'sales_objections_intro_video'
+    assert lookups == [course_id]
+
+
+class _FakeQueryIndex:
+    def query(self, vector, top_k, namespace, include_metadata):
+        if namespace == 'broken':
+            raise RuntimeError('namespace unavailable')
+        return {'matches': [{'score': vector[0] * score, 'id': f'{namespace}{score}'} for score in (3, 1)]}
+
+
+def test_query_pinecone_batch_groups_matches_per_vector(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: _FakeQueryIndex())
+    monkeypatch.setattr(pinecone_service, '_record_index_result', recorded.append)
+
+    results = pinecone_service.query_pinecone_batch([[1.0], [2.0]], 'Sales', top_k=3, namespaces=['a', 'broken', 'b'])
+
+    # Top 3 over all namespaces, best first; equal scores keep namespace order
+    assert [[m['id'] for m in matches] for matches in results] == [['a3', 'b3', 'a1']] * 2
+    assert [m['score'] for m in results[1]] == [6.0, 6.0, 2.0]
+    assert recorded.count(False) == 2
+
+
+def test_shared_index_is_built_with_the_installed_client(monkeypatch):
+    from pinecone.data import Index
+
+    monkeypatch.setattr(pinecone_service, 'PINECONE_API_KEY', 'test-key')
+    monkeypatch.setattr(pinecone_service, 'PINECONE_INDEX_HOST', 'https://test-index.svc.pinecone.io')
+    monkeypatch.setattr(pinecone_service, 'PINECONE_POOL_THREADS', 4)
+    monkeypatch.setattr(pinecone_service, '_index', None)
+
+    index = pinecone_service._get_pinecone_index()
+
+    assert isinstance(index, Index)
+    assert index._api_client.pool_threads == 4
+    assert pinecone_service._get_pinecone_index() is index
+
+
+def test_delete_category_namespaces_counts_successful_deletes(monkeypatch):
+    deleted = []
+
+    class _DeleteIndex:
+        def delete(self, delete_all, namespace):
+            if namespace == 'broken':
+                raise RuntimeError('not found')
+            deleted.append(namespace)
+
+    monkeypatch.setattr(pinecone_service, 'get_namespaces_for_category', lambda category, course_id: ['a', 'broken', 'b'])
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: _DeleteIndex())
+    monkeypatch.setattr(pinecone_service, '_record_index_result', lambda ok: None)
+
+    assert pinecone_service.delete_category_namespaces('Sales') == 2
+    assert sorted(deleted) == ['a', 'b']
+
+
+def test_rag_stats_are_cached_until_an_upload(client, monkeypatch):
+    described = []
+
+    class _StatsIndex:
+        def describe_index_stats(self):
+            described.append(1)
+            return {'namespaces': {'b': {'vector_count': 2}, 'a': {'vector_count': 1}},
+                    'total_vector_count': 3, 'dimension': 1536, 'index_fullness': 0.0}
+
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: _StatsIndex())
+    monkeypatch.setattr(pinecone_service, 'chunk_text', lambda content: [])
+
+    first = pinecone_service.get_rag_stats()
+    assert [ns['name'] for ns in first['namespaces']] == ['a', 'b']
+    assert pinecone_service.get_rag_stats() == first
+    assert len(described) == 1
+
+    pinecone_service.process_and_upload('', 'Sales', 'Video')
+    pinecone_service.get_rag_stats()
+    assert len(described) == 2
+
+
+def test_unchanged_content_is_not_uploaded_again(client, monkeypatch):
+    uploads = []
+
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: None)
+    monkeypatch.setattr(pinecone_service, 'chunk_text', lambda content: content.split())
+    monkeypatch.setattr(pinecone_service, 'create_embeddings_batch', lambda texts: [[0.0]] * len(texts))
+    monkeypatch.setattr(pinecone_service, '_upsert_batches', lambda index, vectors, namespace: uploads.append(len(vectors)))
+
+    assert pinecone_service.process_and_upload('one two', 'Sales', 'Video')['chunks'] == 2
+    repeat = pinecone_service.process_and_upload('one two', 'Sales', 'Video')
+    assert repeat == {'chunks': 2, 'namespace': 'sales_video', 'skipped': True}
+    assert uploads == [2]
+
+    pinecone_service.process_and_upload('one two', 'Sales', 'Video', force=True)
+    pinecone_service.process_and_upload('one two three', 'Sales', 'Video')
+    assert uploads == [2, 2, 3]
+
+
+def test_deleted_namespaces_are_indexed_again(client, monkeypatch):
+    uploads = []
+
+    class _DeleteIndex:
+        def delete(self, delete_all, namespace):
+            raise RuntimeError('Pinecone unavailable')
+
+    monkeypatch.setattr(pinecone_service, '_get_pinecone_index', lambda: _DeleteIndex())
+    monkeypatch.setattr(pinecone_service, '_record_index_result', lambda ok: None)
+    monkeypatch.setattr(pinecone_service, 'get_namespaces_for_category', lambda category, course_id: ['sales_video'])
+    monkeypatch.setattr(pinecone_service, 'chunk_text', lambda content: content.split())
+    monkeypatch.setattr(pinecone_service, 'create_embeddings_batch', lambda texts: [[0.0]] * len(texts))
+    monkeypatch.setattr(pinecone_service, '_upsert_batches', lambda index, vectors, namespace: uploads.append(len(vectors)))
+
+    pinecone_service.process_and_upload('one two', 'Sales', 'Video')
+    # Even a failed vector delete forgets the record, since the category's uploads are gone
+    assert pinecone_service.delete_category_namespaces('Sales') == 0
+    assert 'skipped' not in pinecone_service.process_and_upload('one two', 'Sales', 'Video')
+    assert uploads == [2, 2]
+
+
+def test_pinecone_service_defines_each_function_once():
+    import ast
+    import inspect
+
+    tree = ast.parse(inspect.getsource(pinecone_service))
+    names = [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+    assert len(names) == len(set(names))
+    for name in ('get_namespaces_for_category', 'delete_category_namespaces', 'process_and_upload', 'query_pinecone'):
+        assert inspect.signature(getattr(pinecone_service, name)).parameters['course_id'].default == 1
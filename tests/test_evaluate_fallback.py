@@ -1,7 +1,7 @@
 import json
 
 
-def test_evaluate_answer_fallback(client, db, monkeypatch):
+def test_evaluate_answer_fallback(client, db, fake_http_post):
     db.create_user('cand_x', 'pass', 'Candidate X', 'candidate')
     client.post('/api/auth/login', json={'username': 'cand_x', 'password': 'pass'})
 
@@ -17,13 +17,11 @@ def test_evaluate_answer_fallback(client, db, monkeypatch):
     q = db.get_session_questions(session_id)[0]
 
     # Mock both OpenAI embeddings and OpenRouter chat
-    import app as appmod
-
     def fake_post(url, *args, **kwargs):
         # Simulate failure for both embeddings and chat completion
         raise RuntimeError('network unavailable in test')
 
-    monkeypatch.setattr(appmod.requests, 'post', fake_post)
+    fake_http_post(fake_post)
 
     resp = client.post('/api/training/evaluate-answer', json={
         'session_id': session_id,
@@ -41,3 +39,185 @@ def test_evaluate_answer_fallback(client, db, monkeypatch):
     cnt = cur.fetchone()[0]
     conn.close()
     assert cnt == 1
+
+
+def test_message_is_saved_when_evaluation_fails(client, db, monkeypatch):
+    import routes.training_routes as training_routes
+
+    user_id = db.create_user('cand_msg', 'pass', 'Candidate', 'candidate')
+    client.post('/api/auth/login', json={'username': 'cand_msg', 'password': 'pass'})
+    session_id = db.create_session(user_id=user_id, category='Sales', difficulty='basic', duration_minutes=5)
+    db.save_prepared_questions(session_id, [{'question': 'Q1', 'expected_answer': 'A1'}])
+
+    def failing_evaluate(*args, **kwargs):
+        raise RuntimeError('evaluator down')
+
+    monkeypatch.setattr(training_routes, 'evaluate_answer', failing_evaluate)
+
+    resp = client.post('/api/training/message', json={'session_id': session_id, 'role': 'user', 'content': 'my answer'})
+    assert resp.status_code == 200
+    assert resp.get_json()['evaluation'] is None
+    assert [m['content'] for m in db.get_session_messages(session_id)] == ['my answer']
+
+
+def test_cosine_similarity():
+    from services.training_service import calculate_cosine_similarity
+
+    assert calculate_cosine_similarity([1.0, 0.0], [1.0, 0.0]) == 1.0
+    assert abs(calculate_cosine_similarity([1.0, 1.0], [1.0, 0.0]) - 0.7071) < 1e-4
+    assert calculate_cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+    assert calculate_cosine_similarity([1.0], [1.0, 0.0]) == 0.0
+    assert calculate_cosine_similarity([], []) == 0.0
+
+
+def test_extract_json_from_code_block():
+    from services.training_service import extract_json_from_text
+
+    assert extract_json_from_text('Here you go:\n```json\n{"overall_score": 7}\n```') == {'overall_score': 7}
+    assert extract_json_from_text('Score follows {"overall_score": 5} done') == {'overall_score': 5}
+
+
+def test_llm_cache_exact_and_similar_answers(client):
+    from services import llm_cache
+
+    key = llm_cache.prompt_key('model', 0.3, [{'role': 'user', 'content': 'hi'}])
+    assert key == llm_cache.prompt_key('model', 0.3, [{'role': 'user', 'content': 'hi'}])
+    assert key != llm_cache.prompt_key('model', 0.7, [{'role': 'user', 'content': 'hi'}])
+
+    llm_cache.set_cached(key, {'overall_score': 7})
+    cached = llm_cache.get_cached(key)
+    cached['overall_score'] = 9
+    assert llm_cache.get_cached(key) == {'overall_score': 7}
+
+    assert llm_cache.find_similar_evaluation(42, lambda: [1.0, 0.0]) is None
+    llm_cache.remember_evaluation(42, [1.0, 0.0], {'overall_score': 6})
+    assert llm_cache.find_similar_evaluation(42, lambda: [0.99, 0.01]) == {'overall_score': 6}
+    assert llm_cache.find_similar_evaluation(42, lambda: [0.0, 1.0]) is None
+    assert llm_cache.find_similar_evaluation(43, lambda: [1.0, 0.0]) is None
+
+    # The closest earlier answer is reused, not merely the first one over the threshold
+    llm_cache.remember_evaluation(42, [0.98, 0.2], {'overall_score': 8})
+    assert llm_cache.find_similar_evaluation(42, lambda: [0.97, 0.22]) == {'overall_score': 8}
+
+
+
+def test_llm_cache_persists_evaluations(client):
+    from services import llm_cache
+    from utils.cache import CACHE
+
+    key = llm_cache.prompt_key('model', 0.3, [{'role': 'user', 'content': 'grade me'}])
+    llm_cache.set_cached(key, {'overall_score': 7}, persistent=True)
+    llm_cache.set_cached('llm:memory-only', {'overall_score': 3})
+    CACHE.clear()
+
+    assert llm_cache.get_cached(key) is None
+    assert llm_cache.get_cached(key, persistent=True) == {'overall_score': 7}
+    # Loaded back into memory for the next lookup
+    assert llm_cache.get_cached(key) == {'overall_score': 7}
+    assert llm_cache.get_cached('llm:memory-only', persistent=True) is None
+
+def test_rag_only_sentence_helpers():
+    from services.training_service import _split_sentences, _key_points_for
+
+    text = ("Short one. The thin base looks natural but needs replacing every few months. "
+            "Why? Because it wears out faster than a thicker base does over time!")
+    assert _split_sentences(text) == [
+        'The thin base looks natural but needs replacing every few months.',
+        'Because it wears out faster than a thicker base does over time!'
+    ]
+    assert _key_points_for('The thin base, the THIN base looks natural.') == ['thin', 'base', 'looks']
+
+
+def test_rag_only_matches_are_deduplicated():
+    from services.training_service import _dedupe_matches
+
+    matches = [
+        {'score': 0.5, 'metadata': {'text': 'a', 'video_name': 'V', 'chunk_index': 0}},
+        {'score': 0.7, 'metadata': {'text': 'b', 'video_name': 'V', 'chunk_index': 1}},
+        {'score': 0.9, 'metadata': {'text': 'a', 'video_name': 'V', 'chunk_index': 0}},
+    ]
+    assert _dedupe_matches(matches) == [matches[2], matches[1]]
+
+
+def test_aggregate_category_content_is_order_independent(monkeypatch):
+    from services import training_service
+    from utils.cache import cache_delete_prefix
+
+    matches = [
+        {'metadata': {'text': 'second part', 'video_name': 'B', 'chunk_index': 1}},
+        {'metadata': {'text': 'intro', 'video_name': 'A', 'chunk_index': 0}},
+        {'metadata': {'text': 'first part', 'video_name': 'B', 'chunk_index': 0}},
+    ]
+    monkeypatch.setattr(training_service, 'create_embeddings_batch', lambda texts: [[1.0]])
+    cache_delete_prefix(training_service.CATEGORY_CONTENT_CACHE_PREFIX)
+
+    monkeypatch.setattr(training_service, 'query_pinecone', lambda *a, **kw: matches)
+    first = training_service.aggregate_category_content('Sales', top_k=3)
+    monkeypatch.setattr(training_service, 'query_pinecone', lambda *a, **kw: list(reversed(matches)))
+    assert training_service.aggregate_category_content('Sales', top_k=3) == first  # served from cache
+    cache_delete_prefix(training_service.CATEGORY_CONTENT_CACHE_PREFIX)
+    second = training_service.aggregate_category_content('Sales', top_k=3)
+    cache_delete_prefix(training_service.CATEGORY_CONTENT_CACHE_PREFIX)
+
+    assert first == second
+    assert first.index('intro') < first.index('first part') < first.index('second part')
+    assert training_service.training_material_version(first) == training_service.training_material_version(second)
+
+
+def test_join_capped_matches_join_then_slice():
+    from services.training_service import _join_capped
+
+    parts = ['alpha', 'beta', 'gamma']
+    for limit in range(0, 20):
+        assert _join_capped(iter(parts), limit) == "\n\n".join(parts)[:limit]
+
+
+def test_expected_embedding_read_once(client, db, monkeypatch):
+    import numpy as np
+    from services import training_service as ts
+
+    db.create_user('cand_e', 'pass', 'Candidate E', 'candidate')
+    session_id = db.create_session(user_id=db.get_user_by_username('cand_e')['id'], category='Sales', difficulty='basic', duration_minutes=5)
+    [qid] = db.save_prepared_questions(session_id, [{'question': 'Q', 'expected_answer': 'A', 'key_points': []}])
+    # Stored before normalisation; read back at unit length
+    db.save_expected_embeddings([(qid, np.array([3.0, 4.0], dtype=np.float32).tobytes(), None)])
+
+    reads = []
+    real_get = ts.db.get_expected_embedding
+    monkeypatch.setattr(ts.db, 'get_expected_embedding', lambda question_id: reads.append(question_id) or real_get(question_id))
+
+    for _ in range(3):
+        assert np.allclose(ts._expected_embedding({'id': qid}), [0.6, 0.8], atol=0.01)
+    assert reads == [qid]
+    assert ts._expected_embedding({'id': qid + 1}) is None
+
+
+def test_token_overlap():
+    from services.training_service import _token_overlap, LEXICAL_MATCH_THRESHOLD
+
+    assert _token_overlap('Thin vs thick, the tradeoff!', 'thin vs thick tradeoff') == 1.0
+    assert _token_overlap('price is too high', 'offer a payment plan') == 0.0
+    assert _token_overlap('', 'anything') == 0.0
+    assert _token_overlap('offer a payment plan today', 'offer a payment plan') < LEXICAL_MATCH_THRESHOLD
+
+
+def test_quantized_expected_embedding_keeps_cosine():
+    import numpy as np
+    from services.training_service import _quantize_i8, _unit
+
+    rng = np.random.default_rng(0)
+    a, b = _unit(rng.normal(size=1536)), _unit(rng.normal(size=1536))
+    b = _unit(a + 0.8 * b)
+    q, scale = _quantize_i8(b)
+    assert q.dtype == np.int8 and q.nbytes == 1536
+    assert abs(float(a @ _unit(q * np.float32(scale))) - float(a @ b)) < 0.01
+
+
+def test_feedback_tiers_by_score():
+    import bisect
+    from services.training_service import _FEEDBACK_TIERS, _FEEDBACK_TIER_SCORES
+
+    tiers = {score: _FEEDBACK_TIERS[bisect.bisect_right(_FEEDBACK_TIER_SCORES, score)][0]
+             for score in (0.0, 4.99, 5.0, 7.9, 8.0, 10.0)}
+    assert tiers == {0.0: 'corrective', 4.99: 'corrective', 5.0: 'constructive',
+                     7.9: 'constructive', 8.0: 'positive', 10.0: 'positive'}
@@ -1,4 +1,4 @@
-def test_complete_objection_training_session(client, db, monkeypatch):
+def test_complete_objection_training_session(client, db, fake_http_post):
     db.create_user("testuser", "password123", "Test User", "candidate")
     client.post('/api/auth/login', json={'username': 'testuser', 'password': 'password123'})
 
@@ -11,6 +11,10 @@ def test_complete_objection_training_session(client, db, monkeypatch):
     assert resp.status_code == 200
     session_id = resp.get_json()['session_id']
 
+    # Questions are prepared in the background after /start
+    from utils.background import wait_for_background
+    wait_for_background()
+
     # Get first question
     resp_q = client.post('/api/training/get-next-question', json={'session_id': session_id})
     assert resp_q.status_code == 200
@@ -18,8 +22,6 @@ def test_complete_objection_training_session(client, db, monkeypatch):
     assert 'question' in data_q
     question = data_q['question']
 
-    import app as appmod
-
     def fake_post(url, *args, **kwargs):
         class FakeResp:
             def raise_for_status(self): ...
@@ -46,7 +48,7 @@ def test_complete_objection_training_session(client, db, monkeypatch):
 
         return FakeResp()
 
-    monkeypatch.setattr(appmod.requests, 'post', fake_post)
+    fake_http_post(fake_post)
 
     # Evaluate good answer
     resp_eval = client.post('/api/training/evaluate-answer', json={
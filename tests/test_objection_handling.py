@@ -16,7 +16,7 @@ def test_sales_objections_generate_objection_questions(client, db):
     assert any(q.get('is_objection') for q in questions)
 
 
-def test_objection_evaluation_fields_present(client, db, monkeypatch):
+def test_objection_evaluation_fields_present(client, db, fake_http_post):
     user_id = db.create_user("obq_eval_user", "pass", "Eval User", "candidate")
     client.post('/api/auth/login', json={'username': 'obq_eval_user', 'password': 'pass'})
 
@@ -25,8 +25,6 @@ def test_objection_evaluation_fields_present(client, db, monkeypatch):
     questions = resp.get_json()['questions']
     q = next(q for q in questions if q.get('is_objection'))
 
-    import app as appmod
-
     def fake_post(url, *args, **kwargs):
         class FakeResp:
             def raise_for_status(self): ...
@@ -56,7 +54,7 @@ def test_objection_evaluation_fields_present(client, db, monkeypatch):
 
         return FakeResp()
 
-    monkeypatch.setattr(appmod.requests, 'post', fake_post)
+    fake_http_post(fake_post)
 
     good_answer = "I understand sir, thin looks natural but does not last long."
     resp_eval = client.post('/api/training/evaluate-answer', json={
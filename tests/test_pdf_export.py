@@ -9,37 +9,51 @@ def client():
     with app.test_client() as client:
         yield client
 
+@pytest.fixture(autouse=True)
+def pdf_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr('routes.session_routes.PDF_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
 @pytest.fixture
-def mock_db_session(mocker):
-    mock = mocker.patch('app.db.get_session')
+def mock_db_bundle(mocker):
+    mock = mocker.patch('app.db.get_session_bundle')
     mock.return_value = {
-        'id': 1,
-        'user_id': 1,
-        'started_at': '2023-01-01 12:00:00',
-        'overall_score': 8.5,
-        'category': 'Sales',
-        'difficulty': 'Hard',
-        'duration_minutes': 30,
-        'username': 'testuser'
+        'session': {
+            'id': 1,
+            'user_id': 1,
+            'started_at': '2023-01-01 12:00:00',
+            'overall_score': 8.5,
+            'category': 'Sales',
+            'difficulty': 'Hard',
+            'duration_minutes': 30,
+            'username': 'testuser'
+        },
+        'report': None
     }
     return mock
 
 @pytest.fixture
-def mock_db_report(mocker):
-    mock = mocker.patch('app.db.get_report')
-    mock.return_value = {
+def mock_db_session(mock_db_bundle):
+    return mock_db_bundle
+
+@pytest.fixture
+def mock_db_report(mock_db_bundle):
+    mock_db_bundle.return_value['report'] = {
         'session_id': 1,
         'report_html': '<html><body><h1>Report</h1></body></html>'
     }
-    return mock
+    return mock_db_bundle
 
 @pytest.fixture
 def mock_generate_pdf(mocker):
     mock = mocker.patch('app.generate_session_pdf')
-    # It writes to the output_path provided
+    # It writes to the output path or buffer provided
     def side_effect(session_data, report_data, output_path):
-        with open(output_path, 'w') as f:
-            f.write('%PDF-1.4 mock content')
+        if hasattr(output_path, 'write'):
+            output_path.write(b'%PDF-1.4 mock content')
+        else:
+            with open(output_path, 'wb') as f:
+                f.write(b'%PDF-1.4 mock content')
         return output_path
     mock.side_effect = side_effect
     return mock
@@ -59,7 +73,7 @@ def test_export_pdf_success(client, mock_db_session, mock_db_report, mock_genera
     mock_generate_pdf.assert_called_once()
 
 def test_export_pdf_not_found(client, mocker):
-    mocker.patch('app.db.get_session', return_value=None)
+    mocker.patch('app.db.get_session_bundle', return_value=None)
     with client.session_transaction() as sess:
         sess['user_id'] = 1
         sess['role'] = 'candidate'
@@ -84,3 +98,55 @@ def test_export_pdf_admin_access(client, mock_db_session, mock_db_report, mock_g
         
     response = client.get('/api/sessions/1/export/pdf')
     assert response.status_code == 200
+
+def test_export_pdf_served_from_cache(client, mock_db_session, mock_db_report, mock_generate_pdf):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'candidate'
+
+    first = client.get('/api/sessions/1/export/pdf')
+    second = client.get('/api/sessions/1/export/pdf')
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.data == first.data
+    mock_generate_pdf.assert_called_once()
+
+    etag = first.headers['ETag']
+    not_modified = client.get('/api/sessions/1/export/pdf', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    mock_generate_pdf.assert_called_once()
+
+def test_export_pdf_regenerates_when_report_changes(client, mock_db_session, mock_db_report, mock_generate_pdf):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'candidate'
+
+    client.get('/api/sessions/1/export/pdf')
+    mock_db_report.return_value['report'] = {'session_id': 1, 'report_html': '<html><body><h1>Updated</h1></body></html>'}
+    response = client.get('/api/sessions/1/export/pdf')
+    assert response.status_code == 200
+    assert mock_generate_pdf.call_count == 2
+
+
+def test_storing_a_render_keeps_recent_variants(client, pdf_cache_dir, mock_db_session, mock_db_report, mock_generate_pdf):
+    import os
+    import time
+    from routes.session_routes import PDF_CACHE_MAX_AGE
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'candidate'
+
+    recent = pdf_cache_dir / 'session_report_1_recent.pdf'
+    old = pdf_cache_dir / 'session_report_1_old.pdf'
+    recent.write_bytes(b'%PDF recent')
+    old.write_bytes(b'%PDF old')
+    long_ago = time.time() - PDF_CACHE_MAX_AGE - 60
+    os.utime(old, (long_ago, long_ago))
+
+    response = client.get('/api/sessions/1/export/pdf')
+    assert response.status_code == 200
+
+    # A recent variant may still be mid-download elsewhere; only the long-unused one goes
+    names = sorted(p.name for p in pdf_cache_dir.iterdir())
+    assert len(names) == 2 and 'session_report_1_recent.pdf' in names and 'session_report_1_old.pdf' not in names
@@ -58,3 +58,134 @@ def test_enhanced_report_generation(client):
         assert 'Your Answer' in html
         assert 'Expected Answer' in html
         assert 'Overall Score' not in html
+
+
+def test_overall_score_meta_is_parsed_from_report(client):
+    from report_builder import build_enhanced_report_html
+    from routes.training_routes import _OVERALL_SCORE_RE, _OVERALL_SCORE_SCAN_CHARS
+
+    user_id = db.create_user('meta_cand', 'pass', 'Candidate')
+    session_id = db.create_session(user_id=user_id, category='Pricing', difficulty='basic', duration_minutes=5)
+    db.save_prepared_questions(session_id, [
+        {'question': 'What does it cost?', 'expected_answer': 'Depends on coverage'}
+    ])
+    q = db.get_session_questions(session_id)[0]
+    db.save_answer_evaluation(session_id, q['id'], {'user_answer': 'It varies', 'overall_score': 7.0})
+
+    html = build_enhanced_report_html(db, session_id)
+    m = _OVERALL_SCORE_RE.search(html[:_OVERALL_SCORE_SCAN_CHARS])
+    assert m is not None
+    assert float(m.group(1)) == 7.0
+
+
+def test_fallback_report_escapes_answers(client, monkeypatch):
+    import routes.training_routes as training_routes
+    monkeypatch.setattr(training_routes, 'build_candidate_report_html', lambda db, sid: None)
+
+    user_id = db.create_user('esc_cand', 'pass', 'Candidate')
+    session_id = db.create_session(user_id=user_id, category='Pricing', difficulty='basic', duration_minutes=5)
+    (qid,) = db.save_prepared_questions(session_id, [{'question': 'Q <b>1</b>', 'expected_answer': 'A & B'}])
+    db.save_answer_evaluation(session_id, qid, {'user_answer': '<script>alert(1)</script>', 'overall_score': 5.0})
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = 'candidate'
+    html = client.get(f'/api/training/report/{session_id}').get_json()['report_html']
+    assert '<script>' not in html
+    assert '&lt;script&gt;alert(1)&lt;/script&gt;' in html
+    assert 'A &amp; B' in html
+
+
+def test_report_is_persisted_after_response(client):
+    from utils.background import wait_for_background
+
+    user_id = db.create_user('persist_cand', 'pass', 'Candidate')
+    session_id = db.create_session(user_id=user_id, category='Pricing', difficulty='basic', duration_minutes=5)
+    (qid,) = db.save_prepared_questions(session_id, [{'question': 'Q1', 'expected_answer': 'A1'}])
+    db.save_answer_evaluation(session_id, qid, {'user_answer': 'A1', 'overall_score': 9.0})
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = 'candidate'
+    data = client.get(f'/api/training/report/{session_id}').get_json()
+    assert data['session']['status'] == 'completed'
+
+    wait_for_background()
+    bundle = db.get_session_bundle(session_id)
+    assert bundle['report']['report_html'] == data['report_html']
+    assert bundle['session']['status'] == 'completed'
+    assert bundle['session']['overall_score'] == 9.0
+
+
+def test_completed_report_is_cached_until_session_changes(client, monkeypatch):
+    import routes.training_routes as training_routes
+    from utils.background import wait_for_background
+
+    user_id = db.create_user('cache_cand', 'pass', 'Candidate')
+    session_id = db.create_session(user_id=user_id, category='Pricing', difficulty='basic', duration_minutes=5)
+    db.save_prepared_questions(session_id, [{'question': 'Q1', 'expected_answer': 'A1'}])
+    db.complete_session(session_id)
+
+    calls = []
+    real_builder = training_routes.build_candidate_report_html
+    monkeypatch.setattr(training_routes, 'build_candidate_report_html',
+                        lambda d, sid: calls.append(sid) or real_builder(d, sid))
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = 'candidate'
+
+    first = client.get(f'/api/training/report/{session_id}').get_json()
+    second = client.get(f'/api/training/report/{session_id}').get_json()
+    assert second['report_html'] == first['report_html']
+    assert len(calls) == 1
+
+    client.post('/api/training/end', json={'session_id': session_id})
+    client.get(f'/api/training/report/{session_id}')
+    assert len(calls) == 2
+
+    # An evaluation saved by another worker skips this worker's invalidation but still misses the cache
+    wait_for_background()
+    db.save_answer_evaluation(session_id, db.get_session_questions(session_id)[0]['id'], {'user_answer': 'late', 'overall_score': 6})
+    client.get(f'/api/training/report/{session_id}')
+    assert len(calls) == 3
+
+def test_stored_report_is_reused_for_same_audience(client, monkeypatch):
+    import routes.training_routes as training_routes
+    from utils.background import wait_for_background
+    from utils.cache import CACHE
+
+    user_id = db.create_user('stored_cand', 'pass', 'Candidate')
+    session_id = db.create_session(user_id=user_id, category='Pricing', difficulty='basic', duration_minutes=5)
+    db.save_prepared_questions(session_id, [{'question': 'Q1', 'expected_answer': 'A1'}])
+
+    calls = []
+    real_builder = training_routes.build_candidate_report_html
+    monkeypatch.setattr(training_routes, 'build_candidate_report_html',
+                        lambda d, sid: calls.append(sid) or real_builder(d, sid))
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = 'candidate'
+
+    first = client.get(f'/api/training/report/{session_id}').get_json()
+    wait_for_background()
+    assert db.get_report(session_id)['report_type'] == 'candidate'
+
+    CACHE.clear()
+    second = client.get(f'/api/training/report/{session_id}').get_json()
+    assert second['report_html'] == first['report_html']
+    assert len(calls) == 1
+
+    db.invalidate_saved_report(session_id)
+    CACHE.clear()
+    client.get(f'/api/training/report/{session_id}')
+    assert len(calls) == 2
+
+    # An evaluation saved elsewhere (another worker, no route invalidation) outdates
+    # both this worker's cached copy and the stored one
+    wait_for_background()
+    question_id = db.get_session_questions_with_evals(session_id)[0]['id']
+    db.save_answer_evaluation(session_id, question_id, {'user_answer': 'late answer', 'overall_score': 6})
+    client.get(f'/api/training/report/{session_id}')
+    assert len(calls) == 3
+    wait_for_background()
+    assert db.get_report(session_id)['last_evaluation_id'] == db.get_latest_evaluation_id(session_id)
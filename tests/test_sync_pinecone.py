@@ -0,0 +1,67 @@
+def test_longest_prefix_matches_like_sorted_startswith():
+    from sync_pinecone_full import _build_prefix_trie, _longest_prefix
+
+    prefixes = ['sales', 'sales_objections', 'hair_care_sales', 'retail_sales']
+    trie = _build_prefix_trie(prefixes)
+    by_length = sorted(prefixes, key=len, reverse=True)
+
+    for ns_name in ['sales_objections_price_talk', 'sales_intro', 'hair_care_sales_video_1',
+                    'retail_sales_', 'salesman_video', 'sales', 'unknown_video', '']:
+        expected = next((p for p in by_length if ns_name.startswith(p + '_')), None)
+        assert _longest_prefix(trie, ns_name) == expected
+
+
+class _StatsIndex:
+    def __init__(self, namespaces):
+        self._namespaces = namespaces
+
+    def describe_index_stats(self):
+        return {'namespaces': self._namespaces}
+
+
+def test_sync_adds_updates_and_removes_uploads(db, db_path, monkeypatch):
+    import sync_pinecone_full as sync
+
+    user_id = db.create_user('sync_admin', 'pass', 'Sync Admin', 'admin')
+    conn = db._get_connection()
+    conn.execute("DELETE FROM uploads")
+    conn.execute("DELETE FROM course_categories")
+    conn.commit()
+    conn.close()
+    db.add_course_category(1, 'Sales Objections')
+    db.add_course_category(1, 'Sales')
+    kept = db.create_upload_record('Sales Objections', 'Price Talk', 'a.mp4', 1, user_id)
+    db.create_upload_record('Sales', 'Old Video', 'b.mp4', 1, user_id)
+
+    monkeypatch.setenv('DATABASE_PATH', db_path)
+    monkeypatch.setattr(sync, '_get_pinecone_index', lambda: _StatsIndex({
+        'sales_objections_price_talk': {'vector_count': 7},
+        'sales_intro': {'vector_count': 3},
+        'unrelated_thing': {'vector_count': 1},
+    }))
+
+    assert sync.sync_pinecone_full() == {'added': 1, 'deleted': 1}
+
+    conn = db._get_connection()
+    rows = {(r['category'], r['video_name']): (r['id'], r['chunks_created'])
+            for r in conn.execute('SELECT id, category, video_name, chunks_created FROM uploads')}
+    conn.close()
+    assert rows[('Sales Objections', 'Price Talk')] == (kept, 7)
+    assert rows[('Sales', 'Intro')][1] == 3
+    assert ('Sales', 'Old Video') not in rows
+
+
+def test_sync_forgets_content_of_namespaces_gone_from_pinecone(db, db_path, monkeypatch):
+    from types import SimpleNamespace
+    import sync_pinecone_full as sync
+
+    db.save_namespace_content('sales_kept', 'h1', 2)
+    db.save_namespace_content('sales_removed', 'h2', 3)
+    monkeypatch.setenv('DATABASE_PATH', db_path)
+    monkeypatch.setattr(sync, '_get_pinecone_index', lambda: SimpleNamespace(
+        describe_index_stats=lambda: {'namespaces': {'sales_kept': {'vector_count': 2}}}))
+
+    sync.sync_pinecone_full()
+
+    assert db.get_namespace_content('sales_kept') == ('h1', 2)
+    assert db.get_namespace_content('sales_removed') is None
@@ -0,0 +1,23 @@
+from utils.text_utils import chunk_text
+
+
+def test_chunk_text_packs_paragraphs_and_splits_long_ones():
+    text = "alpha beta\n\n\ngamma\n\n  \n\n" + " ".join(["word"] * 10) + "\n\ntail"
+    assert chunk_text(text, max_chars=20) == [
+        "alpha beta\n\ngamma",
+        "word word word word",
+        "word word word word",
+        "word word\n\ntail",
+    ]
+    assert chunk_text("", max_chars=20) == []
+
+
+def test_repeated_long_paragraphs_are_split_once():
+    from utils.text_utils import _split_long_paragraph
+
+    _split_long_paragraph.cache_clear()
+    boilerplate = " ".join(["disclaimer"] * 30)
+    chunks = chunk_text(f"{boilerplate}\n\nintro\n\n{boilerplate}", max_chars=100)
+    alone = chunk_text(boilerplate, max_chars=100)
+    assert chunks == alone[:3] + [alone[3] + "\n\nintro"] + alone
+    assert _split_long_paragraph.cache_info().misses == 1
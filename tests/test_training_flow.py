@@ -98,3 +98,31 @@ def test_unauthorized_access(client, db):
     # 3. Try accessing admin route as candidate
     response = client.get('/api/admin/users')
     assert response.status_code == 403
+
+def test_next_question_reports_preparing(client, db, monkeypatch):
+    """get-next-question says 'preparing' until background preparation has saved questions"""
+    import threading
+    import routes.training_routes as training_routes
+    from utils.background import wait_for_background
+    
+    release = threading.Event()
+    def slow_prepare(session_id, *args, **kwargs):
+        release.wait(5)
+        db.save_prepared_questions(session_id, [{'question': 'Ready?', 'expected_answer': 'Yes'}])
+    monkeypatch.setattr(training_routes, 'prepare_questions', slow_prepare)
+    
+    db.create_user("prepuser", "password123", "Prep User", "candidate")
+    client.post('/api/auth/login', json={'username': 'prepuser', 'password': 'password123'})
+    response = client.post('/api/training/start', json={
+        'category': 'General Sales', 'difficulty': 'trial', 'duration_minutes': 5
+    })
+    assert response.status_code == 200
+    session_id = response.get_json()['session_id']
+    
+    data = client.post('/api/training/get-next-question', json={'session_id': session_id}).get_json()
+    assert data == {'done': False, 'preparing': True}
+    
+    release.set()
+    wait_for_background()
+    data = client.post('/api/training/get-next-question', json={'session_id': session_id}).get_json()
+    assert data['question']['question_text'] == 'Ready?'
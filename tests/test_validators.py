@@ -0,0 +1,50 @@
+import time
+
+from validators import _EVENT_HANDLER_RE, _SCRIPT_TAG_RE, sanitize_html
+
+
+def test_sanitize_patterns_strip_scripts_and_handlers():
+    assert _SCRIPT_TAG_RE.sub('', 'x<script src=a>1<b>2</SCRIPT>y<script>z</script>') == 'xy'
+    assert _EVENT_HANDLER_RE.sub('', 'a onclick="x" b\n onload = \'y\'') == 'a b'
+    assert _EVENT_HANDLER_RE.sub('', 'noon = "z"') == 'noon = "z"'
+    assert sanitize_html('<b onclick="x">hi</b>') == '&lt;b onclick=&quot;x&quot;&gt;hi&lt;/b&gt;'
+    plain = 'No markup here, just text.'
+    assert sanitize_html(plain) is plain
+
+
+def test_sanitize_html_is_linear_on_whitespace_runs():
+    text = ' ' * 50000 + 'x&'
+    start = time.perf_counter()
+    assert sanitize_html(text) == ' ' * 50000 + 'x&amp;'
+    assert time.perf_counter() - start < 0.5
+
+
+def test_validate_ids_accept_ints_and_numeric_strings():
+    import pytest
+    from validators import ValidationError, validate_session_id, validate_user_id
+
+    for validate in (validate_session_id, validate_user_id):
+        assert validate(7) == 7
+        assert validate('7') == 7
+        assert validate(True) == 1 and type(validate(True)) is int
+        for bad in (0, -3, '0', 'abc', None, [1]):
+            with pytest.raises(ValidationError):
+                validate(bad)
+
+
+def test_username_characters():
+    import pytest
+    from validators import CreateUserRequest
+
+    assert CreateUserRequest('jane.doe_01-x', 'secret1', 'Jane').validate()
+    for bad in ('jane doe', 'jané', 'jane\n', 'ja<b>'):
+        with pytest.raises(ValueError):
+            CreateUserRequest(bad, 'secret1', 'Jane').validate()
+
+
+def test_create_user_request_stores_stripped_name():
+    from validators import CreateUserRequest
+
+    req = CreateUserRequest('jane', 'secret1', '  Jane Doe ')
+    assert req.validate()
+    assert req.name == 'Jane Doe'
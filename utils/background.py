@@ -0,0 +1,37 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from config_logging import get_logger
+
+logger = get_logger('background')
+
+# Slow work (LLM/RAG calls) runs here so request handlers can respond immediately
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='background')
+_pending = set()
+_pending_lock = threading.Lock()
+
+def submit_background(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the shared background pool; failures are logged, not raised"""
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background task {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+            return None
+
+    future = _executor.submit(run)
+    with _pending_lock:
+        _pending.add(future)
+    future.add_done_callback(_discard)
+    return future
+
+def wait_for_background(timeout: float = None):
+    """Block until every task submitted so far has finished"""
+    with _pending_lock:
+        pending = list(_pending)
+    wait(pending, timeout=timeout)
+
+def _discard(future):
+    with _pending_lock:
+        _pending.discard(future)
@@ -1,24 +1,60 @@
 import os
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+from collections import OrderedDict
 
-CACHE = {}
+# key -> (expiry on the time.monotonic() clock, value), least recently used first
+CACHE = OrderedDict()
 CACHE_ENABLED = os.environ.get('DISABLE_CACHE', 'false').lower() != 'true'
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 4096))
+# Expired entries are left in place on lookup and swept out in one pass every this many operations
+CACHE_SWEEP_EVERY = 1024
+_lock = threading.Lock()
+_ops = 0
+
+def _count_op(now: float):
+    """Count a get/set (lock held) and sweep expired entries every CACHE_SWEEP_EVERY operations"""
+    global _ops
+    _ops += 1
+    if _ops % CACHE_SWEEP_EVERY == 0:
+        for stale in [k for k, (expires, _) in CACHE.items() if expires < now]:
+            del CACHE[stale]
 
 def cache_get(key: str):
     """Get value from cache if not expired"""
     if not CACHE_ENABLED:
         return None
-    entry = CACHE.get(key)
-    if not entry:
-        return None
-    expires, value = entry
-    if expires < datetime.now(timezone.utc):
-        del CACHE[key]
-        return None
+    now = time.monotonic()
+    with _lock:
+        _count_op(now)
+        entry = CACHE.get(key)
+        if not entry:
+            return None
+        expires, value = entry
+        if expires < now:
+            return None
+        CACHE.move_to_end(key)
     return value
 
 def cache_set(key: str, value, ttl_seconds: int):
-    """Set value in cache with TTL"""
+    """Set value in cache with TTL, evicting the least recently used entries beyond CACHE_MAX_ENTRIES"""
     if not CACHE_ENABLED:
         return
-    CACHE[key] = (datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds), value)
+    now = time.monotonic()
+    with _lock:
+        CACHE[key] = (now + ttl_seconds, value)
+        CACHE.move_to_end(key)
+        _count_op(now)
+        while len(CACHE) > CACHE_MAX_ENTRIES:
+            CACHE.popitem(last=False)
+
+def cache_delete(key: str):
+    """Remove a single key from the cache"""
+    with _lock:
+        CACHE.pop(key, None)
+
+def cache_delete_prefix(prefix: str):
+    """Remove every key starting with prefix (e.g. all courses' entries)"""
+    with _lock:
+        for key in [k for k in CACHE if k.startswith(prefix)]:
+            del CACHE[key]
@@ -1,6 +1,18 @@
 from functools import wraps
-from flask import session, jsonify
-from extensions import db
+from flask import g, session, jsonify
+from services.auth_service import get_user_for_authz
+
+def current_user():
+    """The logged-in user's row, looked up at most once per request (and for a few seconds across requests by auth_service)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    cached = g.get('_current_user')
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    user = get_user_for_authz(user_id)
+    g._current_user = (user_id, user)
+    return user
 
 def login_required(f):
     @wraps(f)
@@ -15,19 +27,21 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return jsonify({'error': 'authentication_required'}), 401
-        user = db.get_user_by_id(session['user_id'])
+        user = current_user()
         if not user or user['role'] != 'admin':
             return jsonify({'error': 'admin_required'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
 def role_required(allowed_roles):
+    # Frozen once at decoration time; a single role may be passed as a plain string
+    allowed_roles = frozenset((allowed_roles,) if isinstance(allowed_roles, str) else allowed_roles)
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if 'user_id' not in session:
                 return jsonify({'error': 'authentication_required'}), 401
-            user = db.get_user_by_id(session['user_id'])
+            user = current_user()
             if not user or user.get('role') not in allowed_roles:
                 return jsonify({'error': 'forbidden'}), 403
             return f(*args, **kwargs)
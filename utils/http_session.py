@@ -0,0 +1,28 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def pooled_session(headers: dict = None, pool_size: int = 32, retries: int = 5, backoff_factor: float = 0.5) -> requests.Session:
+    """Session that keeps HTTPS connections alive between calls and retries throttled/5xx responses.
+
+    POST is retried on those statuses since the APIs this is used for (embeddings,
+    chat completions) have no side effects beyond the response. Failed connects get
+    a single immediate retry and read timeouts none, so an unreachable API still
+    fails fast and a slow generation is never paid for twice.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=1,
+        read=0,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        raise_on_status=False
+    )
+    session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+    if headers:
+        session.headers.update(headers)
+    return session
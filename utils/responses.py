@@ -0,0 +1,10 @@
+from flask import jsonify, request
+
+def conditional_json(payload):
+    """jsonify() with a content ETag; answers 304 when the client's copy is still current"""
+    response = jsonify(payload)
+    response.add_etag()
+    # Cached copies must be revalidated, and only by the browser that fetched them
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,41 +1,68 @@
 import re
-from typing import List
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Tuple
+
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n{2,}')
+
+@lru_cache(maxsize=1024)
+def _split_long_paragraph(para: str, max_chars: int) -> Tuple[Tuple[str, ...], str, int]:
+    """Word-wrap an oversized paragraph: (full pieces, last piece, length of last piece).
+
+    Cached because transcripts repeat the same boilerplate paragraphs across uploads.
+    """
+    words = para.split()
+    # ends[i] is the length of " ".join(words[:i + 1]), so the length of words[s:e]
+    # joined is ends[e - 1] - offset(s); bisect finds how many words fit in one step
+    ends = [end - 1 for end in accumulate(len(word) + 1 for word in words)]
+    pieces = []
+    start = 0
+    while True:
+        offset = ends[start - 1] + 1 if start else 0
+        # A piece always takes at least one word, even one longer than max_chars
+        end = max(bisect_right(ends, max_chars + offset), start + 1)
+        if end >= len(words):
+            return tuple(pieces), " ".join(words[start:]), ends[-1] - offset
+        pieces.append(" ".join(words[start:end]))
+        start = end
 
 def chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
     """Chunk text into smaller pieces with overlap"""
     
-    # Split into paragraphs
-    paragraphs = re.split(r'\n{2,}', text)
-    paragraphs = [p.strip() for p in paragraphs if p.strip()]
+    # Split into paragraphs; without runs of three or more newlines a plain split is equivalent
+    parts = text.split('\n\n') if '\n\n\n' not in text else _PARAGRAPH_SPLIT_RE.split(text)
+    paragraphs = (p.strip() for p in parts)
     
     chunks = []
-    current_chunk = ""
+    # Pieces of the chunk being built are collected in lists and joined once on flush;
+    # the *_len counters track the length of the joined string
+    current = []
+    current_len = 0
     
     for para in paragraphs:
-        if len(current_chunk) + len(para) + 1 <= max_chars:
-            current_chunk += ("\n\n" if current_chunk else "") + para
+        if not para:
+            continue
+        if current_len + len(para) + 1 <= max_chars:
+            current_len += len(para) + (2 if current else 0)
+            current.append(para)
+            continue
+        
+        if current:
+            chunks.append("\n\n".join(current))
+        
+        # Handle oversized paragraphs
+        if len(para) > max_chars:
+            pieces, last, last_len = _split_long_paragraph(para, max_chars)
+            chunks.extend(pieces)
+            # The paragraph's last piece starts the next chunk
+            current = [last]
+            current_len = last_len
         else:
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # Handle oversized paragraphs
-            if len(para) > max_chars:
-                # Split long paragraph
-                words = para.split()
-                temp = ""
-                for word in words:
-                    if len(temp) + len(word) + 1 <= max_chars:
-                        temp += (" " if temp else "") + word
-                    else:
-                        if temp:
-                            chunks.append(temp)
-                        temp = word
-                if temp:
-                    current_chunk = temp
-            else:
-                current_chunk = para
+            current = [para]
+            current_len = len(para)
     
-    if current_chunk:
-        chunks.append(current_chunk)
+    if current:
+        chunks.append("\n\n".join(current))
     
     return chunks
@@ -4,7 +4,53 @@ Input validation functions for all API endpoints
 """
 from dataclasses import dataclass
 from typing import Optional, List
+import html
 import re
+import string
+
+# Deleting every allowed character leaves nothing for a valid username
+_USERNAME_CHARS_TABLE = str.maketrans('', '', string.ascii_letters + string.digits + '._-')
+# Written to stay linear on hostile input: the script body is matched with the
+# unrolled-loop idiom instead of a lazy .*?, and a handler match may only start at
+# the beginning of a whitespace run (a bare leading \s* rescans long runs of spaces
+# from every position in them, which is quadratic)
+_SCRIPT_TAG_RE = re.compile(r'<script[^>]*>[^<]*(?:<(?!/script>)[^<]*)*</script>', re.IGNORECASE)
+_EVENT_HANDLER_RE = re.compile(r'(?<!\s)\s*on\w+\s*=\s*["\'][^"\']*["\']', re.IGNORECASE)
+# Characters html.escape rewrites; the tag and handler patterns need them too
+_HTML_SPECIAL_RE = re.compile(r'[<>&"\']')
+
+# Allowed values: ordered tuples for error messages, frozensets for membership checks
+_VALID_ROLES_ORDERED = ('admin', 'candidate', 'viewer')
+_VALID_ROLES = frozenset(_VALID_ROLES_ORDERED)
+_VALID_CATEGORIES_ORDERED = (
+    'Pre Consultation',
+    'Consultation Series',
+    'Sales Objections',
+    'After Fixing Objection',
+    'Full Wig Consultation',
+    'Hairline Consultation',
+    'Types of Patches',
+    'Upselling / Cross Selling',
+    'Retail Sales',
+    'SMP Sales',
+    'Sales Follow up',
+    'General Sales'
+)
+_VALID_CATEGORIES = frozenset(_VALID_CATEGORIES_ORDERED)
+_VALID_DIFFICULTIES_ORDERED = ('trial', 'basics', 'field-ready', 'adaptive')
+_VALID_DIFFICULTIES = frozenset(_VALID_DIFFICULTIES_ORDERED)
+_VALID_DURATIONS_ORDERED = (5, 10, 15, 20, 30)
+_VALID_DURATIONS = frozenset(_VALID_DURATIONS_ORDERED)
+_CATEGORY_CHOICES_MESSAGE = f'Must be one of: {", ".join(_VALID_CATEGORIES_ORDERED)}'
+_DIFFICULTY_CHOICES_MESSAGE = f'Must be one of: {", ".join(_VALID_DIFFICULTIES_ORDERED)}'
+_DURATION_CHOICES_MESSAGE = f'Must be one of: {", ".join(map(str, _VALID_DURATIONS_ORDERED))}'
+
+def _is_one_of(value, allowed: frozenset) -> bool:
+    try:
+        return value in allowed
+    except TypeError:
+        # Unhashable input (e.g. a list from a JSON body) is simply not allowed
+        return False
 
 class ValidationError(Exception):
     """Custom exception for validation errors"""
@@ -14,7 +60,7 @@ class ValidationError(Exception):
         super().__init__(f"{field}: {message}")
 
 
-@dataclass
+@dataclass(slots=True)
 class CreateUserRequest:
     """Validation for user creation"""
     username: str
@@ -25,29 +71,35 @@ class CreateUserRequest:
     def validate(self):
         """Validate user creation fields"""
         errors = []
+        # Surrounding whitespace is dropped from the display name before it is stored
+        username = self.username or ''
+        password = self.password or ''
+        self.name = name = (self.name or '').strip()
         
         # Username validation
-        if not self.username or len(self.username.strip()) < 3:
+        if len(username.strip()) < 3:
             errors.append(ValidationError('username', 'Must be at least 3 characters'))
-        elif len(self.username) > 50:
+        elif len(username) > 50:
             errors.append(ValidationError('username', 'Must be less than 50 characters'))
-        elif not re.match(r'^[a-zA-Z0-9._-]+$', self.username):
+        elif username.translate(_USERNAME_CHARS_TABLE):
             errors.append(ValidationError('username', 'Can only contain letters, numbers, dots, dashes, underscores'))
         
         # Password validation
-        if not self.password or len(self.password) < 6:
+        password_len = len(password)
+        if password_len < 6:
             errors.append(ValidationError('password', 'Must be at least 6 characters'))
-        elif len(self.password) > 128:
+        elif password_len > 128:
             errors.append(ValidationError('password', 'Must be less than 128 characters'))
         
         # Name validation
-        if not self.name or len(self.name.strip()) < 2:
+        name_len = len(name)
+        if name_len < 2:
             errors.append(ValidationError('name', 'Must be at least 2 characters'))
-        elif len(self.name) > 100:
+        elif name_len > 100:
             errors.append(ValidationError('name', 'Must be less than 100 characters'))
         
         # Role validation
-        if self.role not in ['admin', 'candidate', 'viewer']:
+        if not _is_one_of(self.role, _VALID_ROLES):
             errors.append(ValidationError('role', 'Must be one of "admin", "candidate", "viewer"'))
         
         if errors:
@@ -56,21 +108,39 @@ class CreateUserRequest:
         return True
 
 
-@dataclass
+@dataclass(slots=True)
 class LoginRequest:
     """Validation for login"""
     username: str
     password: str
     
+    @classmethod
+    def from_json(cls, data) -> 'LoginRequest':
+        """Build from a parsed JSON body; anything that isn't a string counts as missing"""
+        if not isinstance(data, dict):
+            data = {}
+        username = data.get('username')
+        password = data.get('password')
+        return cls(
+            username=username if isinstance(username, str) else '',
+            password=password if isinstance(password, str) else ''
+        )
+    
     def validate(self):
         """Validate login fields"""
         errors = []
+        username = self.username or ''
+        password = self.password or ''
         
-        if not self.username or not self.username.strip():
+        if not username.strip():
             errors.append(ValidationError('username', 'Username is required'))
+        elif len(username) > 50:
+            errors.append(ValidationError('username', 'Must be less than 50 characters'))
         
-        if not self.password:
+        if not password:
             errors.append(ValidationError('password', 'Password is required'))
+        elif len(password) > 128:
+            errors.append(ValidationError('password', 'Must be less than 128 characters'))
         
         if errors:
             raise ValueError(errors)
@@ -78,40 +148,29 @@ class LoginRequest:
         return True
 
 
-@dataclass
+@dataclass(slots=True)
 class UploadRequest:
     """Validation for content upload"""
     category: str
     video_name: str
     filename: str
     
-    VALID_CATEGORIES = [
-        'Pre Consultation',
-        'Consultation Series',
-        'Sales Objections',
-        'After Fixing Objection',
-        'Full Wig Consultation',
-        'Hairline Consultation',
-        'Types of Patches',
-        'Upselling / Cross Selling',
-        'Retail Sales',
-        'SMP Sales',
-        'Sales Follow up',
-        'General Sales'
-    ]
+    VALID_CATEGORIES = _VALID_CATEGORIES
     
     def validate(self):
         """Validate upload fields"""
         errors = []
+        self.video_name = video_name = (self.video_name or '').strip()
         
         # Category validation
-        if not self.category or self.category not in self.VALID_CATEGORIES:
-            errors.append(ValidationError('category', f'Must be one of: {", ".join(self.VALID_CATEGORIES)}'))
+        if not self.category or not _is_one_of(self.category, self.VALID_CATEGORIES):
+            errors.append(ValidationError('category', _CATEGORY_CHOICES_MESSAGE))
         
         # Video name validation
-        if not self.video_name or len(self.video_name.strip()) < 3:
+        video_name_len = len(video_name)
+        if video_name_len < 3:
             errors.append(ValidationError('video_name', 'Must be at least 3 characters'))
-        elif len(self.video_name) > 200:
+        elif video_name_len > 200:
             errors.append(ValidationError('video_name', 'Must be less than 200 characters'))
         
         # Filename validation
@@ -124,15 +183,15 @@ class UploadRequest:
         return True
 
 
-@dataclass
+@dataclass(slots=True)
 class StartSessionRequest:
     """Validation for starting training session"""
     category: str
     difficulty: str
     duration_minutes: int
     
-    VALID_DIFFICULTIES = ['trial', 'basics', 'field-ready', 'adaptive']
-    VALID_DURATIONS = [5, 10, 15, 20, 30]
+    VALID_DIFFICULTIES = _VALID_DIFFICULTIES
+    VALID_DURATIONS = _VALID_DURATIONS
     
     def validate(self):
         """Validate session start fields"""
@@ -143,12 +202,12 @@ class StartSessionRequest:
             errors.append(ValidationError('category', 'Invalid category'))
         
         # Difficulty validation
-        if self.difficulty not in self.VALID_DIFFICULTIES:
-            errors.append(ValidationError('difficulty', f'Must be one of: {", ".join(self.VALID_DIFFICULTIES)}'))
+        if not _is_one_of(self.difficulty, self.VALID_DIFFICULTIES):
+            errors.append(ValidationError('difficulty', _DIFFICULTY_CHOICES_MESSAGE))
         
         # Duration validation
-        if self.duration_minutes not in self.VALID_DURATIONS:
-            errors.append(ValidationError('duration_minutes', f'Must be one of: {", ".join(map(str, self.VALID_DURATIONS))}'))
+        if not _is_one_of(self.duration_minutes, self.VALID_DURATIONS):
+            errors.append(ValidationError('duration_minutes', _DURATION_CHOICES_MESSAGE))
         
         if errors:
             raise ValueError(errors)
@@ -156,7 +215,7 @@ class StartSessionRequest:
         return True
 
 
-@dataclass
+@dataclass(slots=True)
 class ResumeSessionRequest:
     """Validation for resuming training session"""
     session_id: int
@@ -172,22 +231,29 @@ class ResumeSessionRequest:
 
 def sanitize_html(text: str) -> str:
     """Basic HTML sanitization - remove script tags and dangerous attributes"""
-    import html
-    
+    # Plain text is left unchanged by all three passes below
+    if not _HTML_SPECIAL_RE.search(text):
+        return text
+
     # Escape HTML entities
     text = html.escape(text)
     
     # Remove any script tags (even after escaping, for extra safety)
-    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = _SCRIPT_TAG_RE.sub('', text)
     
     # Remove event handlers
-    text = re.sub(r'\s*on\w+\s*=\s*["\'][^"\']*["\']', '', text, flags=re.IGNORECASE)
+    text = _EVENT_HANDLER_RE.sub('', text)
     
     return text
 
 
 def validate_session_id(session_id: any) -> int:
     """Validate and convert session_id to integer"""
+    # JSON bodies usually carry the id as an int already; bool (an int subclass) takes the slow path
+    if type(session_id) is int:
+        if session_id < 1:
+            raise ValidationError('session_id', 'Must be a valid positive integer')
+        return session_id
     try:
         session_id = int(session_id)
         if session_id < 1:
@@ -199,6 +265,10 @@ def validate_session_id(session_id: any) -> int:
 
 def validate_user_id(user_id: any) -> int:
     """Validate and convert user_id to integer"""
+    if type(user_id) is int:
+        if user_id < 1:
+            raise ValidationError('user_id', 'Must be a valid positive integer')
+        return user_id
     try:
         user_id = int(user_id)
         if user_id < 1: